@@ -1,2 +1,4 @@
 # Fund Management System
 
+
+APP_VERSION = "1.0.0"
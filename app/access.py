@@ -0,0 +1,105 @@
+"""
+Fund access control.
+
+Routes ask check_fund_access() for a FundAccess decision instead of testing
+`current_user in fund.members`, which lazy-loads every member just to answer
+a yes/no question. Membership is answered from a snapshot's member id set
+when one is at hand, otherwise with an EXISTS on the fund_members primary key.
+"""
+from enum import Enum
+from typing import AbstractSet, Iterable, Optional, Union
+from fastapi import HTTPException
+from sqlalchemy import exists, insert, select
+from sqlalchemy.orm import Session
+from app.fund_cache import FundRow
+from app.models import Fund, User, fund_members
+
+
+class FundAccess(str, Enum):
+    ADMIN = "admin"                    # Admins can access every fund
+    MEMBER = "member"                  # Active fund the user belongs to
+    GUEST_VISIBLE = "guest_visible"    # Active fund shared with guest users
+    DENIED = "denied"
+
+    @property
+    def allowed(self) -> bool:
+        return self is not FundAccess.DENIED
+
+
+def is_fund_member(db: Session, user_id: int, fund_id: int) -> bool:
+    """Indexed EXISTS lookup on fund_members"""
+    return db.query(exists().where(
+        fund_members.c.fund_id == fund_id,
+        fund_members.c.user_id == user_id
+    )).scalar()
+
+
+def add_fund_member(db: Session, user_id: int, fund_id: int) -> bool:
+    """Add a user to a fund unless already a member. Returns True if a row was added."""
+    if is_fund_member(db, user_id, fund_id):
+        return False
+    db.execute(insert(fund_members).values(fund_id=fund_id, user_id=user_id))
+    return True
+
+
+def add_fund_members(db: Session, fund_id: int, user_ids: Iterable[int]) -> int:
+    """Add many users to a fund with one executemany, skipping existing members. Returns the number added."""
+    wanted = set(user_ids)
+    if not wanted:
+        return 0
+    existing = set(db.execute(
+        select(fund_members.c.user_id).where(
+            fund_members.c.fund_id == fund_id,
+            fund_members.c.user_id.in_(wanted)
+        )
+    ).scalars())
+    new_ids = sorted(wanted - existing)
+    if new_ids:
+        db.execute(insert(fund_members), [{"fund_id": fund_id, "user_id": user_id} for user_id in new_ids])
+    return len(new_ids)
+
+
+def is_fund_hidden(user: User, fund: Union[Fund, FundRow]) -> bool:
+    """Archived and deleted funds are hidden from everyone except admins"""
+    return user.role != "admin" and (fund.is_deleted or fund.is_archived)
+
+
+def check_fund_access(
+    db: Session,
+    user: User,
+    fund: Union[Fund, FundRow],
+    member_ids: Optional[AbstractSet[int]] = None
+) -> FundAccess:
+    """
+    Decide how a user may access a fund.
+    Pass member_ids (e.g. FundSnapshot.member_ids) to skip the membership query.
+    """
+    if user.role == "admin":
+        return FundAccess.ADMIN
+    if is_fund_hidden(user, fund):
+        return FundAccess.DENIED
+
+    # Guest users can only access guest-visible funds
+    if user.role == "guest":
+        return FundAccess.GUEST_VISIBLE if fund.guest_visible else FundAccess.DENIED
+
+    if member_ids is not None:
+        is_member = user.id in member_ids
+    else:
+        is_member = is_fund_member(db, user.id, fund.id)
+    return FundAccess.MEMBER if is_member else FundAccess.DENIED
+
+
+def require_fund_access(
+    db: Session,
+    user: User,
+    fund: Union[Fund, FundRow],
+    member_ids: Optional[AbstractSet[int]] = None
+) -> FundAccess:
+    """check_fund_access() that raises 404 for hidden funds and 403 when access is denied"""
+    access = check_fund_access(db, user, fund, member_ids)
+    if not access.allowed:
+        if is_fund_hidden(user, fund):
+            raise HTTPException(status_code=404, detail="Fund not found")
+        raise HTTPException(status_code=403, detail="You don't have access to this fund")
+    return access
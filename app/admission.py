@@ -0,0 +1,185 @@
+"""
+Admission control: per-route-class concurrency limits with load shedding.
+
+Every request is sorted into a route class, and each class may only have a
+fixed number of requests in flight per worker process. A request that can't
+get a slot waits up to its class's timeout. After that it fails fast with
+503 and a Retry-After header, instead of adding to a backlog that slows
+everyone down. The classes are:
+
+- login: password checks (bcrypt), which are CPU-bound
+- payment: payment submission, verification and receipts. These have their
+  own slots and the longest wait, so a surge of other traffic can't starve them.
+- report: heavy admin pages (the months grid, payments list, audit log) and
+  bulk user imports
+- write: every other POST/PUT/PATCH/DELETE
+- read: every other GET
+
+Static files, /metrics and server-sent event streams are never limited. SSE
+streams stay open as long as their page, so they would hold a slot forever.
+A slot is normally released as soon as the response starts, so a slow client
+downloading a large page doesn't keep other requests of its class waiting.
+Report pages are streamed (the template is rendered and its rows loaded while
+the body is sent), so report slots are held until the last body chunk.
+
+The time spent waiting for a slot, the shed requests and the requests in
+flight are exported per class on /metrics (prometheus_client).
+
+Environment variables:
+- FUNDMGR_ADMISSION: set to 0 to turn admission control off (default: 1)
+- FUNDMGR_ADMISSION_LIMITS: per-class overrides, e.g. "read=128,report=4"
+- FUNDMGR_ADMISSION_TIMEOUTS: per-class seconds to wait for a slot, e.g. "payment=30"
+- FUNDMGR_ADMISSION_RETRY_AFTER: Retry-After seconds sent with a 503 (default: 2)
+"""
+import asyncio
+import logging
+import os
+import re
+import time
+from dataclasses import dataclass, replace
+from typing import Dict, Optional
+from prometheus_client import Counter, Gauge, Histogram
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+from app.database import READ_METHODS
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.environ.get("FUNDMGR_ADMISSION", "1") == "1"
+RETRY_AFTER = int(os.environ.get("FUNDMGR_ADMISSION_RETRY_AFTER", "2"))
+
+
+@dataclass(frozen=True)
+class RouteClass:
+    name: str
+    limit: int  # Requests in flight per worker process
+    timeout: float  # Seconds a request may wait for a slot before it gets a 503
+    hold_until_complete: bool = False  # Keep the slot until the whole body is sent (streamed responses)
+
+
+DEFAULT_ROUTE_CLASSES = {
+    "login": RouteClass("login", limit=4, timeout=5),
+    "payment": RouteClass("payment", limit=32, timeout=15),
+    "report": RouteClass("report", limit=2, timeout=5, hold_until_complete=True),
+    "write": RouteClass("write", limit=8, timeout=5),
+    "read": RouteClass("read", limit=64, timeout=3),
+}
+
+# (methods or None for any, path pattern, route class or None for unlimited), first match wins
+ROUTE_RULES = [
+    (None, re.compile(r"^/static/|^/metrics$|^/api/funds/\d+/events$"), None),
+    ({"POST"}, re.compile(r"^/(login|change-password)$"), "login"),
+    (
+        {"POST"},
+        re.compile(
+            r"^/(api/user/payments|api/user/monthly-payment/mark-received"
+            r"|admin/payments/(verify|reject|mark-on-behalf)"
+            r"|admin/monthly-payment/(mark-received|verify|reject))$"
+        ),
+        "payment",
+    ),
+    ({"GET"}, re.compile(r"^/admin/(months|payments|audit)$"), "report"),
+    ({"POST"}, re.compile(r"^/admin/users/import$"), "report"),
+]
+
+QUEUE_WAIT = Histogram(
+    "fundmgr_admission_wait_seconds",
+    "Time requests waited for an admission slot",
+    ["route_class"],
+    buckets=(0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 15, 30),
+)
+SHED = Counter("fundmgr_admission_shed_total", "Requests answered with 503 after waiting too long", ["route_class"])
+IN_FLIGHT = Gauge("fundmgr_admission_in_flight", "Requests holding an admission slot", ["route_class"])
+
+
+def _parse_overrides(value: Optional[str], convert) -> Dict[str, float]:
+    overrides = {}
+    for item in (value or "").split(","):
+        name, _, setting = item.partition("=")
+        name = name.strip()
+        if not name:
+            continue
+        if name not in DEFAULT_ROUTE_CLASSES:
+            raise ValueError(f"Unknown admission route class '{name}'")
+        overrides[name] = convert(setting)
+    return overrides
+
+
+def load_route_classes() -> Dict[str, RouteClass]:
+    """The default route classes with the limits and timeouts from the environment applied"""
+    limits = _parse_overrides(os.environ.get("FUNDMGR_ADMISSION_LIMITS"), int)
+    timeouts = _parse_overrides(os.environ.get("FUNDMGR_ADMISSION_TIMEOUTS"), float)
+    return {
+        name: replace(
+            route_class,
+            limit=limits.get(name, route_class.limit),
+            timeout=timeouts.get(name, route_class.timeout)
+        )
+        for name, route_class in DEFAULT_ROUTE_CLASSES.items()
+    }
+
+
+def classify(method: str, path: str) -> Optional[str]:
+    """The route class of a request, or None if it isn't limited"""
+    for methods, pattern, name in ROUTE_RULES:
+        if (methods is None or method in methods) and pattern.search(path):
+            return name
+    return "read" if method in READ_METHODS else "write"
+
+
+class AdmissionControlMiddleware:
+    def __init__(self, app: ASGIApp, route_classes: Optional[Dict[str, RouteClass]] = None, retry_after: int = RETRY_AFTER):
+        self.app = app
+        self.route_classes = route_classes or load_route_classes()
+        self.retry_after = retry_after
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        name = classify(scope["method"], scope["path"]) if scope["type"] == "http" else None
+        if name is None:
+            await self.app(scope, receive, send)
+            return
+
+        route_class = self.route_classes[name]
+        semaphore = self._semaphores.get(name)
+        if semaphore is None:
+            semaphore = self._semaphores[name] = asyncio.Semaphore(route_class.limit)
+
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), route_class.timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Shedding %s %s: no %s slot within %.1fs", scope["method"], scope["path"], name, route_class.timeout)
+            SHED.labels(name).inc()
+            response = JSONResponse(
+                {"detail": "The server is busy, please try again shortly"},
+                status_code=503,
+                headers={"Retry-After": str(self.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        QUEUE_WAIT.labels(name).observe(time.monotonic() - started)
+        IN_FLIGHT.labels(name).inc()
+        held = True
+
+        def release():
+            nonlocal held
+            if held:
+                held = False
+                semaphore.release()
+                IN_FLIGHT.labels(name).dec()
+
+        async def send_wrapper(message: Message):
+            await send(message)
+            if route_class.hold_until_complete:
+                if message["type"] == "http.response.body" and not message.get("more_body", False):
+                    release()
+            elif message["type"] == "http.response.start":
+                # From here on the pace is set by the client reading the body
+                release()
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            release()
@@ -1,4 +1,3 @@
-from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
@@ -6,9 +5,10 @@ from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from app.database import get_db
+from passlib.context import CryptContext
 from app.models import User
 
-# Password hashing
+# Password hashing (loaded once in the preloading master, shared by forked workers)
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 # JWT settings
@@ -0,0 +1,262 @@
+"""
+Bulk user import from CSV or JSON.
+
+An import is validated as a whole first (required fields, roles, duplicate
+usernames and customer IDs, both within the file and against the database)
+so every row gets a status in the report. Valid rows are then created
+together:
+
+- bcrypt hashes are computed in a process pool, so a 200-member group is
+  hashed on all cores instead of one hash at a time on the event loop
+- customer IDs come from one block reservation (see app/counters.py)
+- users and fund_members rows are inserted with executemany in a single
+  transaction
+
+CSV files need a header row; JSON is a list of objects (or {"users": [...]}).
+Columns: username, password, full_name (required), role (user/admin/guest,
+default user), alias, customer_id (optional, allocated when empty).
+
+Environment variables:
+- FUNDMGR_HASH_WORKERS: processes used for password hashing (default: CPU count)
+"""
+import asyncio
+import csv
+import io
+import json
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing import get_context
+from typing import List, Optional
+from sqlalchemy import insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.auth import get_password_hash
+from app.counters import allocate_customer_ids, claim_customer_id
+from app.models import User, fund_members
+
+ROLES = ("user", "admin", "guest")
+MIN_PASSWORD_LENGTH = 3
+MAX_IMPORT_ROWS = 2000
+HASH_WORKERS = int(os.environ.get("FUNDMGR_HASH_WORKERS", "0")) or os.cpu_count() or 1
+
+
+class ImportFormatError(ValueError):
+    """The uploaded file can't be read as a user list"""
+
+
+@dataclass
+class ImportRow:
+    row: int  # 1-based data row number (CSV header excluded)
+    username: str
+    password: str = field(repr=False)
+    full_name: str
+    role: str = "user"
+    alias: Optional[str] = None
+    customer_id: Optional[str] = None
+    errors: List[str] = field(default_factory=list)
+    user_id: Optional[int] = None
+    created: bool = False
+
+    def report(self) -> dict:
+        if self.errors:
+            status = "error"
+        else:
+            status = "created" if self.created else "valid"
+        return {
+            "row": self.row,
+            "username": self.username,
+            "status": status,
+            "user_id": self.user_id,
+            "customer_id": self.customer_id,
+            "errors": self.errors,
+        }
+
+
+def _text(value) -> str:
+    return str(value).strip() if value is not None else ""
+
+
+def parse_import(content: bytes, filename: str = "") -> List[ImportRow]:
+    """Read CSV or JSON (detected from the file name, then the content) into rows"""
+    try:
+        text = content.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        raise ImportFormatError("File must be UTF-8 encoded")
+
+    is_json = filename.lower().endswith(".json") or text.lstrip().startswith(("[", "{"))
+    if is_json:
+        try:
+            records = json.loads(text)
+        except json.JSONDecodeError as e:
+            raise ImportFormatError(f"Invalid JSON: {e}")
+        if isinstance(records, dict):
+            records = records.get("users")
+        if not isinstance(records, list) or not all(isinstance(r, dict) for r in records):
+            raise ImportFormatError('JSON must be a list of user objects or {"users": [...]}')
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        if not reader.fieldnames:
+            raise ImportFormatError("CSV file is empty")
+        records = [{(k or "").strip().lower(): v for k, v in record.items()} for record in reader]
+
+    if len(records) > MAX_IMPORT_ROWS:
+        raise ImportFormatError(f"At most {MAX_IMPORT_ROWS} users can be imported at once")
+
+    return [
+        ImportRow(
+            row=index,
+            username=_text(record.get("username")),
+            password=_text(record.get("password")),
+            full_name=_text(record.get("full_name")),
+            role=_text(record.get("role")).lower() or "user",
+            alias=_text(record.get("alias")) or None,
+            customer_id=_text(record.get("customer_id")) or None,
+        )
+        for index, record in enumerate(records, start=1)
+    ]
+
+
+def validate_rows(db: Session, rows: List[ImportRow]):
+    """
+    Record every problem on its row. Database lookups are one IN query per column.
+    Earlier errors are replaced, so rows can be validated again after a conflict.
+    """
+    usernames = {row.username for row in rows if row.username}
+    taken_usernames = set(db.execute(select(User.username).where(User.username.in_(usernames))).scalars()) if usernames else set()
+    customer_ids = {row.customer_id for row in rows if row.customer_id}
+    taken_customer_ids = set(db.execute(select(User.customer_id).where(User.customer_id.in_(customer_ids))).scalars()) if customer_ids else set()
+
+    seen_usernames = set()
+    seen_customer_ids = set()
+    for row in rows:
+        row.errors.clear()
+        if not row.username:
+            row.errors.append("username is required")
+        elif row.username in taken_usernames:
+            row.errors.append("username already exists")
+        elif row.username in seen_usernames:
+            row.errors.append("duplicate username in file")
+        seen_usernames.add(row.username)
+
+        if len(row.password) < MIN_PASSWORD_LENGTH:
+            row.errors.append(f"password must be at least {MIN_PASSWORD_LENGTH} characters")
+        if not row.full_name:
+            row.errors.append("full_name is required")
+        if row.role not in ROLES:
+            row.errors.append(f"role must be one of: {', '.join(ROLES)}")
+
+        if row.customer_id:
+            if row.customer_id in taken_customer_ids:
+                row.errors.append("customer_id already exists")
+            elif row.customer_id in seen_customer_ids:
+                row.errors.append("duplicate customer_id in file")
+            seen_customer_ids.add(row.customer_id)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """Hashing pool, started by the first bulk import. Spawned (not forked) so children don't inherit DB connections or threads."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=HASH_WORKERS, mp_context=get_context("spawn"))
+        return _pool
+
+
+def _hash_passwords(passwords: List[str]) -> List[str]:
+    return [get_password_hash(password) for password in passwords]
+
+
+async def hash_passwords(passwords: List[str]) -> List[str]:
+    """bcrypt-hash passwords on all cores without blocking the event loop"""
+    if not passwords:
+        return []
+    loop = asyncio.get_running_loop()
+    pool = _get_pool()
+    # One chunk per worker keeps pickling overhead negligible next to bcrypt's cost
+    size = -(-len(passwords) // HASH_WORKERS)
+    chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+    results = await asyncio.gather(*(loop.run_in_executor(pool, _hash_passwords, chunk) for chunk in chunks))
+    return [hashed for chunk in results for hashed in chunk]
+
+
+def insert_users(db: Session, rows: List[ImportRow], password_hashes: List[str], fund_id: Optional[int] = None):
+    """
+    Insert valid rows (and their fund memberships) with executemany inside the
+    caller's transaction. Sets customer_id and user_id on each row.
+    Use create_users() unless the caller handles IntegrityError itself.
+    """
+    # Claim IDs given in the file first, so the allocated block starts past them
+    needs_id = []
+    for row in rows:
+        if row.customer_id:
+            claim_customer_id(db, row.customer_id)
+        else:
+            needs_id.append(row)
+    if needs_id:
+        for row, customer_id in zip(needs_id, allocate_customer_ids(db, len(needs_id))):
+            row.customer_id = customer_id
+
+    result = db.execute(
+        insert(User).returning(User.id, sort_by_parameter_order=True),
+        [
+            {
+                "username": row.username,
+                "password_hash": password_hash,
+                "full_name": row.full_name,
+                "role": row.role,
+                "alias": row.alias,
+                "customer_id": row.customer_id,
+            }
+            for row, password_hash in zip(rows, password_hashes)
+        ]
+    )
+    for row, user_id in zip(rows, result.scalars()):
+        row.user_id = user_id
+
+    if fund_id is not None:
+        db.execute(fund_members.insert(), [{"fund_id": fund_id, "user_id": row.user_id} for row in rows])
+
+
+def create_users(db: Session, rows: List[ImportRow], password_hashes: List[str], fund_id: Optional[int] = None) -> List[ImportRow]:
+    """
+    Insert validated rows. If another request took a username or
+    customer ID while the passwords were being hashed, the rows are checked
+    again and the rest are inserted. If that conflicts too, nothing is
+    created and those rows get an error. Returns the created rows.
+    """
+    requested_rows = rows
+    requested_customer_ids = [row.customer_id for row in rows]
+    hashes = list(password_hashes)
+
+    def roll_back():
+        db.rollback()
+        for row, customer_id in zip(requested_rows, requested_customer_ids):
+            row.customer_id = customer_id
+            row.user_id = None
+
+    try:
+        insert_users(db, rows, hashes, fund_id)
+    except IntegrityError:
+        roll_back()
+        validate_rows(db, rows)
+        remaining = [(row, password_hash) for row, password_hash in zip(rows, hashes) if not row.errors]
+        rows = [row for row, _ in remaining]
+        if rows:
+            try:
+                insert_users(db, rows, [password_hash for _, password_hash in remaining], fund_id)
+            except IntegrityError:
+                # Another concurrent change; report it instead of retrying again
+                roll_back()
+                for row in rows:
+                    row.errors.append("conflicted with a concurrent change, import it again")
+                return []
+
+    for row in rows:
+        row.created = True
+    return rows
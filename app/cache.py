@@ -0,0 +1,364 @@
+"""
+Pluggable shared cache and invalidation bus.
+
+Per-worker caches go stale as soon as several uvicorn workers or containers
+serve the same database. This module provides one cache/bus interface with
+three backends, selected by FUNDMGR_CACHE_URL:
+
+- unset:              no shared cache (every read goes to the database)
+- memory://           in-process dict and callbacks; correct with ONE worker only,
+                      intended for development and tests
+- sqlite:///path.db   a small SQLite file shared by workers on the same host or
+                      volume; pub/sub is an event table polled by a thread
+- redis://host:6379/0 Redis (or any Redis-protocol server); requires the
+                      optional "redis" package. Tests can pass a fakeredis
+                      client to RedisCache(client=...) instead of a URL.
+
+Values are bytes. Messages are JSON-serialisable objects.
+
+Environment variables:
+- FUNDMGR_CACHE_URL: backend URL (see above)
+- FUNDMGR_CACHE_TTL: default TTL in seconds for cached entries (default: 30)
+"""
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+INVALIDATION_CHANNEL = "fundmgr:invalidate"
+DEFAULT_TTL = int(os.environ.get("FUNDMGR_CACHE_TTL", "30"))
+
+Subscriber = Callable[[Any], None]
+
+
+class CacheBackend:
+    """Interface shared by all backends"""
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        raise NotImplementedError
+
+    def set_many(self, items: Dict[str, bytes], ttl: Optional[int] = DEFAULT_TTL):
+        raise NotImplementedError
+
+    def add_many(self, items: Dict[str, bytes], ttl: Optional[int] = DEFAULT_TTL):
+        """Like set_many(), but keys that already hold a live value keep it"""
+        raise NotImplementedError
+
+    def delete_many(self, keys: Iterable[str]):
+        raise NotImplementedError
+
+    def publish(self, channel: str, message: Any):
+        raise NotImplementedError
+
+    def subscribe(self, channel: str, callback: Subscriber):
+        """Call callback(message) for every message published on channel, from any worker"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.get_many([key]).get(key)
+
+    def set(self, key: str, value: bytes, ttl: Optional[int] = DEFAULT_TTL):
+        self.set_many({key: value}, ttl)
+
+    def delete(self, key: str):
+        self.delete_many([key])
+
+
+def _dispatch(callbacks: List[Subscriber], message: Any):
+    for callback in callbacks:
+        try:
+            callback(message)
+        except Exception:
+            logger.exception("Cache invalidation subscriber failed")
+
+
+class MemoryCache(CacheBackend):
+    """In-process cache. Messages are delivered synchronously to local subscribers."""
+
+    def __init__(self):
+        self._data: Dict[str, Tuple[bytes, Optional[float]]] = {}
+        self._subscribers: Dict[str, List[Subscriber]] = {}
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                value, expires_at = entry
+                if expires_at is not None and expires_at <= now:
+                    del self._data[key]
+                    continue
+                found[key] = value
+        return found
+
+    def set_many(self, items, ttl=DEFAULT_TTL):
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            for key, value in items.items():
+                self._data[key] = (value, expires_at)
+
+    def add_many(self, items, ttl=DEFAULT_TTL):
+        now = time.monotonic()
+        expires_at = now + ttl if ttl else None
+        with self._lock:
+            for key, value in items.items():
+                entry = self._data.get(key)
+                if entry is None or (entry[1] is not None and entry[1] <= now):
+                    self._data[key] = (value, expires_at)
+
+    def delete_many(self, keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def publish(self, channel, message):
+        _dispatch(list(self._subscribers.get(channel, [])), message)
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+
+
+class SQLiteCache(CacheBackend):
+    """
+    Cache stored in a SQLite file, shared by all processes that open the same path.
+    Published messages are appended to an event table; a daemon thread per
+    process polls it and delivers new rows to local subscribers.
+    """
+
+    POLL_INTERVAL = 0.5  # Seconds between event table polls
+    EVENT_RETENTION = 300  # Seconds to keep delivered events
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._subscribers: Dict[str, List[Subscriber]] = {}
+        self._lock = threading.Lock()
+        self._poller: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, channel TEXT NOT NULL, "
+            "message TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        # One connection per thread; autocommit so reads never hold a transaction open
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        placeholders = ", ".join("?" for _ in keys)
+        rows = self._conn().execute(
+            f"SELECT key, value FROM cache_entries WHERE key IN ({placeholders}) "
+            "AND (expires_at IS NULL OR expires_at > ?)",
+            (*keys, time.time())
+        ).fetchall()
+        return {key: bytes(value) for key, value in rows}
+
+    def set_many(self, items, ttl=DEFAULT_TTL):
+        expires_at = time.time() + ttl if ttl else None
+        self._conn().executemany(
+            "INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)",
+            [(key, value, expires_at) for key, value in items.items()]
+        )
+
+    def add_many(self, items, ttl=DEFAULT_TTL):
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        # Only expired entries are replaced
+        self._conn().executemany(
+            "INSERT INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT (key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at "
+            "WHERE cache_entries.expires_at IS NOT NULL AND cache_entries.expires_at <= ?",
+            [(key, value, expires_at, now) for key, value in items.items()]
+        )
+
+    def delete_many(self, keys):
+        self._conn().executemany("DELETE FROM cache_entries WHERE key = ?", [(key,) for key in keys])
+
+    def publish(self, channel, message):
+        self._conn().execute(
+            "INSERT INTO cache_events (channel, message, created_at) VALUES (?, ?, ?)",
+            (channel, json.dumps(message), time.time())
+        )
+
+    def subscribe(self, channel, callback):
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(callback)
+            if self._poller is None:
+                self._poller = threading.Thread(target=self._poll, name="sqlite-cache-events", daemon=True)
+                self._poller.start()
+
+    def _poll(self):
+        conn = self._conn()
+        # Only deliver events published after subscribing
+        last_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM cache_events").fetchone()[0]
+        last_cleanup = time.time()
+        while not self._stopped.wait(self.POLL_INTERVAL):
+            try:
+                rows = conn.execute(
+                    "SELECT id, channel, message FROM cache_events WHERE id > ? ORDER BY id",
+                    (last_id,)
+                ).fetchall()
+                for event_id, channel, message in rows:
+                    last_id = event_id
+                    _dispatch(list(self._subscribers.get(channel, [])), json.loads(message))
+
+                if time.time() - last_cleanup > self.EVENT_RETENTION:
+                    conn.execute("DELETE FROM cache_events WHERE created_at < ?", (time.time() - self.EVENT_RETENTION,))
+                    conn.execute("DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+                    last_cleanup = time.time()
+            except sqlite3.Error:
+                logger.exception("Polling cache events failed")
+
+    def close(self):
+        self._stopped.set()
+
+
+class RedisCache(CacheBackend):
+    """Cache and pub/sub on a Redis-protocol server"""
+
+    def __init__(self, url: Optional[str] = None, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError:
+                raise RuntimeError("FUNDMGR_CACHE_URL uses redis:// but the 'redis' package is not installed")
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self._pubsub = None
+        self._pubsub_thread = None
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self.client.mget(keys)
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, items, ttl=DEFAULT_TTL):
+        pipe = self.client.pipeline()
+        for key, value in items.items():
+            pipe.set(key, value, ex=ttl or None)
+        pipe.execute()
+
+    def add_many(self, items, ttl=DEFAULT_TTL):
+        pipe = self.client.pipeline()
+        for key, value in items.items():
+            pipe.set(key, value, ex=ttl or None, nx=True)
+        pipe.execute()
+
+    def delete_many(self, keys):
+        keys = list(keys)
+        if keys:
+            self.client.delete(*keys)
+
+    def publish(self, channel, message):
+        self.client.publish(channel, json.dumps(message))
+
+    def subscribe(self, channel, callback):
+        def handler(raw):
+            _dispatch([callback], json.loads(raw["data"]))
+
+        with self._lock:
+            if self._pubsub is None:
+                self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+            self._pubsub.subscribe(**{channel: handler})
+            if self._pubsub_thread is None:
+                self._pubsub_thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def close(self):
+        if self._pubsub_thread is not None:
+            self._pubsub_thread.stop()
+        if self._pubsub is not None:
+            self._pubsub.close()
+
+
+def create_cache(url: Optional[str]) -> Optional[CacheBackend]:
+    """Build a backend from a FUNDMGR_CACHE_URL value (None when no shared cache is configured)"""
+    if not url:
+        return None
+    if url.startswith("memory://"):
+        return MemoryCache()
+    if url.startswith("sqlite:///"):
+        return SQLiteCache(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisCache(url)
+    raise ValueError(f"Unsupported FUNDMGR_CACHE_URL: {url}")
+
+
+_cache: Optional[CacheBackend] = None
+_configured = False
+_config_lock = threading.Lock()
+_listeners: Dict[str, List[Subscriber]] = {}
+
+
+def _attach_listeners(cache: CacheBackend):
+    for channel, callbacks in _listeners.items():
+        for callback in callbacks:
+            cache.subscribe(channel, callback)
+
+
+def get_cache() -> Optional[CacheBackend]:
+    """The process-wide backend configured by FUNDMGR_CACHE_URL, created on first use"""
+    global _cache, _configured
+    if not _configured:
+        with _config_lock:
+            if not _configured:
+                _cache = create_cache(os.environ.get("FUNDMGR_CACHE_URL"))
+                if _cache is not None:
+                    _attach_listeners(_cache)
+                _configured = True
+    return _cache
+
+
+def set_cache(cache: Optional[CacheBackend]):
+    """Replace the process-wide backend (e.g. with RedisCache(client=fakeredis.FakeRedis()) in tests)"""
+    global _cache, _configured
+    with _config_lock:
+        if _cache is not None and _cache is not cache:
+            _cache.close()
+        _cache = cache
+        if cache is not None:
+            _attach_listeners(cache)
+        _configured = True
+
+
+def listen(channel: str, callback: Subscriber):
+    """
+    Register a subscriber for a channel on the process-wide backend.
+    Subscribing is deferred until the backend is created on first use, so
+    importing a module never opens connections or starts threads (important
+    before workers are forked).
+    """
+    with _config_lock:
+        _listeners.setdefault(channel, []).append(callback)
+        if _cache is not None:
+            _cache.subscribe(channel, callback)
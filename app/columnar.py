@@ -0,0 +1,60 @@
+"""
+Compact column-oriented JSON payloads for the /api/v1 data endpoints.
+
+A table is returned as one list per field instead of one object per row, so
+field names are sent once and repeated values compress well:
+
+    {"count": 2, "columns": {"id": [7, 9], "status": ["pending", "verified"]}}
+
+Clients choose the columns they need with ?fields=a,b,c. Each view declares
+its columns as name -> getter, and only the requested getters are evaluated.
+"""
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+from fastapi import HTTPException
+
+Getter = Callable[[Any], Any]
+
+
+def json_value(value):
+    """Convert a column value into its JSON form (money as a number, datetimes as ISO 8601)"""
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def select_fields(requested: Optional[str], available: Sequence[str], default: Optional[Sequence[str]] = None) -> List[str]:
+    """Parse a comma-separated ?fields= value. Unknown fields are a 400 rather than silently dropped."""
+    if not requested:
+        return list(default if default is not None else available)
+    fields = [name.strip() for name in requested.split(",") if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(available)}"
+        )
+    # Keep the client's order, without duplicates
+    return list(dict.fromkeys(fields))
+
+
+def to_columns(rows: Iterable[Any], getters: Dict[str, Getter], fields: Sequence[str]) -> dict:
+    """Build {"count": n, "columns": {field: [values]}} from rows"""
+    rows = list(rows)
+    columns = {}
+    for name in fields:
+        getter = getters[name]
+        columns[name] = [json_value(getter(row)) for row in rows]
+    return {"count": len(rows), "columns": columns}
+
+
+def parse_int_filter(value: Optional[str], name: str) -> Optional[int]:
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"Invalid {name}")
@@ -0,0 +1,105 @@
+"""
+Gzip compression for dynamic HTML and JSON responses.
+
+Unlike Starlette's GZipMiddleware this only compresses the content types
+listed in COMPRESSIBLE_TYPES, so server-sent events (which must not be
+buffered), already-encoded static files and binary downloads pass through
+untouched. Streamed pages are compressed chunk by chunk and each chunk is
+flushed, so the browser still starts rendering before the page is complete.
+
+Environment variables:
+- FUNDMGR_GZIP_MIN_SIZE: smallest response body in bytes worth compressing (default: 1024)
+- FUNDMGR_GZIP_LEVEL: zlib compression level 1-9 (default: 6)
+"""
+import os
+import zlib
+from typing import Optional
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+COMPRESSIBLE_TYPES = ("text/html", "application/json")
+GZIP_MIN_SIZE = int(os.environ.get("FUNDMGR_GZIP_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.environ.get("FUNDMGR_GZIP_LEVEL", "6"))
+
+
+def _accepts_gzip(scope: Scope) -> bool:
+    for part in Headers(scope=scope).get("accept-encoding", "").split(","):
+        token, _, params = part.strip().partition(";")
+        if token.lower() in ("gzip", "*") and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            return True
+    return False
+
+
+class GZipCompressionMiddleware:
+    def __init__(self, app: ASGIApp, minimum_size: int = GZIP_MIN_SIZE, compresslevel: int = GZIP_LEVEL):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http" or not _accepts_gzip(scope):
+            await self.app(scope, receive, send)
+            return
+        await _GZipResponder(self.minimum_size, self.compresslevel, send).run(self.app, scope, receive)
+
+
+class _GZipResponder:
+    def __init__(self, minimum_size: int, compresslevel: int, send: Send):
+        self.minimum_size = minimum_size
+        self.compresslevel = compresslevel
+        self.send = send
+        self.start_message: Optional[Message] = None
+        self.compressor = None
+        self.passthrough = False
+
+    async def run(self, app: ASGIApp, scope: Scope, receive: Receive):
+        await app(scope, receive, self.send_wrapper)
+
+    def _should_compress(self, headers: Headers) -> bool:
+        if self.start_message["status"] in (204, 206, 304) or "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "").split(";")[0].strip().lower()
+        return content_type in COMPRESSIBLE_TYPES
+
+    async def send_wrapper(self, message: Message):
+        if message["type"] == "http.response.start":
+            # Hold the headers until the first body chunk shows how large the response is
+            self.start_message = message
+            self.passthrough = not self._should_compress(Headers(raw=message["headers"]))
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+            if self.passthrough or (not more_body and len(body) < self.minimum_size):
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+
+            headers = MutableHeaders(raw=start["headers"])
+            headers["Content-Encoding"] = "gzip"
+            headers.add_vary_header("Accept-Encoding")
+            if "content-length" in headers:
+                del headers["content-length"]
+            # The compressed body is a different byte sequence, so a strong ETag becomes weak
+            etag = headers.get("etag")
+            if etag and not etag.startswith("W/"):
+                headers["etag"] = "W/" + etag
+            # wbits=31 writes a gzip header and trailer
+            self.compressor = zlib.compressobj(self.compresslevel, zlib.DEFLATED, 31)
+            await self.send(start)
+
+        if self.passthrough:
+            await self.send(message)
+            return
+
+        body = self.compressor.compress(message.get("body", b""))
+        more_body = message.get("more_body", False)
+        body += self.compressor.flush(zlib.Z_SYNC_FLUSH if more_body else zlib.Z_FINISH)
+        await self.send({"type": "http.response.body", "body": body, "more_body": more_body})
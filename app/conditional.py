@@ -0,0 +1,99 @@
+"""
+Conditional GET support (ETag / Last-Modified / 304 Not Modified).
+
+Views call build_validators() with the version scopes they depend on before
+doing any real work. If the client already holds the current representation
+not_modified() returns a ready 304 response; otherwise the view renders as
+usual and stamps the response with apply_validators().
+"""
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Iterable, NamedTuple, Optional
+from fastapi import Request, Response
+from sqlalchemy.orm import Session
+from app.models import User
+from app.templating import build_identity
+from app.versioning import Scope, get_versions
+
+
+class Validators(NamedTuple):
+    etag: str
+    last_modified: Optional[datetime]
+
+
+def build_validators(
+    db: Session,
+    request: Request,
+    current_user: User,
+    scopes: Iterable[Scope],
+    extra: Iterable = ()
+) -> Validators:
+    """
+    Build a strong ETag from the URL, the viewer and the versions of the given scopes.
+    The viewer is part of the tag because pages are rendered per role/user (privacy rules).
+    'extra' carries any other input the page depends on (e.g. the current month).
+    The build id is included so a deploy (new templates or asset URLs) invalidates every tag.
+    """
+    scopes = list(scopes)
+    versions = get_versions(db, scopes)
+    build = build_identity()
+    parts = [build.build_id, request.url.path, request.url.query, current_user.id, current_user.role]
+    for scope in scopes:
+        version = versions.get(scope)
+        parts.append(f"{scope[0]}:{scope[1]}:{version[0] if version else 0}")
+    parts.extend(extra)
+    digest = hashlib.sha1("|".join(str(p) for p in parts).encode("utf-8")).hexdigest()
+
+    timestamps = [updated_at for _, updated_at in versions.values()]
+    if build.built_at:
+        timestamps.append(build.built_at)
+    last_modified = max(timestamps, default=None)
+    return Validators(etag=f'"{digest}"', last_modified=last_modified)
+
+
+def _http_date(dt: datetime) -> str:
+    # Stored timestamps are naive UTC
+    return format_datetime(dt.replace(tzinfo=timezone.utc, microsecond=0), usegmt=True)
+
+
+def _validator_headers(validators: Validators) -> dict:
+    headers = {
+        "ETag": validators.etag,
+        "Cache-Control": "private, no-cache",
+        "Vary": "Cookie",
+    }
+    if validators.last_modified:
+        headers["Last-Modified"] = _http_date(validators.last_modified)
+    return headers
+
+
+def not_modified(request: Request, validators: Validators) -> Optional[Response]:
+    """Return a 304 response if the client's cached copy is still current, else None."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match uses weak comparison, so ignore any W/ prefix
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in tags or validators.etag in tags:
+            return Response(status_code=304, headers=_validator_headers(validators))
+        return None
+
+    # If-Modified-Since is only consulted when no ETag was sent
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and validators.last_modified:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return None
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        last_modified = validators.last_modified.replace(tzinfo=timezone.utc, microsecond=0)
+        if last_modified <= since:
+            return Response(status_code=304, headers=_validator_headers(validators))
+    return None
+
+
+def apply_validators(response: Response, validators: Validators) -> Response:
+    """Stamp ETag / Last-Modified / Cache-Control on a full response."""
+    response.headers.update(_validator_headers(validators))
+    return response
@@ -0,0 +1,125 @@
+"""
+Named counters for allocating sequential identifiers (customer IDs).
+
+Allocation is a single UPDATE ... RETURNING on one row of the counters table
+instead of scanning users for the highest ID, so it costs the same no matter
+how many users exist. The UPDATE takes SQLite's write lock for the rest of the
+caller's transaction, so allocations from concurrent requests and worker
+processes are serialised and never hand out the same value. Because the
+increment commits (or rolls back) together with the rows that use the IDs, a
+failed request does not leave a gap.
+
+Bulk operations reserve a whole block of IDs with one statement.
+Run `python -m app.counters` to give customer IDs to users that have none.
+"""
+import re
+from typing import Callable, Dict, List
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import Counter, User
+
+CUSTOMER_ID_COUNTER = "customer_id"
+CUSTOMER_ID_PATTERN = re.compile(r"^C(\d+)$")
+
+
+def format_customer_id(number: int) -> str:
+    return f"C{number:03d}"
+
+
+def highest_customer_number(db: Session) -> int:
+    """Highest N among customer IDs of the form C<N> (a full scan, used only to seed the counter)"""
+    # Digit matching is done here rather than in SQL, which has no portable pattern for it
+    customer_ids = db.execute(select(User.customer_id).where(User.customer_id.like("C%"))).scalars()
+    return max(
+        (int(match.group(1)) for match in map(CUSTOMER_ID_PATTERN.match, customer_ids) if match),
+        default=0
+    )
+
+
+# Counter name -> function returning its starting value, for counters created on first use
+COUNTER_SEEDS: Dict[str, Callable[[Session], int]] = {
+    CUSTOMER_ID_COUNTER: highest_customer_number,
+}
+
+
+def _create_counter(db: Session, name: str):
+    seed = COUNTER_SEEDS.get(name, lambda db: 0)(db)
+    try:
+        with db.begin_nested():
+            db.execute(insert(Counter).values(name=name, value=seed))
+    except IntegrityError:
+        # Another transaction created it first
+        pass
+
+
+def reserve(db: Session, name: str, count: int = 1) -> range:
+    """Reserve the next 'count' values of a counter. Runs inside the caller's transaction."""
+    if count < 1:
+        raise ValueError("count must be at least 1")
+    statement = update(Counter).where(Counter.name == name).values(
+        value=Counter.value + count
+    ).returning(Counter.value)
+    last = db.execute(statement).scalar()
+    if last is None:
+        _create_counter(db, name)
+        last = db.execute(statement).scalar()
+    return range(last - count + 1, last + 1)
+
+
+def advance(db: Session, name: str, value: int):
+    """Make sure the counter never hands out 'value' or anything below it"""
+    updated = db.execute(
+        update(Counter).where(Counter.name == name, Counter.value < value).values(value=value)
+    ).rowcount
+    if not updated and db.get(Counter, name) is None:
+        _create_counter(db, name)
+        advance(db, name, value)
+
+
+def allocate_customer_ids(db: Session, count: int) -> List[str]:
+    """Reserve 'count' consecutive customer IDs with one statement (for bulk user creation)"""
+    return [format_customer_id(number) for number in reserve(db, CUSTOMER_ID_COUNTER, count)]
+
+
+def allocate_customer_id(db: Session) -> str:
+    return allocate_customer_ids(db, 1)[0]
+
+
+def claim_customer_id(db: Session, customer_id: str):
+    """
+    Record a customer ID that was set by hand. If it has the C<N> form the
+    counter moves past it, so the allocator never hands it out again.
+    """
+    match = CUSTOMER_ID_PATTERN.match(customer_id or "")
+    if match:
+        advance(db, CUSTOMER_ID_COUNTER, int(match.group(1)))
+
+
+def backfill_customer_ids(db: Session) -> int:
+    """
+    Sync the customer ID counter with the users table and give every user
+    without a customer ID the next free one (in user id order).
+    Returns the number of users updated. The caller commits.
+    """
+    advance(db, CUSTOMER_ID_COUNTER, highest_customer_number(db))
+    users = db.query(User).filter(User.customer_id.is_(None)).order_by(User.id).all()
+    if users:
+        for user, customer_id in zip(users, allocate_customer_ids(db, len(users))):
+            user.customer_id = customer_id
+    return len(users)
+
+
+if __name__ == "__main__":
+    from app.database import SessionLocal
+    from app.versioning import bump_users_version
+
+    db = SessionLocal()
+    try:
+        updated = backfill_customer_ids(db)
+        if updated:
+            bump_users_version(db)
+        db.commit()
+        print(f"Assigned customer IDs to {updated} users")
+    finally:
+        db.close()
@@ -0,0 +1,92 @@
+"""
+Fund-scoped data loader for the user dashboard.
+
+Contract: load_user_dashboard(db, snapshot, user) only reads rows that belong to
+the given fund. Every query below is bounded by the fund's months or its
+member list, never by the user's whole history, so dashboard latency does
+not grow with the number of funds a user has joined over the years.
+
+Months, members and assignments come from the cached FundSnapshot (see
+app/fund_cache.py), so on a warm cache only per-user and payment rows are read.
+
+Queries issued (in order):
+1. users                      WHERE id IN (:member_ids + :assigned_user_ids)
+2. installment_payments       WHERE user_id = :user_id AND month_id IN (:fund_month_ids)
+3. monthly_payments_received  WHERE user_id = :user_id AND month_id IN (:fund_month_ids)
+4. verified totals            SUM/COUNT ... WHERE fund_id = :fund_id GROUP BY month_id
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Dict, List, Optional
+from sqlalchemy.orm import Session
+from app.fund_cache import FundSnapshot, MonthRow
+from app.ledger import verified_installment_totals
+from app.models import User, InstallmentPayment, MonthlyPaymentReceived
+
+
+@dataclass
+class UserDashboardData:
+    months: List[MonthRow]  # Ordered by month_number
+    assigned_user_map: Dict[int, User]  # month_id -> assigned user
+    all_users: List[User]  # Members with role "user", plus assigned users who are not members yet
+    assigned_month_id: Optional[int]  # The month this user took in this fund
+    installment_payment_map: Dict[int, InstallmentPayment]  # month_id -> this user's latest payment
+    monthly_payment_map: Dict[int, MonthlyPaymentReceived]  # month_id -> payment received by this user
+    verified_count_map: Dict[int, int]  # month_id -> number of verified installments
+    total_paid_installments: Decimal  # Sum of all verified installment amounts in the fund
+    is_member: bool
+
+
+def load_user_dashboard(db: Session, snapshot: FundSnapshot, user: User) -> UserDashboardData:
+    """Load everything the user dashboard shows for one fund (see module docstring for the contract)"""
+    months = list(snapshot.months)
+    fund_month_ids = list(snapshot.month_ids)
+
+    # Members and assigned users in one query (assigned users might not be members yet)
+    user_ids = snapshot.member_ids | set(snapshot.assignments.values())
+    users_by_id = {}
+    if user_ids:
+        users_by_id = {u.id: u for u in db.query(User).filter(User.id.in_(user_ids)).all()}
+    assigned_user_map = {
+        month_id: users_by_id[user_id]
+        for month_id, user_id in snapshot.assignments.items()
+        if user_id in users_by_id
+    }
+
+    # Admins are members too, but only regular users are listed
+    all_users = [u for u in users_by_id.values() if u.role == "user"]
+
+    # The user's own assignment - derived from this fund's assignments, no extra query
+    assigned_month_id = next(
+        (month_id for month_id, user_id in snapshot.assignments.items() if user_id == user.id), None
+    )
+
+    installment_payment_map = {}
+    monthly_payment_map = {}
+    if fund_month_ids:
+        # Ordered by id so the most recent submission for a month wins, as before
+        installment_payments = db.query(InstallmentPayment).filter(
+            InstallmentPayment.user_id == user.id,
+            InstallmentPayment.month_id.in_(fund_month_ids)
+        ).order_by(InstallmentPayment.id).all()
+        installment_payment_map = {p.month_id: p for p in installment_payments}
+
+        monthly_payments_received = db.query(MonthlyPaymentReceived).filter(
+            MonthlyPaymentReceived.user_id == user.id,
+            MonthlyPaymentReceived.month_id.in_(fund_month_ids)
+        ).all()
+        monthly_payment_map = {p.month_id: p for p in monthly_payments_received}
+
+    verified_totals = verified_installment_totals(db, snapshot.fund.id)
+
+    return UserDashboardData(
+        months=months,
+        assigned_user_map=assigned_user_map,
+        all_users=all_users,
+        assigned_month_id=assigned_month_id,
+        installment_payment_map=installment_payment_map,
+        monthly_payment_map=monthly_payment_map,
+        verified_count_map={month_id: count for month_id, count, _ in verified_totals},
+        total_paid_installments=sum((total for _, _, total in verified_totals), Decimal("0.00")),
+        is_member=user.id in snapshot.member_ids,
+    )
@@ -1,29 +1,84 @@
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from fastapi import Request
+from sqlalchemy import create_engine, event
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+import fcntl
 import os
 
 # Database path
 DATABASE_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data")
 os.makedirs(DATABASE_DIR, exist_ok=True)
-DATABASE_URL = f"sqlite:///{os.path.join(DATABASE_DIR, 'fundmgr.db')}"
+DATABASE_URL = os.environ.get("FUNDMGR_DATABASE_URL") or f"sqlite:///{os.path.join(DATABASE_DIR, 'fundmgr.db')}"
+# Read-only requests can go to a replica (PostgreSQL); by default they read the primary
+READ_DATABASE_URL = os.environ.get("FUNDMGR_READ_DATABASE_URL") or DATABASE_URL
 
-# Create engine
-engine = create_engine(
-    DATABASE_URL, 
-    connect_args={"check_same_thread": False},
-    echo=False
-)
+# Reads far outnumber writes (dashboards, grids, SSE), so readers get the larger pool
+READ_POOL_SIZE = int(os.environ.get("FUNDMGR_READ_POOL_SIZE", "20"))
+WRITE_POOL_SIZE = int(os.environ.get("FUNDMGR_WRITE_POOL_SIZE", "5"))
 
-# Create session factory
+# Requests that don't change anything get a read-only session (see get_db)
+READ_METHODS = frozenset({"GET", "HEAD", "OPTIONS"})
+
+# Several worker processes share the database file: WAL lets readers run while
+# one process writes, and busy_timeout makes writers wait instead of failing
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
+
+def _set_read_only(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+def _create_engine(url: str, pool_size: int, read_only: bool = False):
+    is_sqlite = url.startswith("sqlite")
+    new_engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False} if is_sqlite else {},
+        pool_size=pool_size,
+        echo=False
+    )
+    if is_sqlite:
+        event.listen(new_engine, "connect", set_sqlite_pragmas)
+        if read_only:
+            # A write through a reader fails instead of taking the write lock
+            event.listen(new_engine, "connect", _set_read_only)
+    elif read_only and new_engine.dialect.name == "postgresql":
+        new_engine = new_engine.execution_options(postgresql_readonly=True)
+    return new_engine
+
+# Create engines: engine takes every write, read_engine only serves reads
+engine = _create_engine(DATABASE_URL, WRITE_POOL_SIZE)
+read_engine = _create_engine(READ_DATABASE_URL, READ_POOL_SIZE, read_only=True)
+
+# Create session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
 
 # Base class for models
 Base = declarative_base()
 
-# Dependency to get DB session
-def get_db():
-    db = SessionLocal()
+@contextmanager
+def schema_lock():
+    """
+    Exclusive file lock held while creating tables, so worker processes
+    starting at the same time don't race each other's DDL.
+    """
+    with open(os.path.join(DATABASE_DIR, ".schema.lock"), "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+# Dependency to get DB session: GET/HEAD/OPTIONS handlers read through the
+# read-only pool, everything else uses the writer. A GET handler that has to
+# write opens its own SessionLocal().
+def get_db(request: Request):
+    db = ReadSessionLocal() if request.method in READ_METHODS else SessionLocal()
     try:
         yield db
     finally:
@@ -0,0 +1,240 @@
+"""
+Live per-fund events pushed to dashboards over server-sent events.
+
+Changes to installment payments, monthly payments and month assignments are
+picked up from the ORM flush, so no endpoint has to remember to emit them.
+They are published after the transaction commits, as small JSON deltas:
+
+    {"type": "installment", "action": "verified", "month_id": 3, "user_id": 7,
+     "payment_id": 42, "status": "verified", "verified_count": 5}
+    {"type": "monthly_payment", "action": "marked", "month_id": 3, "payment_id": 9, "status": "pending"}
+    {"type": "assignment", "action": "updated", "month_id": 3, "user_id": 7}
+
+Admins receive them as they are. Every other viewer (members, guests,
+preview users) gets a trimmed copy (see event_for_viewer). It says which
+member a row belongs to, and that member's individual payment status,
+only when the row is the viewer's own, which matches the HTML pages.
+
+With a shared cache configured (FUNDMGR_CACHE_URL, see app/cache.py) events
+travel over its pub/sub channel, so a write on one worker reaches SSE
+clients connected to any worker. Without one they are delivered in-process.
+"""
+import asyncio
+import json
+import logging
+import threading
+from typing import Dict, List, Optional, Set
+from sqlalchemy import event, func, inspect, select
+from sqlalchemy.orm import Session
+from app.cache import get_cache, listen
+from app.models import InstallmentPayment, Month, MonthlyPaymentReceived, UserMonthAssignment
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "fundmgr:fund_events"
+HEARTBEAT_SECONDS = 15
+QUEUE_SIZE = 100  # Events buffered per client before it is considered stuck
+
+
+class FundEventBroker:
+    """Fans events out to the SSE clients connected to this worker"""
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def subscribe(self, fund_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers.setdefault(fund_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, fund_id: int, queue: asyncio.Queue):
+        with self._lock:
+            queues = self._subscribers.get(fund_id)
+            if queues is not None:
+                queues.discard(queue)
+                if not queues:
+                    del self._subscribers[fund_id]
+
+    def deliver(self, fund_id: int, payload: dict):
+        """Hand an event to local subscribers. Safe to call from any thread."""
+        with self._lock:
+            loop = self._loop
+            queues = list(self._subscribers.get(fund_id, ()))
+        if not queues or loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._put, queues, payload)
+
+    @staticmethod
+    def _put(queues: List[asyncio.Queue], payload: dict):
+        for queue in queues:
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # A client this far behind reloads instead of replaying the backlog
+                logger.debug("Dropping event for a slow SSE client")
+
+
+broker = FundEventBroker()
+
+
+def _on_bus_message(message):
+    broker.deliver(message["fund_id"], message["event"])
+
+
+listen(EVENTS_CHANNEL, _on_bus_message)
+
+
+def publish_fund_event(fund_id: int, payload: dict):
+    """Send an event to every SSE client watching the fund, on all workers"""
+    cache = get_cache()
+    if cache is None:
+        broker.deliver(fund_id, payload)
+        return
+    try:
+        cache.publish(EVENTS_CHANNEL, {"fund_id": fund_id, "event": payload})
+    except Exception:
+        logger.exception("Publishing fund event failed, delivering locally only")
+        broker.deliver(fund_id, payload)
+
+
+def _action(session: Session, obj) -> str:
+    if obj in session.deleted:
+        return "deleted"
+    if obj in session.new:
+        return "marked"
+    status = getattr(obj, "status", None)
+    if status in ("verified", "rejected") and inspect(obj).attrs.status.history.has_changes():
+        return status
+    return "updated"
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_fund_events(session: Session, flush_context):
+    changed = [
+        obj for obj in (*session.new, *session.dirty, *session.deleted)
+        if isinstance(obj, (InstallmentPayment, MonthlyPaymentReceived, UserMonthAssignment))
+    ]
+    if not changed:
+        return
+
+    connection = session.connection()
+    month_ids = {obj.month_id for obj in changed}
+    fund_by_month = dict(connection.execute(
+        select(Month.id, Month.fund_id).where(Month.id.in_(month_ids))
+    ).all())
+
+    installment_month_ids = {obj.month_id for obj in changed if isinstance(obj, InstallmentPayment)}
+    verified_counts = {}
+    if installment_month_ids:
+        verified_counts = dict(connection.execute(
+            select(InstallmentPayment.month_id, func.count(InstallmentPayment.id)).where(
+                InstallmentPayment.month_id.in_(installment_month_ids),
+                InstallmentPayment.status == "verified"
+            ).group_by(InstallmentPayment.month_id)
+        ).all())
+
+    for obj in changed:
+        fund_id = fund_by_month.get(obj.month_id)
+        if fund_id is None:
+            continue
+        action = _action(session, obj)
+        if isinstance(obj, InstallmentPayment):
+            key = ("installment", obj.id)
+            payload = {
+                "type": "installment",
+                "action": action,
+                "month_id": obj.month_id,
+                "user_id": obj.user_id,
+                "payment_id": obj.id,
+                "status": None if action == "deleted" else obj.status,
+                "verified_count": verified_counts.get(obj.month_id, 0),
+            }
+        elif isinstance(obj, MonthlyPaymentReceived):
+            key = ("monthly_payment", obj.id)
+            payload = {
+                "type": "monthly_payment",
+                "action": action,
+                "month_id": obj.month_id,
+                "payment_id": obj.id,
+                "status": None if action == "deleted" else obj.status,
+            }
+        else:
+            key = ("assignment", obj.month_id)
+            payload = {
+                "type": "assignment",
+                "action": "deleted" if action == "deleted" else "updated",
+                "month_id": obj.month_id,
+                "user_id": None if action == "deleted" else obj.user_id,
+            }
+        queue_fund_event(session, fund_id, key, payload)
+
+
+def queue_fund_event(session: Session, fund_id: int, key: tuple, payload: dict):
+    """
+    Publish payload when the session commits. Changes made with Core
+    statements (see app/upserts.py) don't pass through after_flush and
+    queue their events here themselves.
+    """
+    # Keyed so a row changed several times in one transaction yields its final state only
+    pending = session.info.setdefault("fund_events", {})
+    if key in pending and pending[key][1]["action"] == "marked" and payload["action"] != "deleted":
+        # Still a new row as far as clients are concerned
+        payload["action"] = "marked"
+    pending[key] = (fund_id, payload)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_fund_events(session: Session):
+    pending = session.info.pop("fund_events", None)
+    if not pending:
+        return
+    for fund_id, payload in pending.values():
+        publish_fund_event(fund_id, payload)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_fund_events(session: Session):
+    session.info.pop("fund_events", None)
+
+
+def event_for_viewer(payload: dict, viewer_id: int, is_admin: bool) -> dict:
+    """The part of an event the viewer may see"""
+    if is_admin:
+        return payload
+    own = payload.get("user_id") == viewer_id
+    if payload["type"] == "installment" and not own:
+        # Other members' payments only show up in the month's paid count
+        return {key: payload[key] for key in ("type", "action", "month_id", "verified_count")}
+    visible = {key: value for key, value in payload.items() if key != "payment_id"}
+    if "user_id" in visible and not own:
+        visible["user_id"] = None
+    return visible
+
+
+def format_sse(payload: dict) -> str:
+    return f"event: {payload['type']}\ndata: {json.dumps(payload)}\n\n"
+
+
+async def fund_event_stream(request, fund_id: int, viewer_id: int, is_admin: bool):
+    """Yield SSE frames for a fund, shaped for the viewer, until the client disconnects"""
+    # Creating the backend attaches the bus listener in this worker
+    get_cache()
+    queue = broker.subscribe(fund_id)
+    try:
+        # Tell EventSource how long to wait before reconnecting
+        yield "retry: 5000\n\n"
+        while True:
+            try:
+                payload = await asyncio.wait_for(queue.get(), timeout=HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    break
+                yield ": keepalive\n\n"
+                continue
+            yield format_sse(event_for_viewer(payload, viewer_id, is_admin))
+    finally:
+        broker.unsubscribe(fund_id, queue)
@@ -0,0 +1,146 @@
+"""
+Immutable per-fund snapshots cached in each worker.
+
+A FundSnapshot holds the fund row, its ordered months, the member id set and
+the month -> user assignment map. These change rarely, so instead of
+re-querying them on every request the snapshot is cached per worker and
+revalidated against the fund's ("fund_meta", fund_id) change version - a
+single primary-key lookup. Fund-mutating endpoints invalidate snapshots by
+calling bump_fund_metadata_version() (see app/versioning.py); with a shared
+cache configured, other workers also drop the snapshot as soon as the bump
+is published on the invalidation channel.
+"""
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from decimal import Decimal
+from types import MappingProxyType
+from typing import Dict, FrozenSet, Mapping, Optional, Tuple
+from sqlalchemy.orm import Session
+from app.models import Fund, Month, UserMonthAssignment, fund_members
+from app.cache import INVALIDATION_CHANNEL, listen
+from app.versioning import fund_meta_scope, get_versions
+
+
+@dataclass(frozen=True)
+class FundRow:
+    id: int
+    name: str
+    description: Optional[str]
+    total_amount: Decimal
+    number_of_months: int
+    created_by: int
+    created_at: datetime
+    is_archived: bool
+    is_deleted: bool
+    guest_visible: bool
+
+
+@dataclass(frozen=True)
+class MonthRow:
+    id: int
+    fund_id: int
+    month_name: str
+    month_number: int
+    installment_amount: Decimal
+    payment_amount: Decimal
+    year: int
+
+
+@dataclass(frozen=True)
+class FundSnapshot:
+    version: int
+    fund: FundRow
+    months: Tuple[MonthRow, ...]  # Ordered by month_number
+    member_ids: FrozenSet[int]
+    assignments: Mapping[int, int]  # month_id -> assigned user_id
+
+    @property
+    def month_ids(self) -> Tuple[int, ...]:
+        return tuple(m.id for m in self.months)
+
+    def get_month(self, month_id: int) -> Optional[MonthRow]:
+        return next((m for m in self.months if m.id == month_id), None)
+
+
+_snapshots: Dict[int, FundSnapshot] = {}
+_lock = threading.Lock()
+
+
+def _load_snapshot(db: Session, fund_id: int, version: int) -> Optional[FundSnapshot]:
+    fund = db.query(Fund).filter(Fund.id == fund_id).first()
+    if not fund:
+        return None
+    months = db.query(Month).filter(Month.fund_id == fund_id).order_by(Month.month_number).all()
+    member_ids = db.query(fund_members.c.user_id).filter(fund_members.c.fund_id == fund_id).all()
+    assignments = db.query(UserMonthAssignment.month_id, UserMonthAssignment.user_id).join(
+        Month, Month.id == UserMonthAssignment.month_id
+    ).filter(Month.fund_id == fund_id).all()
+
+    return FundSnapshot(
+        version=version,
+        fund=FundRow(
+            id=fund.id,
+            name=fund.name,
+            description=fund.description,
+            total_amount=fund.total_amount,
+            number_of_months=fund.number_of_months,
+            created_by=fund.created_by,
+            created_at=fund.created_at,
+            is_archived=fund.is_archived,
+            is_deleted=fund.is_deleted,
+            guest_visible=fund.guest_visible,
+        ),
+        months=tuple(
+            MonthRow(
+                id=m.id,
+                fund_id=m.fund_id,
+                month_name=m.month_name,
+                month_number=m.month_number,
+                installment_amount=m.installment_amount,
+                payment_amount=m.payment_amount,
+                year=m.year,
+            )
+            for m in months
+        ),
+        member_ids=frozenset(user_id for (user_id,) in member_ids),
+        assignments=MappingProxyType({month_id: user_id for month_id, user_id in assignments}),
+    )
+
+
+def get_fund_snapshot(db: Session, fund_id: int) -> Optional[FundSnapshot]:
+    """
+    Return the cached snapshot for a fund, reloading it if its version changed.
+    Returns None if the fund does not exist.
+    """
+    scope = fund_meta_scope(fund_id)
+    version = get_versions(db, [scope]).get(scope, (0, None))[0]
+
+    snapshot = _snapshots.get(fund_id)
+    if snapshot is not None and snapshot.version == version:
+        return snapshot
+
+    # Data loaded after reading the version is at least as new as that version,
+    # so a concurrent bump can only cause one extra reload, never a stale hit.
+    snapshot = _load_snapshot(db, fund_id, version)
+    with _lock:
+        if snapshot is None:
+            _snapshots.pop(fund_id, None)
+        else:
+            _snapshots[fund_id] = snapshot
+    return snapshot
+
+
+def invalidate_fund_snapshot(fund_id: int):
+    """Drop a fund's cached snapshot from this worker"""
+    with _lock:
+        _snapshots.pop(fund_id, None)
+
+
+def _on_invalidate(message):
+    for scope, scope_id in message.get("scopes", []):
+        if scope == "fund_meta":
+            invalidate_fund_snapshot(scope_id)
+
+
+listen(INVALIDATION_CHANNEL, _on_invalidate)
@@ -1,6 +1,8 @@
 """
 Helper functions for the application
 """
+from typing import Dict, Iterable, Optional
+from fastapi import Request
 from app.models import User
 
 def get_user_display_name(user: User, current_user: User = None) -> str:
@@ -86,3 +88,41 @@ def get_user_display_info(user: User, current_user: User = None) -> dict:
         "customer_id": user.customer_id
     }
 
+UNKNOWN_USER_DISPLAY = {"display_name": "Unknown", "identifier": "N/A"}
+
+class DisplayNameResolver:
+    """
+    Display info for every user shown on a page, as seen by one viewer.
+    Each user is resolved once (same rules as get_user_display_info), so grid
+    pages cost O(users) instead of O(cells). The returned dicts are shared
+    between rows and must not be modified.
+    """
+
+    def __init__(self, current_user: Optional[User]):
+        self.current_user = current_user
+        self._by_user_id: Dict[int, dict] = {}
+
+    def prime(self, users: Iterable[Optional[User]]) -> "DisplayNameResolver":
+        """Resolve all users referenced on a page in one pass"""
+        for user in users:
+            if user is not None and user.id not in self._by_user_id:
+                self._by_user_id[user.id] = get_user_display_info(user, self.current_user)
+        return self
+
+    def info(self, user: Optional[User]) -> dict:
+        if not user:
+            return UNKNOWN_USER_DISPLAY
+        info = self._by_user_id.get(user.id)
+        if info is None:
+            info = self._by_user_id[user.id] = get_user_display_info(user, self.current_user)
+        return info
+
+    def name(self, user: Optional[User]) -> str:
+        return self.info(user)["display_name"]
+
+def get_display_resolver(request: Request, current_user: Optional[User]) -> DisplayNameResolver:
+    """The request's DisplayNameResolver for current_user, created on first use"""
+    resolver = getattr(request.state, "display_resolver", None)
+    if resolver is None or resolver.current_user is not current_user:
+        resolver = request.state.display_resolver = DisplayNameResolver(current_user)
+    return resolver
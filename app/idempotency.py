@@ -0,0 +1,153 @@
+"""
+Idempotent payment submission.
+
+The payment forms send an idempotency key (Idempotency-Key header or
+idempotency_key form field) that stays the same for every retry of one
+submission, e.g. a double click or a resend after a dropped mobile
+connection. The response of the first submission is stored under
+(user, key) in the same transaction as the payment itself, and retries get
+it back without another write or audit entry. If two copies of a request run
+concurrently, the primary key lets only one of them commit. The other one
+rolls back and returns the winner's response.
+
+Independently of keys, a transaction reference can back only one live
+(pending or verified) installment payment per fund. This is enforced by a
+partial unique index on installment_payments (fund_id, transaction_id).
+
+Environment variables:
+- FUNDMGR_IDEMPOTENCY_TTL_HOURS: how long a key is remembered (default: 24)
+"""
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional, Tuple
+from fastapi import HTTPException, Request
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from app.models import IdempotencyKey, InstallmentPayment
+from app.write_queue import run_write
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_FIELD = "idempotency_key"
+MAX_KEY_LENGTH = 200
+IDEMPOTENCY_TTL = timedelta(hours=float(os.environ.get("FUNDMGR_IDEMPOTENCY_TTL_HOURS", "24")))
+
+DUPLICATE_TRANSACTION_DETAIL = "This transaction ID has already been submitted for this fund"
+
+
+def get_idempotency_key(request: Request, form_value: Optional[str] = None) -> Optional[str]:
+    """The request's idempotency key (header first, then form field), or None"""
+    key = (request.headers.get(IDEMPOTENCY_HEADER) or form_value or "").strip()
+    if not key:
+        return None
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency key must be at most {MAX_KEY_LENGTH} characters")
+    return key
+
+
+def check_transaction_id(db: Session, fund_id: int, transaction_id: Optional[str], exclude_payment_id: Optional[int] = None):
+    """Reject a transaction ID already used by a live payment in the fund (409)"""
+    if not transaction_id:
+        return
+    query = select(InstallmentPayment.id).where(
+        InstallmentPayment.fund_id == fund_id,
+        InstallmentPayment.transaction_id == transaction_id,
+        InstallmentPayment.status != "rejected"
+    )
+    if exclude_payment_id is not None:
+        query = query.where(InstallmentPayment.id != exclude_payment_id)
+    if db.execute(query.limit(1)).first():
+        raise HTTPException(status_code=409, detail=DUPLICATE_TRANSACTION_DETAIL)
+
+
+def _is_duplicate_transaction(error: IntegrityError) -> bool:
+    message = str(error.orig)
+    return "transaction_id" in message or "uq_installment_payments_fund_transaction" in message
+
+
+async def run_payment_write(db: Session, job: Callable[[Session], Any]) -> Any:
+    """run_write() that answers a transaction ID taken concurrently with the same 409 as submission"""
+    try:
+        return await run_write(db, job)
+    except IntegrityError as e:
+        db.rollback()
+        if _is_duplicate_transaction(e):
+            raise HTTPException(status_code=409, detail=DUPLICATE_TRANSACTION_DETAIL)
+        raise
+
+
+class Idempotency:
+    """
+    One request's idempotency key. Without a key every method degrades to
+    the plain behaviour (no replay, ordinary write).
+    """
+
+    def __init__(self, db: Session, user_id: int, key: Optional[str], endpoint: str, params: Dict[str, Any]):
+        self.db = db
+        self.user_id = user_id
+        self.key = key
+        self.endpoint = endpoint
+        # Reusing a key with different parameters is a client bug, not a retry
+        self.request_hash = hashlib.sha256(
+            json.dumps(params, sort_keys=True, default=str).encode("utf-8")
+        ).hexdigest()
+
+    def replay(self) -> Optional[dict]:
+        """The stored response of an earlier request with this key, if any"""
+        if self.key is None:
+            return None
+        row = self.db.execute(
+            select(IdempotencyKey).where(
+                IdempotencyKey.user_id == self.user_id,
+                IdempotencyKey.key == self.key,
+                IdempotencyKey.expires_at > datetime.utcnow()
+            )
+        ).scalar_one_or_none()
+        if row is None:
+            return None
+        if row.endpoint != self.endpoint or row.request_hash != self.request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency key was already used for a different request")
+        return json.loads(row.response_body)
+
+    def _remember(self, session: Session, response: dict):
+        now = datetime.utcnow()
+        # Expired keys are cleared here (their key may be reused now)
+        session.execute(delete(IdempotencyKey).where(IdempotencyKey.expires_at <= now))
+        session.execute(insert(IdempotencyKey).values(
+            user_id=self.user_id,
+            key=self.key,
+            endpoint=self.endpoint,
+            request_hash=self.request_hash,
+            response_body=json.dumps(response, default=str),
+            created_at=now,
+            expires_at=now + IDEMPOTENCY_TTL
+        ))
+
+    async def write(self, job: Callable[[Session], dict]) -> Tuple[dict, bool]:
+        """
+        Run job(session) with run_write() and store the response it returns
+        under the key in the same transaction. Returns (response, replayed);
+        replayed is True when a concurrent request with the same key
+        committed first, in which case this request's changes were rolled
+        back and the caller must skip its side effects (such as the audit
+        log entry).
+        """
+        def write_and_remember(session: Session) -> dict:
+            response = job(session)
+            if self.key is not None:
+                self._remember(session, response)
+            return response
+
+        try:
+            response = await run_write(self.db, write_and_remember)
+        except IntegrityError as e:
+            self.db.rollback()
+            replayed = self.replay()
+            if replayed is not None:
+                return replayed, True
+            if _is_duplicate_transaction(e):
+                raise HTTPException(status_code=409, detail=DUPLICATE_TRANSACTION_DETAIL)
+            raise
+        return response, False
@@ -0,0 +1,33 @@
+"""
+Ledger aggregations computed in SQL.
+
+These return plain tuples instead of ORM objects, so dashboards can show
+per-month counts and totals without loading individual payment rows.
+"""
+from decimal import Decimal
+from typing import List, Tuple
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+from app.models import InstallmentPayment, Month
+
+
+def verified_installment_totals(db: Session, fund_id: int) -> List[Tuple[int, int, Decimal]]:
+    """
+    Per-month verified installments for a fund as (month_id, count, total_amount).
+    Months without verified installments are omitted.
+    
+    SELECT month_id, COUNT(*), SUM(months.installment_amount) ... GROUP BY month_id
+    """
+    rows = db.query(
+        InstallmentPayment.month_id,
+        func.count(InstallmentPayment.id),
+        func.sum(Month.installment_amount)
+    ).join(
+        Month, Month.id == InstallmentPayment.month_id
+    ).filter(
+        Month.fund_id == fund_id,
+        InstallmentPayment.status == "verified"
+    ).group_by(
+        InstallmentPayment.month_id
+    ).all()
+    return [(month_id, count, total) for month_id, count, total in rows]
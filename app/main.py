@@ -1,10 +1,15 @@
 from fastapi import FastAPI, Request
-from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.templating import Jinja2Templates
-from app.database import engine, Base
-from app.routers import auth, users, admin, payments, funds
+from app import APP_VERSION
+from app.database import engine, schema_lock
+from app.routers import auth, users, admin, payments, funds, api_v1
+from app.templating import IS_PRODUCTION, PRECOMPILE_TEMPLATES, precompile_templates
+from app.static_assets import init_static_assets
+from app.static_assets import StaticAssets
+from app.compression import GZipCompressionMiddleware
+from app.admission import ADMISSION_ENABLED, AdmissionControlMiddleware
+from app.write_queue import stop_write_queue
 import logging
 
 from srs_audit import init_audit
@@ -14,11 +19,8 @@ from srs_audit.fastapi import AuditMiddleware, metrics_route
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
-
-# Initialize shared audit library (uses same SQLite DB)
-audit_logger = init_audit(service_name="fundmgr", db_engine=engine, version="1.0.0")
+# Schema creation and migrations are done by migrate.py before the server starts,
+# so importing the app (once per worker) runs no DDL
 
 # Create FastAPI app
 app = FastAPI(title="Fund Management System")
@@ -28,7 +30,7 @@ app.add_middleware(
     AuditMiddleware,
     service_name="fundmgr",
     db_engine=engine,
-    version="1.0.0",
+    version=APP_VERSION,
 )
 
 # CORS middleware
@@ -40,10 +42,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Mount static files
+# Mount static files (fingerprinted copies under /static/dist/ are served precompressed
+# with immutable caching, see app/static_assets.py)
 import os
 static_dir = os.path.join(os.path.dirname(__file__), "static")
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
+app.mount("/static", StaticAssets(directory=static_dir), name="static")
 
 # Prometheus metrics endpoint
 app.include_router(metrics_route)
@@ -54,11 +57,36 @@ app.include_router(funds.router)
 app.include_router(users.router)
 app.include_router(admin.router)
 app.include_router(payments.router)
+app.include_router(api_v1.router)
+
+# Initialize shared audit library (uses same SQLite DB) in every worker process.
+# Runs at startup rather than import so a preloading master never shares it across forks.
+@app.on_event("startup")
+async def init_audit_logger():
+    with schema_lock():
+        init_audit(service_name="fundmgr", db_engine=engine, version=APP_VERSION)
+
+# The development server rebuilds fingerprinted assets so CSS/JS edits show up
+# after a reload; production serves the ones built at deploy time
+@app.on_event("startup")
+async def build_static_assets():
+    if not IS_PRODUCTION:
+        init_static_assets(rebuild=True)
+
+# Compile all templates before the first request instead of on first render
+@app.on_event("startup")
+async def warm_template_cache():
+    if PRECOMPILE_TEMPLATES:
+        precompile_templates()
+
+# Commit writes still queued for the writer thread before the worker exits
+@app.on_event("shutdown")
+async def drain_write_queue():
+    stop_write_queue()
 
 # Root redirect
 @app.get("/")
 async def root(request: Request):
-    from fastapi import Request as FastAPIRequest
     # Check if user is logged in
     token = request.cookies.get("access_token")
     if token:
@@ -84,6 +112,13 @@ class CookieAuthMiddleware(BaseHTTPMiddleware):
 
 app.add_middleware(CookieAuthMiddleware)
 
+# Wraps everything except admission control, so it compresses the final HTML/JSON body (SSE and static files pass through)
+app.add_middleware(GZipCompressionMiddleware)
+
+# Added last so it runs first: a shed request costs no auth, audit or compression work
+if ADMISSION_ENABLED:
+    app.add_middleware(AdmissionControlMiddleware)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=3434)
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Boolean, Table
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Table, Index, text
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from app.database import Base
+from app.money import Money
 
 # Association table for many-to-many relationship between Users and Funds
 fund_members = Table(
@@ -17,7 +18,7 @@ class Fund(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
-    total_amount = Column(Float, nullable=False)  # Total fund amount (e.g., 1.5 Lakh)
+    total_amount = Column(Money, nullable=False)  # Total fund amount (e.g., 1.5 Lakh)
     number_of_months = Column(Integer, default=10)
     created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -64,11 +65,11 @@ class Month(Base):
     __tablename__ = "months"
     
     id = Column(Integer, primary_key=True, index=True)
-    fund_id = Column(Integer, ForeignKey("funds.id"), nullable=False)
+    fund_id = Column(Integer, ForeignKey("funds.id"), nullable=False, index=True)
     month_name = Column(String, nullable=False)  # Jan, Feb, etc.
     month_number = Column(Integer, nullable=False)  # 1-10
-    installment_amount = Column(Float, nullable=False)
-    payment_amount = Column(Float, nullable=False)
+    installment_amount = Column(Money, nullable=False)
+    payment_amount = Column(Money, nullable=False)
     year = Column(Integer, default=2026)
     
     # Relationships
@@ -93,10 +94,23 @@ class UserMonthAssignment(Base):
 
 class InstallmentPayment(Base):
     __tablename__ = "installment_payments"
+    __table_args__ = (
+        # Fund-scoped lookups: per-month payments and one user's payments for a fund's months
+        Index("ix_installment_payments_month_user", "month_id", "user_id"),
+        Index("ix_installment_payments_user_month", "user_id", "month_id"),
+        # A transaction reference can back only one live (non-rejected) payment per fund
+        Index(
+            "uq_installment_payments_fund_transaction", "fund_id", "transaction_id",
+            unique=True,
+            sqlite_where=text("transaction_id IS NOT NULL AND status != 'rejected'"),
+            postgresql_where=text("transaction_id IS NOT NULL AND status != 'rejected'")
+        ),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     month_id = Column(Integer, ForeignKey("months.id"), nullable=False)
+    fund_id = Column(Integer, ForeignKey("funds.id"), nullable=False, index=True)  # Copy of months.fund_id
     paid_at = Column(DateTime, default=datetime.utcnow)
     payment_date = Column(DateTime, nullable=True)  # User-provided payment date
     transaction_id = Column(String, nullable=True)  # Transaction ID/Reference
@@ -121,7 +135,7 @@ class MonthlyPaymentReceived(Base):
     marked_by = Column(Integer, ForeignKey("users.id"), nullable=False)  # Admin who marked it as received
     verified_by = Column(Integer, ForeignKey("users.id"), nullable=True)
     status = Column(String, default="pending")  # "pending", "verified", or "rejected"
-    amount = Column(Float, nullable=False)  # Amount received (from month.payment_amount)
+    amount = Column(Money, nullable=False)  # Amount received (from month.payment_amount)
     
     # Relationships
     month = relationship("Month", back_populates="payment_received")
@@ -146,3 +160,61 @@ class AuditLog(Base):
     user = relationship("User", foreign_keys=[user_id], viewonly=True)
     fund = relationship("Fund", foreign_keys=[fund_id], viewonly=True)
 
+
+class ChangeVersion(Base):
+    __tablename__ = "change_versions"
+    
+    scope = Column(String, primary_key=True)  # "fund", "funds" or "users"
+    scope_id = Column(Integer, primary_key=True, default=0)  # Fund id for "fund", 0 otherwise
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
+
+class Counter(Base):
+    __tablename__ = "counters"
+    
+    name = Column(String, primary_key=True)  # e.g. "customer_id"
+    value = Column(Integer, nullable=False, default=0)  # Last value handed out
+
+
+class ScheduleTemplate(Base):
+    __tablename__ = "schedule_templates"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    description = Column(String, nullable=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    # Relationships
+    months = relationship(
+        "ScheduleTemplateMonth",
+        back_populates="template",
+        cascade="all, delete-orphan",
+        order_by="ScheduleTemplateMonth.month_number"
+    )
+
+
+class ScheduleTemplateMonth(Base):
+    __tablename__ = "schedule_template_months"
+    
+    template_id = Column(Integer, ForeignKey("schedule_templates.id", ondelete="CASCADE"), primary_key=True)
+    month_number = Column(Integer, primary_key=True)  # 1-based position in the schedule
+    month_name = Column(String, nullable=False)
+    installment_amount = Column(Money, nullable=False)
+    payment_amount = Column(Money, nullable=False)
+    
+    # Relationships
+    template = relationship("ScheduleTemplate", back_populates="months")
+
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+    
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    key = Column(String, primary_key=True)  # Client-generated, unique per user
+    endpoint = Column(String, nullable=False)  # Request path the key was used on
+    request_hash = Column(String, nullable=False)  # Fingerprint of the request parameters
+    response_body = Column(String, nullable=False)  # JSON replayed to retries
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    expires_at = Column(DateTime, nullable=False, index=True)
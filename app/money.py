@@ -0,0 +1,79 @@
+"""
+Fixed-point money handling.
+
+Amounts are stored as integer paise (1 rupee = 100 paise), so ledger totals
+are exact and can be summed by the database. In Python they surface as
+Decimal rupees with two decimal places, which format and compare like the
+old floats did ("{:,.2f}".format(amount), float(amount), etc.).
+
+Amounts from requests must be finite and within 0..MAX_AMOUNT rupees (far
+below the 64-bit paise limit, and exact as a float). Form and body fields
+declare that with AMOUNT_CONSTRAINTS; to_paise() refuses anything else.
+"""
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional
+from sqlalchemy import Integer
+from sqlalchemy.types import TypeDecorator
+
+PAISE_PER_RUPEE = 100
+_ONE = Decimal(1)
+_CENT = Decimal("0.01")
+
+MAX_AMOUNT = Decimal(10 ** 15)  # Rupees; 10**17 paise fits a 64-bit INTEGER column
+# Keyword arguments for Form()/Field() amount parameters
+AMOUNT_CONSTRAINTS = {"ge": 0, "le": float(MAX_AMOUNT), "allow_inf_nan": False}
+
+
+def check_amount(amount) -> Decimal:
+    """
+    A rupee amount from user input as Decimal. Raises ValueError unless it is
+    a finite number between 0 and MAX_AMOUNT.
+    """
+    try:
+        value = amount if isinstance(amount, Decimal) else Decimal(str(amount).strip())
+    except ArithmeticError:
+        raise ValueError(f"{amount!r} is not a number")
+    if not value.is_finite():
+        raise ValueError("amount must be a finite number")
+    if value < 0 or value > MAX_AMOUNT:
+        raise ValueError(f"amount must be between 0 and {MAX_AMOUNT:,}")
+    return value
+
+
+def to_paise(amount) -> Optional[int]:
+    """Convert a rupee amount (Decimal, int, float or numeric string) to integer paise"""
+    if amount is None:
+        return None
+    if not isinstance(amount, Decimal):
+        # str() avoids binary float artefacts, e.g. 0.1 -> Decimal("0.1")
+        amount = Decimal(str(amount))
+    # Checked before scaling: quantize() can't represent huge values, and NaN has no integer
+    if not amount.is_finite() or abs(amount) > MAX_AMOUNT:
+        raise ValueError(f"Amount {amount} is not a finite value within {MAX_AMOUNT:,} rupees")
+    return int((amount * PAISE_PER_RUPEE).quantize(_ONE, rounding=ROUND_HALF_UP))
+
+
+def from_paise(paise) -> Optional[Decimal]:
+    """Convert integer paise to Decimal rupees"""
+    if paise is None:
+        return None
+    if isinstance(paise, float):
+        # A REAL here is a rupee amount from a database still on the old schema.
+        # Reading it as paise would be off by 100x, so refuse instead.
+        raise ValueError(
+            f"Money column holds the float {paise!r} instead of integer paise; "
+            "run migrate.py to convert the database"
+        )
+    return (Decimal(int(paise)) / PAISE_PER_RUPEE).quantize(_CENT)
+
+
+class Money(TypeDecorator):
+    """Column type storing rupee amounts as integer paise"""
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return to_paise(value)
+
+    def process_result_value(self, value, dialect):
+        return from_paise(value)
@@ -1,38 +1,33 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request, Form, File, UploadFile
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, joinedload
+from datetime import datetime, timedelta
+import json
 import logging
-from app.database import get_db
+from app.database import SessionLocal, get_db
 from app.auth import get_current_admin_user, get_password_hash, verify_password
-from app.models import User, Month, InstallmentPayment, Fund, MonthlyPaymentReceived
+from app.models import User, Month, InstallmentPayment, Fund, MonthlyPaymentReceived, AuditLog
 from app.models import UserMonthAssignment as UMA  # Import with alias to avoid local variable issues
 from app.schemas import UserCreate, UserResponse
 from app.dependencies import get_current_fund, get_optional_fund
-from app.helpers import get_user_display_info
+from app.fund_cache import FundSnapshot
+from app.access import add_fund_member, add_fund_members
+from app.bulk_import import ImportFormatError, create_users, hash_passwords, parse_import, validate_rows
+from app.counters import allocate_customer_id, claim_customer_id
+from app.idempotency import Idempotency, check_transaction_id, get_idempotency_key, run_payment_write
+from app.upserts import current_assignee, delete_assignment, resubmit_rejected_payment, upsert_assignment, upsert_monthly_payment
+from app.write_queue import run_write
+from app.helpers import get_display_resolver
 from app.audit import log_action
+from app.templating import templates
+from app.timezone_utils import format_datetimes_ist
+from app.conditional import build_validators, not_modified, apply_validators
+from app.versioning import FUNDS_SCOPE, USERS_SCOPE, fund_scope, bump_fund_version, bump_fund_metadata_version, bump_users_version
 from typing import Optional
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
-import os
-template_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "templates")
-templates = Jinja2Templates(directory=template_dir)
-
-# Add IST timezone filter to templates
-from app.timezone_utils import utc_to_ist
-import pytz
-IST = pytz.timezone('Asia/Kolkata')
-
-def format_ist(dt, format_str='%Y-%m-%d %H:%M:%S'):
-    """Jinja2 filter to format datetime in IST"""
-    if dt is None:
-        return None
-    ist_dt = utc_to_ist(dt)
-    return ist_dt.strftime(format_str)
-
-templates.env.filters['ist'] = format_ist
 
 @router.get("/admin/dashboard", response_class=HTMLResponse)
 async def admin_dashboard(
@@ -41,7 +36,6 @@ async def admin_dashboard(
     db: Session = Depends(get_db)
 ):
     # Redirect admin dashboard to /funds (consolidated dashboard)
-    from fastapi.responses import RedirectResponse
     return RedirectResponse(url="/funds", status_code=302)
 
 @router.get("/admin/users", response_class=HTMLResponse)
@@ -51,11 +45,11 @@ async def admin_users(
     db: Session = Depends(get_db)
 ):
     # Eager load funds relationship for each user
-    from sqlalchemy.orm import joinedload
     users = db.query(User).options(joinedload(User.funds)).all()
+    funds = db.query(Fund).filter(Fund.is_deleted == False).order_by(Fund.name).all()
     return templates.TemplateResponse(
         "admin_users.html",
-        {"request": request, "user": current_user, "users": users}
+        {"request": request, "user": current_user, "users": users, "funds": funds}
     )
 
 @router.post("/admin/users")
@@ -82,17 +76,8 @@ async def create_user(
             status_code=400
         )
     
-    # Generate customer_id if not provided (for new users)
-    # Get the highest customer_id number and increment
-    last_customer = db.query(User).filter(User.customer_id.isnot(None)).order_by(User.customer_id.desc()).first()
-    if last_customer and last_customer.customer_id:
-        try:
-            last_num = int(last_customer.customer_id.replace('C', ''))
-            new_customer_id = f"C{last_num + 1:03d}"
-        except:
-            new_customer_id = f"C{db.query(User).count() + 1:03d}"
-    else:
-        new_customer_id = f"C{db.query(User).count() + 1:03d}"
+    # Next customer ID from the counters table (constant time, safe across workers)
+    new_customer_id = allocate_customer_id(db)
     
     # Create user
     new_user = User(
@@ -103,6 +88,7 @@ async def create_user(
         role=role
     )
     db.add(new_user)
+    bump_users_version(db)
     db.commit()
     db.refresh(new_user)
     
@@ -124,6 +110,71 @@ async def create_user(
     
     return RedirectResponse(url="/admin/users", status_code=302)
 
+@router.post("/admin/users/import")
+async def import_users(
+    request: Request,
+    file: UploadFile = File(...),
+    fund_id: Optional[int] = Form(None),
+    dry_run: bool = Form(False),
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Create many users from a CSV or JSON file (see app/bulk_import.py for the format).
+    Invalid rows are skipped; the JSON report gives every row's status and errors.
+    With fund_id the new users also join that fund. dry_run only validates.
+    """
+    try:
+        rows = parse_import(await file.read(), file.filename or "")
+    except ImportFormatError as e:
+        return JSONResponse({"detail": str(e)}, status_code=400)
+    
+    fund = None
+    if fund_id is not None:
+        fund = db.query(Fund).filter(Fund.id == fund_id, Fund.is_deleted == False).first()
+        if not fund:
+            return JSONResponse({"detail": "Fund not found"}, status_code=404)
+    
+    validate_rows(db, rows)
+    valid_rows = [row for row in rows if not row.errors]
+    
+    created = []
+    if valid_rows and not dry_run:
+        password_hashes = await hash_passwords([row.password for row in valid_rows])
+        created = create_users(db, valid_rows, password_hashes, fund_id)
+        if created:
+            bump_users_version(db)
+            if fund_id is not None:
+                bump_fund_metadata_version(db, fund_id)
+            db.commit()
+    
+    error_count = sum(1 for row in rows if row.errors)
+    
+    if created:
+        log_action(
+            db=db,
+            user_id=current_user.id,
+            action_type="USERS_IMPORTED",
+            action_description=f"Imported {len(created)} users from {file.filename or 'upload'}"
+                               + (f" into fund {fund.name}" if fund else ""),
+            request=request,
+            fund_id=fund_id,
+            details={
+                "created": len(created),
+                "errors": error_count,
+                "user_ids": [row.user_id for row in created]
+            }
+        )
+    
+    return JSONResponse({
+        "dry_run": dry_run,
+        "fund_id": fund_id,
+        "total": len(rows),
+        "created": len(created),
+        "errors": error_count,
+        "rows": [row.report() for row in rows]
+    })
+
 @router.post("/admin/users/update-alias")
 async def update_user_alias(
     request: Request,
@@ -137,6 +188,7 @@ async def update_user_alias(
         raise HTTPException(status_code=404, detail="User not found")
     
     user.alias = alias.strip() if alias else None
+    bump_users_version(db)
     db.commit()
     
     return RedirectResponse(url="/admin/users", status_code=302)
@@ -169,6 +221,9 @@ async def update_user_customer_id(
         )
     
     user.customer_id = customer_id
+    # Keep the allocator from handing out this ID to a new user later
+    claim_customer_id(db, customer_id)
+    bump_users_version(db)
     db.commit()
     
     return RedirectResponse(url="/admin/users", status_code=302)
@@ -238,40 +293,23 @@ async def admin_reset_password(
 async def admin_months(
     request: Request,
     current_user: User = Depends(get_current_admin_user),
-    current_fund: Optional[Fund] = Depends(get_optional_fund),
+    snapshot: Optional[FundSnapshot] = Depends(get_optional_fund),
     db: Session = Depends(get_db)
 ):
-    
-    logger.info(f"=== admin_months called ===")
-    logger.info(f"admin_months: URL path={request.url.path}")
-    logger.info(f"admin_months: Full URL={request.url}")
-    logger.info(f"admin_months: query_params={dict(request.query_params)}")
-    logger.info(f"admin_months: cookies={dict(request.cookies)}")
-    
-    # DIRECT CHECK: Get fund_id from query param directly to verify
-    direct_fund_id_from_query = request.query_params.get("fund_id")
-    direct_fund_id_from_cookie = request.cookies.get("current_fund_id")
-    logger.info(f"admin_months: DIRECT CHECK - query fund_id={direct_fund_id_from_query}, cookie fund_id={direct_fund_id_from_cookie}")
-    
-    logger.info(f"admin_months: current_fund from dependency={current_fund.id if current_fund else None} ({current_fund.name if current_fund else 'None'})")
-    
-    # OVERRIDE: ALWAYS use query param if it exists, regardless of dependency result
-    # This ensures the URL query parameter always takes precedence
-    if direct_fund_id_from_query:
-        try:
-            query_fund_id = int(direct_fund_id_from_query)
-            query_fund = db.query(Fund).filter(Fund.id == query_fund_id).first()
-            if query_fund:
-                # Always override with query param fund
-                old_fund_info = f"{current_fund.id} ({current_fund.name})" if current_fund else "None"
-                current_fund = query_fund
-                logger.info(f"admin_months: OVERRIDE - Using query param fund {query_fund_id} ({query_fund.name}) instead of dependency fund {old_fund_info}")
-            else:
-                logger.info(f"admin_months: Query fund_id {query_fund_id} not found in database, keeping dependency result")
-        except (ValueError, TypeError) as e:
-            logger.info(f"admin_months: Invalid query fund_id format: {direct_fund_id_from_query}, error: {e}, keeping dependency result")
-    else:
-        logger.info(f"admin_months: No query param, using dependency result")
+    # get_optional_fund already prefers the query parameter over the cookie
+    current_fund = snapshot.fund if snapshot else None
+    
+    # Answer conditional requests before loading months, assignments and payments
+    validators = build_validators(
+        db, request, current_user,
+        [FUNDS_SCOPE, USERS_SCOPE] + ([fund_scope(current_fund.id)] if current_fund else []),
+        extra=[current_fund.id if current_fund else None]
+    )
+    cached = not_modified(request, validators)
+    if cached:
+        if current_fund:
+            cached.set_cookie(key="current_fund_id", value=str(current_fund.id), httponly=True, path="/", max_age=86400)
+        return cached
     
     # Get all funds for selection
     all_funds = db.query(Fund).all()
@@ -280,7 +318,7 @@ async def admin_months(
     # If no fund selected, show fund selection
     if not current_fund:
         logger.info("admin_months: No fund selected, showing fund selection page")
-        return templates.TemplateResponse(
+        response = templates.TemplateResponse(
             "admin_months_select.html",
             {
                 "request": request,
@@ -288,82 +326,65 @@ async def admin_months(
                 "funds": all_funds
             }
         )
+        return apply_validators(response, validators)
     
     logger.info(f"admin_months: FINAL - Using fund ID={current_fund.id}, name={current_fund.name} for template rendering")
     
-    # Fund selected, show months for that fund
-    months = db.query(Month).filter(Month.fund_id == current_fund.id).order_by(Month.month_number).all()
-    logger.info(f"admin_months: DEBUG - About to query UMA, months count: {len(months)}")
-    assignments = db.query(UMA).join(Month).filter(
-        Month.fund_id == current_fund.id
-    ).all()
-    logger.info(f"admin_months: DEBUG - Successfully queried assignments, count: {len(assignments)}")
+    # Months, members and assignments come from the cached fund snapshot
+    months = snapshot.months
+    assignment_map = snapshot.assignments  # month_id -> user_id
+    
     # Get all users in the system (not just fund members) for assignment
     users = db.query(User).filter(User.role == "user").all()
-    
-    logger.info(f"admin_months: Found {len(months)} months, {len(assignments)} assignments, {len(users)} users")
-    
-    assignment_map = {a.month_id: a for a in assignments}
-    
-    # Get all fund members (users only, not admin)
-    # IMPORTANT: Refresh the fund to ensure members relationship is loaded
-    db.refresh(current_fund, ['members'])
-    fund_members = [u for u in current_fund.members if u.role == "user"]
-    
-    # Also get users who have assignments in this fund (in case they're not members yet)
-    # Query UMA first, then get distinct users to avoid join ambiguity
-    month_ids_for_fund = [m.id for m in months]
-    logger.info(f"admin_months: DEBUG - Querying assignments_in_fund for {len(month_ids_for_fund)} months")
-    assignments_in_fund = db.query(UMA).filter(
-        UMA.month_id.in_(month_ids_for_fund)
-    ).all()
-    logger.info(f"admin_months: DEBUG - Found {len(assignments_in_fund)} assignments_in_fund")
-    
-    # Get unique user IDs from assignments
-    user_ids_with_assignments = set()
-    for assignment in assignments_in_fund:
-        user_ids_with_assignments.add(assignment.user_id)
-    
-    # Get users who have assignments but aren't fund members yet
-    if user_ids_with_assignments:
-        users_with_assignments = db.query(User).filter(
-            User.id.in_(list(user_ids_with_assignments)),
-            User.role == "user"
-        ).all()
-    else:
-        users_with_assignments = []
-    
-    # Combine both lists, removing duplicates
-    all_tracked_users = {u.id: u for u in fund_members}
-    for u in users_with_assignments:
-        if u.id not in all_tracked_users:
-            all_tracked_users[u.id] = u
-            # Add to fund if not already a member
-            if u not in current_fund.members:
-                current_fund.members.append(u)
-                logger.info(f"admin_months: Added user {u.full_name} to fund {current_fund.name} (has assignment)")
-    
-    fund_members = list(all_tracked_users.values())
-    db.commit()  # Commit any new member additions
+    users_by_id = {u.id: u for u in users}
+    
+    # Assigned users are normally regular users, but load any others so the assignment still shows
+    other_assigned_ids = set(assignment_map.values()) - users_by_id.keys()
+    assigned_users_by_id = dict(users_by_id)
+    if other_assigned_ids:
+        for u in db.query(User).filter(User.id.in_(other_assigned_ids)).all():
+            assigned_users_by_id[u.id] = u
+    
+    logger.info(f"admin_months: Found {len(months)} months, {len(assignment_map)} assignments, {len(users)} users")
+    
+    # Track all fund members (users only, not admin) plus users who have assignments
+    # in this fund (in case they're not members yet)
+    assigned_user_ids = {uid for uid in assignment_map.values() if uid in users_by_id}
+    fund_members = [u for u in users if u.id in snapshot.member_ids or u.id in assigned_user_ids]
+    
+    # Add assigned users to the fund if not already members
+    missing_member_ids = assigned_user_ids - snapshot.member_ids
+    if missing_member_ids:
+        # This is a GET, so db is read-only: the sync goes through its own writer session
+        with SessionLocal() as write_db:
+            add_fund_members(write_db, current_fund.id, missing_member_ids)
+            bump_fund_metadata_version(write_db, current_fund.id)
+            write_db.commit()
+        logger.info(f"admin_months: Added users {sorted(missing_member_ids)} to fund {current_fund.name} (have assignments)")
     
     logger.info(f"admin_months: Found {len(fund_members)} users to track: {[m.full_name for m in fund_members]}")
     
     if len(fund_members) == 0:
         logger.warning(f"admin_months: No fund members found for fund {current_fund.id} ({current_fund.name})")
-        logger.warning(f"admin_months: All members: {[m.full_name + ' (' + m.role + ')' for m in current_fund.members]}")
     
-    # Get all installment payments for this fund
-    all_installment_payments = db.query(InstallmentPayment).join(Month).filter(
-        Month.fund_id == current_fund.id
+    # Get all installment payments for this fund (marked/verified by users are shown in the details modal)
+    all_installment_payments = db.query(InstallmentPayment).options(
+        joinedload(InstallmentPayment.marked_by_user),
+        joinedload(InstallmentPayment.verified_by_user)
+    ).filter(
+        InstallmentPayment.month_id.in_(snapshot.month_ids)
     ).all()
     logger.info(f"admin_months: Found {len(all_installment_payments)} installment payments")
     
     # Create a map: (month_id, user_id) -> payment
     payment_map = {(p.month_id, p.user_id): p for p in all_installment_payments}
     
+    # Resolve each user's display info once for the whole grid
+    display = get_display_resolver(request, current_user).prime(assigned_users_by_id.values())
+    
     months_data = []
     for month in months:
-        assignment = assignment_map.get(month.id)
+        assigned_user = assigned_users_by_id.get(assignment_map.get(month.id))
         
         # Get payment status for each fund member for this month
         # IMPORTANT: Show ALL fund members, even if they haven't paid
@@ -372,12 +393,8 @@ async def admin_months(
         member_payments = []
         for member in fund_members:
             payment = payment_map.get((month.id, member.id))
-            # Eager load relationships if payment exists
-            if payment:
-                _ = payment.marked_by_user
-                _ = payment.verified_by_user
             # Get display info for the member
-            member_display = get_user_display_info(member, current_user)
+            member_display = display.info(member)
             member_payments.append({
                 "user": member,
                 "user_display": member_display,
@@ -388,31 +405,24 @@ async def admin_months(
         logger.debug(f"admin_months: Month {month.month_name} (ID: {month.id}) - {len(member_payments)} member entries created")
         
         # Get display info for assigned user
-        assigned_user_display = None
-        if assignment and assignment.user:
-            assigned_user_display = get_user_display_info(assignment.user, current_user)
+        assigned_user_display = display.info(assigned_user) if assigned_user else None
         
         months_data.append({
             "month": month,
-            "assignment": assignment,
-            "assigned_user": assignment.user if assignment else None,
+            "assigned_user": assigned_user,
             "assigned_user_display": assigned_user_display,
             "member_payments": member_payments
         })
     
     # Log summary
     logger.info(f"admin_months: Created months_data with {len(months_data)} months")
-    for md in months_data:
-        logger.info(f"admin_months: Month {md['month'].month_name} has {len(md['member_payments'])} member payment entries")
     
     # Set cookie for fund_id - always use the current_fund.id (which came from query param if present)
     fund_id_to_set = str(current_fund.id)
     
-    # Final verification before rendering
     logger.info(f"admin_months: RENDERING - Passing fund ID={current_fund.id}, name={current_fund.name} to template")
-    logger.info(f"admin_months: Template context - current_fund.id={current_fund.id}, current_fund.name={current_fund.name}")
     
-    response = templates.TemplateResponse(
+    response = templates.StreamingTemplateResponse(
         "admin_months.html",
         {
             "request": request,
@@ -427,7 +437,7 @@ async def admin_months(
     # Set cookie with the fund_id that was actually used (from query param if present, otherwise cookie)
     response.set_cookie(key="current_fund_id", value=fund_id_to_set, httponly=True, path="/", max_age=86400)
     logger.info(f"admin_months: Setting cookie current_fund_id={fund_id_to_set} for fund {current_fund.name}")
-    return response
+    return apply_validators(response, validators)
 
 @router.post("/admin/assign-month")
 async def assign_month(
@@ -444,11 +454,6 @@ async def assign_month(
     
     fund_id = month.fund_id
     
-    # Check if month is already assigned
-    existing = db.query(UMA).filter(
-        UMA.month_id == month_id
-    ).first()
-    
     if user_id:  # Only assign if user_id is provided
         # Get the user being assigned
         assigned_user = db.query(User).filter(User.id == user_id).first()
@@ -461,26 +466,14 @@ async def assign_month(
             raise HTTPException(status_code=404, detail="Fund not found")
         
         # IMPORTANT: Add user to fund if not already a member
-        if assigned_user not in fund.members:
-            fund.members.append(assigned_user)
+        if add_fund_member(db, assigned_user.id, fund_id):
             logger.info(f"assign_month: Added user {assigned_user.full_name} to fund {fund.name}")
         
-        old_user_id = None
-        if existing:
-            old_user_id = existing.user_id
-            # Update existing assignment
-            existing.user_id = user_id
-            existing.assigned_by = current_user.id
-            existing.assigned_at = datetime.utcnow()
-        else:
-            # Create new assignment
-            assignment = UMA(
-                user_id=user_id,
-                month_id=month_id,
-                assigned_by=current_user.id
-            )
-            db.add(assignment)
+        # Previous assignee for the audit entry; the upsert itself doesn't depend on it
+        old_user_id = current_assignee(db, month_id)
+        upsert_assignment(db, fund_id, month_id, user_id, current_user.id)
         
+        bump_fund_metadata_version(db, fund_id)
         db.commit()
         
         # Log action
@@ -498,14 +491,14 @@ async def assign_month(
                 "username": assigned_user.username,
                 "full_name": assigned_user.full_name,
                 "old_user_id": old_user_id,
-                "is_update": existing is not None
+                "is_update": old_user_id is not None
             }
         )
     else:
         # Remove assignment if user_id is empty
-        if existing:
-            old_user_id = existing.user_id
-            db.delete(existing)
+        old_user_id = delete_assignment(db, fund_id, month_id)
+        if old_user_id is not None:
+            bump_fund_metadata_version(db, fund_id)
             db.commit()
             
             # Log action
@@ -533,15 +526,27 @@ async def assign_month(
 async def admin_payments(
     request: Request,
     current_user: User = Depends(get_current_admin_user),
-    current_fund: Optional[Fund] = Depends(get_optional_fund),
+    snapshot: Optional[FundSnapshot] = Depends(get_optional_fund),
     db: Session = Depends(get_db)
 ):
+    current_fund = snapshot.fund if snapshot else None
+    
+    # Answer conditional requests before loading payments (filters are part of the URL, hence the ETag)
+    validators = build_validators(
+        db, request, current_user,
+        [FUNDS_SCOPE, USERS_SCOPE] + ([fund_scope(current_fund.id)] if current_fund else []),
+        extra=[current_fund.id if current_fund else None]
+    )
+    cached = not_modified(request, validators)
+    if cached:
+        return cached
+    
     # Get all funds for selection
     all_funds = db.query(Fund).all()
     
     # If no fund selected, show fund selection
     if not current_fund:
-        return templates.TemplateResponse(
+        response = templates.TemplateResponse(
             "admin_payments_select.html",
             {
                 "request": request,
@@ -549,14 +554,15 @@ async def admin_payments(
                 "funds": all_funds
             }
         )
+        return apply_validators(response, validators)
     
     # Fund selected, show payments for that fund
     # Get filter parameters
     filter_month_id = request.query_params.get("filter_month_id")
     filter_user_id = request.query_params.get("filter_user_id")
     
-    # Get all months for this fund (for filter dropdown)
-    months = db.query(Month).filter(Month.fund_id == current_fund.id).order_by(Month.month_number).all()
+    # Get all months for this fund (for filter dropdown) from the cached fund snapshot
+    months = snapshot.months
     
     # Get all users who have payments in this fund (for filter dropdown)
     # Explicitly specify the join condition to avoid ambiguous foreign key error
@@ -567,7 +573,11 @@ async def admin_payments(
     ).distinct().all()
     
     # Build query for installment payments with filters
-    installment_query = db.query(InstallmentPayment).join(Month).filter(
+    installment_query = db.query(InstallmentPayment).options(
+        joinedload(InstallmentPayment.user),
+        joinedload(InstallmentPayment.marked_by_user),
+        joinedload(InstallmentPayment.verified_by_user)
+    ).join(Month).filter(
         Month.fund_id == current_fund.id
     )
     
@@ -587,12 +597,13 @@ async def admin_payments(
     
     installment_payments = installment_query.order_by(InstallmentPayment.paid_at.desc()).all()
     
-    # Add display info for each payment's user
+    # Add display info for each payment's user (each user is resolved once per page)
+    display = get_display_resolver(request, current_user)
     installment_payments_with_display = []
     for payment in installment_payments:
-        user_display = get_user_display_info(payment.user, current_user)
-        marked_by_display = get_user_display_info(payment.marked_by_user, current_user) if payment.marked_by_user else None
-        verified_by_display = get_user_display_info(payment.verified_by_user, current_user) if payment.verified_by_user else None
+        user_display = display.info(payment.user)
+        marked_by_display = display.info(payment.marked_by_user) if payment.marked_by_user else None
+        verified_by_display = display.info(payment.verified_by_user) if payment.verified_by_user else None
         installment_payments_with_display.append({
             "payment": payment,
             "user_display": user_display,
@@ -605,7 +616,7 @@ async def admin_payments(
         Month.fund_id == current_fund.id
     ).order_by(MonthlyPaymentReceived.received_at.desc()).all()
     
-    return templates.TemplateResponse(
+    response = templates.StreamingTemplateResponse(
         "admin_payments.html",
         {
             "request": request,
@@ -620,6 +631,27 @@ async def admin_payments(
             "filter_user_id": filter_user_id
         }
     )
+    return apply_validators(response, validators)
+
+def _review_payment(model, payment_id: int, status: str, reviewed_by: int):
+    """
+    Write job (see app/write_queue.py) setting an installment or monthly
+    payment's status. The job returns the payment's fund id, or None if the
+    payment doesn't exist. Bringing a rejected installment payment back is
+    refused (409) if its transaction ID has been used by another payment since.
+    """
+    def review(session: Session) -> Optional[int]:
+        payment = session.get(model, payment_id)
+        if payment is None:
+            return None
+        if model is InstallmentPayment and status != "rejected":
+            check_transaction_id(session, payment.fund_id, payment.transaction_id, exclude_payment_id=payment_id)
+        payment.status = status
+        payment.verified_by = reviewed_by
+        fund_id = payment.month.fund_id
+        bump_fund_version(session, fund_id)
+        return fund_id
+    return review
 
 @router.post("/admin/payments/verify")
 async def verify_payment(
@@ -628,19 +660,12 @@ async def verify_payment(
     current_user: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    from fastapi.responses import JSONResponse, RedirectResponse
-    
+    if await run_payment_write(db, _review_payment(InstallmentPayment, payment_id, "verified", current_user.id)) is None:
+        raise HTTPException(status_code=404, detail="Payment not found")
     payment = db.query(InstallmentPayment).filter(
         InstallmentPayment.id == payment_id
     ).first()
     
-    if not payment:
-        raise HTTPException(status_code=404, detail="Payment not found")
-    
-    payment.status = "verified"
-    payment.verified_by = current_user.id
-    db.commit()
-    
     # Log action
     month = db.query(Month).filter(Month.id == payment.month_id).first()
     fund_id = month.fund_id if month else None
@@ -684,19 +709,12 @@ async def reject_payment(
     current_user: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    from fastapi.responses import JSONResponse
-    
+    if await run_write(db, _review_payment(InstallmentPayment, payment_id, "rejected", current_user.id)) is None:
+        raise HTTPException(status_code=404, detail="Payment not found")
     payment = db.query(InstallmentPayment).filter(
         InstallmentPayment.id == payment_id
     ).first()
     
-    if not payment:
-        raise HTTPException(status_code=404, detail="Payment not found")
-    
-    payment.status = "rejected"
-    payment.verified_by = current_user.id
-    db.commit()
-    
     # Log action
     month = db.query(Month).filter(Month.id == payment.month_id).first()
     fund_id = month.fund_id if month else None
@@ -763,6 +781,7 @@ async def delete_payment(
     }
     
     db.delete(payment)
+    bump_fund_version(db, fund_id)
     db.commit()
     
     # Log action
@@ -780,42 +799,54 @@ async def delete_payment(
 
 @router.post("/admin/payments/mark-on-behalf")
 async def mark_payment_on_behalf(
+    request: Request,
     user_id: int = Form(...),
     month_id: int = Form(...),
+    idempotency_key: str = Form(""),
     current_user: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
     """Admin can mark payment as paid on behalf of a user"""
-    from datetime import datetime
+    # A retried request gets the original response back instead of a second payment
+    idempotency = Idempotency(
+        db, current_user.id, get_idempotency_key(request, idempotency_key), request.url.path,
+        {"user_id": user_id, "month_id": month_id}
+    )
+    replayed = idempotency.replay()
+    if replayed is not None:
+        return replayed
     
-    # Check if payment already exists
-    existing = db.query(InstallmentPayment).filter(
-        InstallmentPayment.user_id == user_id,
-        InstallmentPayment.month_id == month_id
-    ).first()
+    month = db.query(Month).filter(Month.id == month_id).first()
+    if not month:
+        raise HTTPException(status_code=404, detail="Month not found")
     
-    if existing:
-        # If rejected, allow re-submission by changing status back to pending
-        if existing.status == "rejected":
-            existing.status = "pending"
-            existing.paid_at = datetime.utcnow()
-            existing.marked_by = current_user.id
-            db.commit()
-            return {"message": "Payment re-submitted successfully", "payment_id": existing.id}
-        # If existing payment is pending or verified, allow creating a new payment entry
-        # This allows multiple payments to be submitted for the same user/month
-    
-    # Create new payment
-    payment = InstallmentPayment(
-        user_id=user_id,
-        month_id=month_id,
-        marked_by=current_user.id,
-        status="pending"
-    )
-    db.add(payment)
-    db.commit()
+    fund_id = month.fund_id
+    marked_by = current_user.id
+    
+    def write_payment(session: Session) -> dict:
+        # A rejected payment for this month is re-submitted (back to pending) rather than duplicated
+        payment_id = resubmit_rejected_payment(session, fund_id, user_id, month_id, marked_by=marked_by)
+        if payment_id is not None:
+            bump_fund_version(session, fund_id)
+            return {"message": "Payment re-submitted successfully", "payment_id": payment_id}
+        # Pending or verified payments don't block a new entry:
+        # multiple payments can be submitted for the same user/month
+        
+        # Create new payment
+        payment = InstallmentPayment(
+            user_id=user_id,
+            month_id=month_id,
+            fund_id=fund_id,
+            marked_by=marked_by,
+            status="pending"
+        )
+        session.add(payment)
+        session.flush()
+        bump_fund_version(session, fund_id)
+        return {"message": "Payment marked successfully", "payment_id": payment.id}
     
-    return {"message": "Payment marked successfully", "payment_id": payment.id}
+    response, _ = await idempotency.write(write_payment)
+    return response
 
 @router.post("/admin/monthly-payment/mark-received")
 async def mark_monthly_payment_received(
@@ -825,8 +856,6 @@ async def mark_monthly_payment_received(
     db: Session = Depends(get_db)
 ):
     """Mark monthly payment as received by the assigned user"""
-    from fastapi.responses import JSONResponse, RedirectResponse
-    
     # Get the month and its assignment
     month = db.query(Month).filter(Month.id == month_id).first()
     if not month:
@@ -839,65 +868,30 @@ async def mark_monthly_payment_received(
     if not assignment:
         raise HTTPException(status_code=400, detail="No user assigned to this month")
     
-    # Check if already exists
-    existing = db.query(MonthlyPaymentReceived).filter(
-        MonthlyPaymentReceived.month_id == month_id
-    ).first()
+    # Creates the receipt or resets an existing one to pending
+    payment_id, created = upsert_monthly_payment(
+        db, month.fund_id, month_id, assignment.user_id, month.payment_amount, current_user.id
+    )
+    bump_fund_version(db, month.fund_id)
+    db.commit()
     
-    if existing:
-        # Update existing
-        existing.status = "pending"
-        existing.received_at = datetime.utcnow()
-        existing.marked_by = current_user.id
-        db.commit()
-        
-        # Log action
-        log_action(
-            db=db,
-            user_id=current_user.id,
-            action_type="MONTHLY_PAYMENT_MARKED",
-            action_description=f"Monthly payment marked as received (updated) - Month: {month.month_name}, User: {assignment.user.full_name}, Amount: ₹{month.payment_amount:,.2f}",
-            request=request,
-            fund_id=month.fund_id,
-            details={
-                "payment_id": existing.id,
-                "month_id": month_id,
-                "month_name": month.month_name,
-                "user_id": assignment.user_id,
-                "username": assignment.user.username if assignment.user else None,
-                "amount": float(month.payment_amount)
-            }
-        )
-    else:
-        # Create new
-        monthly_payment = MonthlyPaymentReceived(
-            month_id=month_id,
-            user_id=assignment.user_id,
-            amount=month.payment_amount,
-            marked_by=current_user.id,
-            status="pending"
-        )
-        db.add(monthly_payment)
-        db.commit()
-        db.refresh(monthly_payment)
-        
-        # Log action
-        log_action(
-            db=db,
-            user_id=current_user.id,
-            action_type="MONTHLY_PAYMENT_MARKED",
-            action_description=f"Monthly payment marked as received - Month: {month.month_name}, User: {assignment.user.full_name}, Amount: ₹{month.payment_amount:,.2f}",
-            request=request,
-            fund_id=month.fund_id,
-            details={
-                "payment_id": monthly_payment.id,
-                "month_id": month_id,
-                "month_name": month.month_name,
-                "user_id": assignment.user_id,
-                "username": assignment.user.username if assignment.user else None,
-                "amount": float(month.payment_amount)
-            }
-        )
+    # Log action
+    log_action(
+        db=db,
+        user_id=current_user.id,
+        action_type="MONTHLY_PAYMENT_MARKED",
+        action_description=f"Monthly payment marked as received{'' if created else ' (updated)'} - Month: {month.month_name}, User: {assignment.user.full_name}, Amount: ₹{month.payment_amount:,.2f}",
+        request=request,
+        fund_id=month.fund_id,
+        details={
+            "payment_id": payment_id,
+            "month_id": month_id,
+            "month_name": month.month_name,
+            "user_id": assignment.user_id,
+            "username": assignment.user.username if assignment.user else None,
+            "amount": float(month.payment_amount)
+        }
+    )
     
     # Check if this is an AJAX request
     is_ajax = False
@@ -920,19 +914,11 @@ async def verify_monthly_payment(
     current_user: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    payment = db.query(MonthlyPaymentReceived).filter(
-        MonthlyPaymentReceived.id == payment_id
-    ).first()
-    
-    if not payment:
+    fund_id = await run_write(db, _review_payment(MonthlyPaymentReceived, payment_id, "verified", current_user.id))
+    if fund_id is None:
         raise HTTPException(status_code=404, detail="Payment not found")
     
-    payment.status = "verified"
-    payment.verified_by = current_user.id
-    db.commit()
-    
     # Redirect back with fund_id
-    fund_id = payment.month.fund_id
     return RedirectResponse(url=f"/admin/payments?fund_id={fund_id}", status_code=302)
 
 @router.post("/admin/monthly-payment/reject")
@@ -941,19 +927,11 @@ async def reject_monthly_payment(
     current_user: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    payment = db.query(MonthlyPaymentReceived).filter(
-        MonthlyPaymentReceived.id == payment_id
-    ).first()
-    
-    if not payment:
+    fund_id = await run_write(db, _review_payment(MonthlyPaymentReceived, payment_id, "rejected", current_user.id))
+    if fund_id is None:
         raise HTTPException(status_code=404, detail="Payment not found")
     
-    payment.status = "rejected"
-    payment.verified_by = current_user.id
-    db.commit()
-    
     # Redirect back with fund_id
-    fund_id = payment.month.fund_id
     return RedirectResponse(url=f"/admin/payments?fund_id={fund_id}", status_code=302)
 
 @router.post("/admin/monthly-payment/delete")
@@ -971,6 +949,7 @@ async def delete_monthly_payment(
     
     fund_id = payment.month.fund_id
     db.delete(payment)
+    bump_fund_version(db, fund_id)
     db.commit()
     
     return RedirectResponse(url=f"/admin/payments?fund_id={fund_id}", status_code=302)
@@ -990,10 +969,6 @@ async def admin_audit(
     per_page: int = 50
 ):
     """Admin audit log page with filtering and pagination"""
-    from app.models import AuditLog
-    from sqlalchemy import or_, func
-    from datetime import datetime
-    
     # Build query
     query = db.query(AuditLog)
     
@@ -1018,7 +993,6 @@ async def admin_audit(
         try:
             date_to_obj = datetime.strptime(date_to, "%Y-%m-%d")
             # Add one day to include the entire day
-            from datetime import timedelta
             date_to_obj = date_to_obj + timedelta(days=1)
             query = query.filter(AuditLog.created_at < date_to_obj)
         except ValueError:
@@ -1056,12 +1030,14 @@ async def admin_audit(
     # Get all funds for filter dropdown
     all_funds = db.query(Fund).filter(Fund.is_deleted == False).order_by(Fund.name).all()
     
-    # Format audit logs with user display info
+    # Format audit logs with user display info (timestamps converted to IST as one column)
+    created_at_ist = format_datetimes_ist((log.created_at for log in audit_logs), '%Y-%m-%d %H:%M:%S')
+    display = get_display_resolver(request, current_user)
     formatted_logs = []
-    for log in audit_logs:
+    for log, log_created_at_ist in zip(audit_logs, created_at_ist):
         user_display = None
         if log.user:
-            user_display = get_user_display_info(log.user, current_user)
+            user_display = display.info(log.user)
         
         fund_name = None
         if log.fund:
@@ -1071,13 +1047,13 @@ async def admin_audit(
         details_dict = None
         if log.details:
             try:
-                import json
                 details_dict = json.loads(log.details)
             except (json.JSONDecodeError, TypeError):
                 details_dict = {"raw": log.details}
         
         formatted_logs.append({
             "log": log,
+            "created_at_ist": log_created_at_ist,
             "user_display": user_display,
             "fund_name": fund_name,
             "details": details_dict
@@ -0,0 +1,328 @@
+"""
+Versioned JSON data API for the dashboards (/api/v1).
+
+Each view returns column-oriented tables (see app/columnar.py) with ?fields=
+selection and query-string filters, so a filter change in the browser
+fetches only the rows and columns it needs. Users referenced by a table are
+listed once in a separate "users" table with their display names, resolved
+with the same privacy rules as the server-rendered pages.
+
+Responses carry the same ETag validators as the HTML pages (the query string
+is part of the tag), so unchanged data is answered with 304.
+"""
+from typing import Iterable, Optional
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import JSONResponse
+from sqlalchemy.orm import Session, joinedload
+from app.database import get_db
+from app.auth import get_current_user, get_current_admin_user
+from app.models import User, Month, InstallmentPayment, MonthlyPaymentReceived
+from app.access import check_fund_access, is_fund_hidden
+from app.columnar import parse_int_filter, select_fields, to_columns
+from app.conditional import build_validators, not_modified, apply_validators
+from app.dashboard_data import load_user_dashboard
+from app.fund_cache import FundSnapshot, get_fund_snapshot
+from app.helpers import get_display_resolver
+from app.versioning import USERS_SCOPE, fund_scope
+
+router = APIRouter(prefix="/api/v1")
+
+PAYMENT_STATUSES = ("pending", "verified", "rejected")
+
+MONTH_COLUMNS = {
+    "id": lambda m: m.id,
+    "month_name": lambda m: m.month_name,
+    "month_number": lambda m: m.month_number,
+    "year": lambda m: m.year,
+    "installment_amount": lambda m: m.installment_amount,
+    "payment_amount": lambda m: m.payment_amount,
+}
+
+INSTALLMENT_PAYMENT_COLUMNS = {
+    "id": lambda p: p.id,
+    "month_id": lambda p: p.month_id,
+    "user_id": lambda p: p.user_id,
+    "amount": lambda p: p.month.installment_amount,
+    "paid_at": lambda p: p.paid_at,
+    "payment_date": lambda p: p.payment_date,
+    "transaction_id": lambda p: p.transaction_id,
+    "transaction_type": lambda p: p.transaction_type,
+    "marked_by": lambda p: p.marked_by,
+    "status": lambda p: p.status,
+    "verified_by": lambda p: p.verified_by,
+}
+
+MONTHLY_PAYMENT_COLUMNS = {
+    "id": lambda p: p.id,
+    "month_id": lambda p: p.month_id,
+    "user_id": lambda p: p.user_id,
+    "amount": lambda p: p.amount,
+    "received_at": lambda p: p.received_at,
+    "marked_by": lambda p: p.marked_by,
+    "status": lambda p: p.status,
+    "verified_by": lambda p: p.verified_by,
+}
+
+
+def _attr(obj, name):
+    return getattr(obj, name) if obj is not None else None
+
+
+def _of_month(getter):
+    return lambda row: getter(row[0])
+
+
+# Rows are (month, UserDashboardData) pairs - see fund_dashboard
+DASHBOARD_COLUMNS = {
+    **{name: _of_month(getter) for name, getter in MONTH_COLUMNS.items()},
+    "is_taken": lambda row: row[0].id == row[1].assigned_month_id,
+    "assigned_user_id": lambda row: row[1].assigned_user_map[row[0].id].id if row[0].id in row[1].assigned_user_map else None,
+    "installment_payment_id": lambda row: _attr(row[1].installment_payment_map.get(row[0].id), "id"),
+    "installment_payment_status": lambda row: _attr(row[1].installment_payment_map.get(row[0].id), "status"),
+    "monthly_payment_id": lambda row: _attr(row[1].monthly_payment_map.get(row[0].id), "id"),
+    "monthly_payment_status": lambda row: _attr(row[1].monthly_payment_map.get(row[0].id), "status"),
+    "verified_installments_count": lambda row: row[1].verified_count_map.get(row[0].id, 0),
+}
+
+
+def _fund_snapshot(db: Session, fund_id: int) -> FundSnapshot:
+    snapshot = get_fund_snapshot(db, fund_id)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Fund not found")
+    return snapshot
+
+
+def _status_filter(value: Optional[str]) -> Optional[str]:
+    if value and value not in PAYMENT_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Invalid status. Use one of: {', '.join(PAYMENT_STATUSES)}")
+    return value or None
+
+
+def _users_table(request: Request, current_user: User, users: Iterable[Optional[User]]) -> dict:
+    """Display info for the users referenced by a response, each listed once"""
+    display = get_display_resolver(request, current_user)
+    unique = {user.id: user for user in users if user is not None}
+    infos = [(user_id, display.info(user)) for user_id, user in unique.items()]
+    return {
+        "count": len(infos),
+        "columns": {
+            "id": [user_id for user_id, _ in infos],
+            "display_name": [info["display_name"] for _, info in infos],
+            "identifier": [info["identifier"] for _, info in infos],
+            "customer_id": [info.get("customer_id") for _, info in infos],
+        }
+    }
+
+
+def _cached_or_validators(db: Session, request: Request, current_user: User, fund_id: int):
+    validators = build_validators(db, request, current_user, [fund_scope(fund_id), USERS_SCOPE])
+    return validators, not_modified(request, validators)
+
+
+@router.get("/funds/{fund_id}/dashboard")
+async def fund_dashboard(
+    fund_id: int,
+    request: Request,
+    fields: Optional[str] = None,
+    month_id: Optional[str] = None,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """The current user's dashboard rows for one fund (same data as /dashboard)"""
+    snapshot = _fund_snapshot(db, fund_id)
+    access = check_fund_access(db, current_user, snapshot.fund, snapshot.member_ids)
+    if not access.allowed:
+        if is_fund_hidden(current_user, snapshot.fund):
+            raise HTTPException(status_code=404, detail="Fund not found")
+        if current_user.role == "guest":
+            raise HTTPException(status_code=403, detail="Access denied")
+
+    selected = select_fields(fields, list(DASHBOARD_COLUMNS))
+    month_id = parse_int_filter(month_id, "month_id")
+
+    validators, cached = _cached_or_validators(db, request, current_user, fund_id)
+    if cached:
+        return cached
+
+    data = load_user_dashboard(db, snapshot, current_user)
+    months = [m for m in data.months if month_id is None or m.id == month_id]
+    payload = {
+        "fund_id": fund_id,
+        "is_member": data.is_member,
+        "total_users": len(data.months),
+        "total_paid_installments": float(data.total_paid_installments),
+        "total_installment_amount": float(sum(m.installment_amount for m in data.months)),
+        "months": to_columns(((m, data) for m in months), DASHBOARD_COLUMNS, selected),
+    }
+    if "assigned_user_id" in selected:
+        payload["users"] = _users_table(request, current_user, (data.assigned_user_map.get(m.id) for m in months))
+    return apply_validators(JSONResponse(payload), validators)
+
+
+@router.get("/funds/{fund_id}/months")
+async def fund_months(
+    fund_id: int,
+    request: Request,
+    fields: Optional[str] = None,
+    month_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Admin month grid: months with their assigned user, and the installment
+    status of each (month, user) pair. Pairs without a payment are omitted.
+    """
+    snapshot = _fund_snapshot(db, fund_id)
+    selected = select_fields(fields, list(MONTH_COLUMNS) + ["assigned_user_id"])
+    month_id = parse_int_filter(month_id, "month_id")
+    user_id = parse_int_filter(user_id, "user_id")
+    status = _status_filter(status)
+
+    validators, cached = _cached_or_validators(db, request, current_user, fund_id)
+    if cached:
+        return cached
+
+    months = [m for m in snapshot.months if month_id is None or m.id == month_id]
+    month_ids = [m.id for m in months]
+
+    payments = []
+    if month_ids:
+        query = db.query(
+            InstallmentPayment.month_id, InstallmentPayment.user_id, InstallmentPayment.id, InstallmentPayment.status
+        ).filter(InstallmentPayment.month_id.in_(month_ids))
+        if user_id is not None:
+            query = query.filter(InstallmentPayment.user_id == user_id)
+        if status:
+            query = query.filter(InstallmentPayment.status == status)
+        # Ordered by id so the latest payment for a (month, user) pair wins, as on the page
+        latest = {(row[0], row[1]): row for row in query.order_by(InstallmentPayment.id).all()}
+        payments = list(latest.values())
+
+    month_columns = dict(MONTH_COLUMNS, assigned_user_id=lambda m: snapshot.assignments.get(m.id))
+    member_ids = sorted(
+        uid for uid in snapshot.member_ids | set(snapshot.assignments.values())
+        if user_id is None or uid == user_id
+    )
+    referenced_ids = set(member_ids) | {row[1] for row in payments}
+    users = db.query(User).filter(User.id.in_(referenced_ids)).all() if referenced_ids else []
+    # Admins are members too, but only regular users are tracked on the grid
+    member_ids = [u.id for u in sorted(users, key=lambda u: u.id) if u.id in member_ids and u.role == "user"]
+
+    payload = {
+        "fund_id": fund_id,
+        "months": to_columns(months, month_columns, selected),
+        "member_ids": member_ids,
+        "payments": {
+            "count": len(payments),
+            "columns": {
+                "month_id": [row[0] for row in payments],
+                "user_id": [row[1] for row in payments],
+                "payment_id": [row[2] for row in payments],
+                "status": [row[3] for row in payments],
+            }
+        },
+        "users": _users_table(request, current_user, users),
+    }
+    return apply_validators(JSONResponse(payload), validators)
+
+
+def _payments_response(request, current_user, fund_id, rows, columns, selected, validators):
+    user_fields = [name for name in ("user_id", "marked_by", "verified_by") if name in selected]
+    referenced = []
+    for row in rows:
+        if "user_id" in user_fields:
+            referenced.append(row.user)
+        if "marked_by" in user_fields:
+            referenced.append(row.marked_by_user)
+        if "verified_by" in user_fields:
+            referenced.append(row.verified_by_user)
+    payload = {
+        "fund_id": fund_id,
+        "payments": to_columns(rows, columns, selected),
+        "users": _users_table(request, current_user, referenced),
+    }
+    return apply_validators(JSONResponse(payload), validators)
+
+
+@router.get("/funds/{fund_id}/installment-payments")
+async def fund_installment_payments(
+    fund_id: int,
+    request: Request,
+    fields: Optional[str] = None,
+    month_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Installment payments of a fund, newest first (same rows as /admin/payments)"""
+    snapshot = _fund_snapshot(db, fund_id)
+    selected = select_fields(fields, list(INSTALLMENT_PAYMENT_COLUMNS))
+    month_id = parse_int_filter(month_id, "month_id")
+    user_id = parse_int_filter(user_id, "user_id")
+    status = _status_filter(status)
+
+    validators, cached = _cached_or_validators(db, request, current_user, fund_id)
+    if cached:
+        return cached
+
+    if month_id is None:
+        month_ids = list(snapshot.month_ids)
+    else:
+        month_ids = [month_id] if month_id in snapshot.month_ids else []
+
+    rows = []
+    if month_ids:
+        query = db.query(InstallmentPayment).options(
+            joinedload(InstallmentPayment.month),
+            joinedload(InstallmentPayment.user),
+            joinedload(InstallmentPayment.marked_by_user),
+            joinedload(InstallmentPayment.verified_by_user)
+        ).filter(InstallmentPayment.month_id.in_(month_ids))
+        if user_id is not None:
+            query = query.filter(InstallmentPayment.user_id == user_id)
+        if status:
+            query = query.filter(InstallmentPayment.status == status)
+        rows = query.order_by(InstallmentPayment.paid_at.desc()).all()
+
+    return _payments_response(request, current_user, fund_id, rows, INSTALLMENT_PAYMENT_COLUMNS, selected, validators)
+
+
+@router.get("/funds/{fund_id}/monthly-payments")
+async def fund_monthly_payments(
+    fund_id: int,
+    request: Request,
+    fields: Optional[str] = None,
+    month_id: Optional[str] = None,
+    user_id: Optional[str] = None,
+    status: Optional[str] = None,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Monthly payouts received by assigned users, newest first"""
+    _fund_snapshot(db, fund_id)
+    selected = select_fields(fields, list(MONTHLY_PAYMENT_COLUMNS))
+    month_id = parse_int_filter(month_id, "month_id")
+    user_id = parse_int_filter(user_id, "user_id")
+    status = _status_filter(status)
+
+    validators, cached = _cached_or_validators(db, request, current_user, fund_id)
+    if cached:
+        return cached
+
+    query = db.query(MonthlyPaymentReceived).options(
+        joinedload(MonthlyPaymentReceived.user),
+        joinedload(MonthlyPaymentReceived.marked_by_user),
+        joinedload(MonthlyPaymentReceived.verified_by_user)
+    ).join(Month).filter(Month.fund_id == fund_id)
+    if month_id is not None:
+        query = query.filter(MonthlyPaymentReceived.month_id == month_id)
+    if user_id is not None:
+        query = query.filter(MonthlyPaymentReceived.user_id == user_id)
+    if status:
+        query = query.filter(MonthlyPaymentReceived.status == status)
+    rows = query.order_by(MonthlyPaymentReceived.received_at.desc()).all()
+
+    return _payments_response(request, current_user, fund_id, rows, MONTHLY_PAYMENT_COLUMNS, selected, validators)
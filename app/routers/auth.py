@@ -1,6 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Form
 from fastapi.responses import RedirectResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
 from fastapi import Request
 from sqlalchemy.orm import Session
 from datetime import timedelta
@@ -9,25 +8,9 @@ from app.auth import authenticate_user, create_access_token, get_current_user
 from app.schemas import LoginRequest, LoginResponse, UserResponse
 from app.models import User
 from app.audit import log_action
+from app.templating import templates
 
 router = APIRouter()
-import os
-template_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "templates")
-templates = Jinja2Templates(directory=template_dir)
-
-# Add IST timezone filter to templates
-from app.timezone_utils import utc_to_ist
-import pytz
-IST = pytz.timezone('Asia/Kolkata')
-
-def format_ist(dt, format_str='%Y-%m-%d %H:%M:%S'):
-    """Jinja2 filter to format datetime in IST"""
-    if dt is None:
-        return None
-    ist_dt = utc_to_ist(dt)
-    return ist_dt.strftime(format_str)
-
-templates.env.filters['ist'] = format_ist
 
 @router.get("/login", response_class=HTMLResponse)
 async def login_page(request: Request):
@@ -1,32 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, Form
+from fastapi.responses import HTMLResponse, RedirectResponse, StreamingResponse
+from sqlalchemy.orm import Session, joinedload
+from typing import Optional
 from app.database import get_db
 from app.auth import get_current_user, get_current_admin_user
-from app.models import User, Fund, Month, UserMonthAssignment, InstallmentPayment
+from app.models import User, Fund, Month, UserMonthAssignment, InstallmentPayment, MonthlyPaymentReceived, ScheduleTemplate, fund_members
 from app.helpers import get_user_display_info
+from app.access import add_fund_member, check_fund_access, is_fund_hidden, require_fund_access
 from app.audit import log_action
+from app.events import fund_event_stream
+from app.fund_cache import get_fund_snapshot
+from app.money import AMOUNT_CONSTRAINTS
+from app.schedules import clone_fund, create_fund_with_schedule, fund_schedule, list_schedule_templates, parse_schedule, save_schedule_template
+from app.templating import templates
+from app.conditional import build_validators, not_modified, apply_validators
+from app.versioning import FUNDS_SCOPE, USERS_SCOPE, fund_scope, bump_fund_metadata_version
 
 router = APIRouter()
-import os
-template_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "templates")
-templates = Jinja2Templates(directory=template_dir)
-
-# Add IST timezone filter to templates
-from app.timezone_utils import utc_to_ist
-import pytz
-IST = pytz.timezone('Asia/Kolkata')
-
-def format_ist(dt, format_str='%Y-%m-%d %H:%M:%S'):
-    """Jinja2 filter to format datetime in IST"""
-    if dt is None:
-        return None
-    ist_dt = utc_to_ist(dt)
-    return ist_dt.strftime(format_str)
-
-templates.env.filters['ist'] = format_ist
 
 @router.get("/funds", response_class=HTMLResponse)
 async def funds_dashboard(
@@ -34,6 +24,12 @@ async def funds_dashboard(
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
+    # Answer conditional requests before running any of the statistics queries
+    validators = build_validators(db, request, current_user, [FUNDS_SCOPE, USERS_SCOPE])
+    cached = not_modified(request, validators)
+    if cached:
+        return cached
+    
     # Get funds - admin sees all (including archived), users see only active funds they're members of, guests see guest-visible funds
     if current_user.role == "admin":
         # Admin sees all funds including archived, but not deleted
@@ -47,8 +43,6 @@ async def funds_dashboard(
         ).all()
     else:
         # Regular users see only active (non-archived, non-deleted) funds they're members of
-        from app.models import fund_members
-        from sqlalchemy import select
         funds = db.query(Fund).join(
             fund_members, Fund.id == fund_members.c.fund_id
         ).filter(
@@ -94,7 +88,6 @@ async def funds_dashboard(
                 InstallmentPayment.status == "pending"
             ).count()
             
-            from app.models import MonthlyPaymentReceived
             pending_monthly = db.query(MonthlyPaymentReceived).join(Month).filter(
                 Month.fund_id == fund.id,
                 MonthlyPaymentReceived.status == "pending"
@@ -112,7 +105,7 @@ async def funds_dashboard(
         total_users = db.query(User).count()
         total_funds = len(funds)
     
-    return templates.TemplateResponse(
+    response = templates.TemplateResponse(
         "funds_dashboard.html",
         {
             "request": request,
@@ -122,6 +115,7 @@ async def funds_dashboard(
             "total_funds": total_funds
         }
     )
+    return apply_validators(response, validators)
 
 @router.get("/funds/create", response_class=HTMLResponse)
 async def create_fund_page(
@@ -132,7 +126,12 @@ async def create_fund_page(
     users = db.query(User).filter(User.role == "user").all()
     return templates.TemplateResponse(
         "create_fund.html",
-        {"request": request, "user": current_user, "users": users}
+        {
+            "request": request,
+            "user": current_user,
+            "users": users,
+            "schedule_templates": list_schedule_templates(db)
+        }
     )
 
 @router.post("/funds/create")
@@ -140,55 +139,31 @@ async def create_fund(
     request: Request,
     name: str = Form(...),
     description: str = Form(""),
-    total_amount: float = Form(...),
+    total_amount: float = Form(..., **AMOUNT_CONSTRAINTS),
     number_of_months: int = Form(1),
     months_data: str = Form(...),
+    save_template_name: str = Form(""),
     current_user: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
 ):
-    import json
-    from datetime import datetime
-    
-    # Parse months data from JSON string
-    try:
-        months_list = json.loads(months_data)
-    except json.JSONDecodeError:
-        raise HTTPException(status_code=400, detail="Invalid months data format")
-    
-    if not months_list or len(months_list) == 0:
-        raise HTTPException(status_code=400, detail="At least one month is required")
+    months_list = parse_schedule(months_data)
     
     # Update number_of_months from actual months count
     number_of_months = len(months_list)
     
-    # Create fund
-    fund = Fund(
+    # Create fund, months and the admin's membership in one batch of statements
+    fund = create_fund_with_schedule(
+        db,
         name=name,
         description=description,
         total_amount=total_amount,
-        number_of_months=number_of_months,
+        schedule=months_list,
         created_by=current_user.id
     )
-    db.add(fund)
-    db.flush()  # Get the fund ID
-    
-    # Add admin as member
-    if current_user not in fund.members:
-        fund.members.append(current_user)
-    
-    # Create all months
-    current_year = datetime.now().year
-    for index, month_data in enumerate(months_list, start=1):
-        month = Month(
-            fund_id=fund.id,
-            month_name=month_data.get("month_name", "").strip(),
-            month_number=index,
-            installment_amount=float(month_data.get("installment_amount", 0)),
-            payment_amount=float(month_data.get("payment_amount", 0)),
-            year=current_year
-        )
-        db.add(month)
+    if save_template_name.strip():
+        save_schedule_template(db, save_template_name, months_list, current_user.id, description=f"From fund {name}")
     
+    bump_fund_metadata_version(db, fund.id)
     db.commit()
     db.refresh(fund)
     
@@ -197,14 +172,14 @@ async def create_fund(
         db=db,
         user_id=current_user.id,
         action_type="FUND_CREATED",
-        action_description=f"Fund created: {name} - Total Amount: ₹{total_amount:,.2f}, Months: {number_of_months}",
+        action_description=f"Fund created: {name} - Total Amount: ₹{fund.total_amount:,.2f}, Months: {number_of_months}",
         request=request,
         fund_id=fund.id,
         details={
             "fund_id": fund.id,
             "name": name,
             "description": description,
-            "total_amount": float(total_amount),
+            "total_amount": float(fund.total_amount),
             "number_of_months": number_of_months,
             "months_count": len(months_list)
         }
@@ -212,6 +187,72 @@ async def create_fund(
     
     return RedirectResponse(url=f"/dashboard?fund_id={fund.id}", status_code=302)
 
+@router.post("/funds/schedule-templates")
+async def create_schedule_template(
+    request: Request,
+    name: str = Form(...),
+    description: str = Form(""),
+    months_data: str = Form(""),
+    fund_id: Optional[int] = Form(None),
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Save a schedule template from posted months_data or from an existing fund's months"""
+    if fund_id is not None:
+        fund = db.query(Fund).filter(Fund.id == fund_id, Fund.is_deleted == False).first()
+        if not fund:
+            raise HTTPException(status_code=404, detail="Fund not found")
+        schedule = fund_schedule(db, fund_id)
+        if not schedule:
+            raise HTTPException(status_code=400, detail="Fund has no months")
+    else:
+        schedule = parse_schedule(months_data)
+    
+    template = save_schedule_template(db, name, schedule, current_user.id, description=description)
+    db.commit()
+    
+    log_action(
+        db=db,
+        user_id=current_user.id,
+        action_type="SCHEDULE_TEMPLATE_CREATED",
+        action_description=f"Schedule template saved: {template.name} ({len(schedule)} months)",
+        request=request,
+        fund_id=fund_id,
+        details={"template_id": template.id, "name": template.name, "months_count": len(schedule)}
+    )
+    
+    if request.headers.get("Accept") == "application/json" or request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        return {"message": "Schedule template saved", "template_id": template.id}
+    return RedirectResponse(url="/funds/create", status_code=302)
+
+@router.post("/funds/schedule-templates/{template_id}/delete")
+async def delete_schedule_template(
+    template_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    template = db.get(ScheduleTemplate, template_id)
+    if not template:
+        raise HTTPException(status_code=404, detail="Schedule template not found")
+    
+    template_name = template.name
+    db.delete(template)
+    db.commit()
+    
+    log_action(
+        db=db,
+        user_id=current_user.id,
+        action_type="SCHEDULE_TEMPLATE_DELETED",
+        action_description=f"Schedule template deleted: {template_name}",
+        request=request,
+        details={"template_id": template_id, "name": template_name}
+    )
+    
+    if request.headers.get("Accept") == "application/json" or request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        return {"message": "Schedule template deleted", "template_id": template_id}
+    return RedirectResponse(url="/funds/create", status_code=302)
+
 @router.get("/funds/{fund_id}", response_class=HTMLResponse)
 async def fund_detail(
     fund_id: int,
@@ -220,10 +261,7 @@ async def fund_detail(
     db: Session = Depends(get_db)
 ):
     # Redirect to dashboard - consolidated view
-    from fastapi.responses import RedirectResponse
     return RedirectResponse(url=f"/dashboard?fund_id={fund_id}", status_code=302)
-    from sqlalchemy.orm import joinedload
-    from app.models import MonthlyPaymentReceived
     
     fund = db.query(Fund).options(
         joinedload(Fund.months).joinedload(Month.assignments).joinedload(UserMonthAssignment.user),
@@ -234,8 +272,7 @@ async def fund_detail(
         raise HTTPException(status_code=404, detail="Fund not found")
     
     # Check access - admin can see all, users only their funds
-    if current_user.role != "admin" and current_user not in fund.members:
-        raise HTTPException(status_code=403, detail="You don't have access to this fund")
+    require_fund_access(db, current_user, fund)
     
     # Get all fund members (users only, not admin)
     fund_members = [u for u in fund.members if u.role == "user"]
@@ -326,27 +363,25 @@ async def join_fund(
         raise HTTPException(status_code=404, detail="Fund not found")
     
     # Check if fund is archived or deleted - non-admin users cannot join
-    if current_user.role != "admin":
-        if fund.is_deleted or fund.is_archived:
-            raise HTTPException(status_code=404, detail="Fund not found")
+    if is_fund_hidden(current_user, fund):
+        raise HTTPException(status_code=404, detail="Fund not found")
     
     # Admin can't join (they're already members or can access all)
     if current_user.role == "admin":
         return RedirectResponse(url=f"/dashboard?fund_id={fund_id}", status_code=302)
     
-    # Check if user is already a member
-    if current_user in fund.members:
-        return RedirectResponse(url=f"/dashboard?fund_id={fund_id}", status_code=302)
-    
-    # Add user to fund
-    fund.members.append(current_user)
-    db.commit()
+    # Add user to fund unless already a member
+    if add_fund_member(db, current_user.id, fund_id):
+        bump_fund_metadata_version(db, fund_id)
+        db.commit()
     
     return RedirectResponse(url=f"/dashboard?fund_id={fund_id}", status_code=302)
 
 @router.get("/api/funds/{fund_id}")
 async def get_fund(
     fund_id: int,
+    request: Request,
+    response: Response,
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -354,18 +389,14 @@ async def get_fund(
     if not fund:
         raise HTTPException(status_code=404, detail="Fund not found")
     
-    # Check if fund is archived or deleted - non-admin users cannot access
-    if current_user.role != "admin":
-        if fund.is_deleted or fund.is_archived:
-            raise HTTPException(status_code=404, detail="Fund not found")
+    # Check access - archived/deleted funds are hidden from non-admins, guests only see guest-visible funds
+    require_fund_access(db, current_user, fund)
     
-    # Check access
-    if current_user.role == "guest":
-        # Guest users can only access guest-visible funds
-        if not fund.guest_visible:
-            raise HTTPException(status_code=403, detail="You don't have access to this fund")
-    elif current_user.role != "admin" and current_user not in fund.members:
-        raise HTTPException(status_code=403, detail="You don't have access to this fund")
+    validators = build_validators(db, request, current_user, [fund_scope(fund_id)])
+    cached = not_modified(request, validators)
+    if cached:
+        return cached
+    apply_validators(response, validators)
     
     return {
         "id": fund.id,
@@ -375,6 +406,36 @@ async def get_fund(
         "number_of_months": fund.number_of_months
     }
 
+@router.get("/api/funds/{fund_id}/events")
+async def fund_events(
+    fund_id: int,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """Server-sent events with live payment and assignment changes for the fund's dashboards"""
+    snapshot = get_fund_snapshot(db, fund_id)
+    if not snapshot:
+        raise HTTPException(status_code=404, detail="Fund not found")
+    
+    # Same rule as the dashboard: regular users may watch funds they are previewing
+    access = check_fund_access(db, current_user, snapshot.fund, snapshot.member_ids)
+    if not access.allowed:
+        if is_fund_hidden(current_user, snapshot.fund):
+            raise HTTPException(status_code=404, detail="Fund not found")
+        if current_user.role == "guest":
+            raise HTTPException(status_code=403, detail="Access denied")
+    
+    # The stream outlives the request's session; give its connection back to the pool now
+    viewer_id, is_admin = current_user.id, current_user.role == "admin"
+    db.close()
+    
+    return StreamingResponse(
+        fund_event_stream(request, fund_id, viewer_id, is_admin),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @router.post("/api/funds/{fund_id}/toggle-guest-visible")
 async def toggle_guest_visible(
     fund_id: int,
@@ -388,6 +449,7 @@ async def toggle_guest_visible(
         raise HTTPException(status_code=404, detail="Fund not found")
     
     fund.guest_visible = not fund.guest_visible
+    bump_fund_metadata_version(db, fund_id)
     db.commit()
     
     # Log action
@@ -422,9 +484,52 @@ async def update_fund(
     fund.name = data.get("name", fund.name)
     fund.description = data.get("description", fund.description)
     
+    bump_fund_metadata_version(db, fund_id)
     db.commit()
     return {"message": "Fund updated successfully"}
 
+@router.post("/funds/{fund_id}/clone")
+async def clone_fund_route(
+    fund_id: int,
+    request: Request,
+    name: str = Form(...),
+    include_members: bool = Form(False),
+    current_user: User = Depends(get_current_admin_user),
+    db: Session = Depends(get_db)
+):
+    """Create a new fund with the same schedule (and optionally the same members)"""
+    source = db.query(Fund).filter(Fund.id == fund_id, Fund.is_deleted == False).first()
+    if not source:
+        raise HTTPException(status_code=404, detail="Fund not found")
+    name = name.strip()
+    if not name:
+        raise HTTPException(status_code=400, detail="Fund name is required")
+    
+    fund = clone_fund(db, source, name, current_user.id, include_members=include_members)
+    bump_fund_metadata_version(db, fund.id)
+    db.commit()
+    
+    log_action(
+        db=db,
+        user_id=current_user.id,
+        action_type="FUND_CLONED",
+        action_description=f"Fund created: {name} (cloned from {source.name}"
+                           + (", with members)" if include_members else ")"),
+        request=request,
+        fund_id=fund.id,
+        details={
+            "fund_id": fund.id,
+            "source_fund_id": source.id,
+            "name": name,
+            "number_of_months": fund.number_of_months,
+            "include_members": include_members
+        }
+    )
+    
+    if request.headers.get("Accept") == "application/json" or request.headers.get("X-Requested-With") == "XMLHttpRequest":
+        return {"message": f"Fund '{name}' created", "fund_id": fund.id}
+    return RedirectResponse(url=f"/dashboard?fund_id={fund.id}", status_code=302)
+
 @router.post("/funds/{fund_id}/archive")
 async def archive_fund(
     fund_id: int,
@@ -437,6 +542,7 @@ async def archive_fund(
         raise HTTPException(status_code=404, detail="Fund not found")
     
     fund.is_archived = True
+    bump_fund_metadata_version(db, fund_id)
     db.commit()
     
     # Log action
@@ -471,6 +577,7 @@ async def unarchive_fund(
         raise HTTPException(status_code=404, detail="Fund not found")
     
     fund.is_archived = False
+    bump_fund_metadata_version(db, fund_id)
     db.commit()
     
     # Return JSON for AJAX or redirect for form submission
@@ -491,7 +598,6 @@ async def delete_fund(
     
     # Delete all associated data
     # 1. Delete all installment payments for months in this fund
-    from app.models import MonthlyPaymentReceived
     months = db.query(Month).filter(Month.fund_id == fund_id).all()
     month_ids = [m.id for m in months]
     
@@ -506,7 +612,6 @@ async def delete_fund(
         db.query(Month).filter(Month.fund_id == fund_id).delete(synchronize_session=False)
     
     # Delete fund members associations
-    from app.models import fund_members
     db.execute(fund_members.delete().where(fund_members.c.fund_id == fund_id))
     
     # Mark fund as deleted
@@ -515,6 +620,7 @@ async def delete_fund(
     fund_total = fund.total_amount
     
     fund.is_deleted = True
+    bump_fund_metadata_version(db, fund_id)
     db.commit()
     
     # Log action
@@ -1,35 +1,26 @@
-from fastapi import APIRouter, Depends, Request, HTTPException, Form
-from fastapi.responses import HTMLResponse, JSONResponse
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Depends, Request, HTTPException, Form, status
+from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.auth import get_current_user, get_current_admin_user, get_password_hash, verify_password
-from app.models import User, Month, UserMonthAssignment, InstallmentPayment, Fund
+from app.models import User, Month, UserMonthAssignment, InstallmentPayment, MonthlyPaymentReceived
 from app.schemas import MonthWithStatus
 from app.dependencies import get_current_fund
-from app.helpers import get_user_display_info
+from app.helpers import get_display_resolver
 from app.audit import log_action
+from app.dashboard_data import load_user_dashboard
+from app.fund_cache import get_fund_snapshot
+from app.access import check_fund_access, is_fund_hidden
+from app.money import AMOUNT_CONSTRAINTS
+from app.idempotency import IDEMPOTENCY_FIELD, Idempotency, check_transaction_id, get_idempotency_key
+from app.upserts import current_assignee, delete_assignment, resubmit_rejected_payment, upsert_assignment, upsert_monthly_payment
+from app.templating import templates
+from app.timezone_utils import get_ist_now
+from app.conditional import build_validators, not_modified, apply_validators
+from app.versioning import USERS_SCOPE, fund_scope, bump_fund_version, bump_fund_metadata_version
 from datetime import datetime
-import pytz
 
 router = APIRouter()
-import os
-template_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "templates")
-templates = Jinja2Templates(directory=template_dir)
-
-# Add IST timezone filter to templates
-from app.timezone_utils import utc_to_ist
-import pytz
-IST = pytz.timezone('Asia/Kolkata')
-
-def format_ist(dt, format_str='%Y-%m-%d %H:%M:%S'):
-    """Jinja2 filter to format datetime in IST"""
-    if dt is None:
-        return None
-    ist_dt = utc_to_ist(dt)
-    return ist_dt.strftime(format_str)
-
-templates.env.filters['ist'] = format_ist
 
 @router.get("/dashboard", response_class=HTMLResponse)
 async def user_dashboard(
@@ -43,131 +34,64 @@ async def user_dashboard(
     
     if not fund_id:
         # Redirect to funds page if no fund selected
-        from fastapi.responses import RedirectResponse
         return RedirectResponse(url="/funds", status_code=302)
     
     try:
         fund_id = int(fund_id)
     except ValueError:
-        from fastapi.responses import RedirectResponse
         return RedirectResponse(url="/funds", status_code=302)
     
-    current_fund = db.query(Fund).filter(Fund.id == fund_id).first()
-    if not current_fund:
-        from fastapi.responses import RedirectResponse
+    # Fund row, months, members and assignments come from the per-worker snapshot cache
+    snapshot = get_fund_snapshot(db, fund_id)
+    if not snapshot:
         return RedirectResponse(url="/funds", status_code=302)
+    current_fund = snapshot.fund
     
-    # Check if fund is archived or deleted - non-admin users cannot access
-    if current_user.role != "admin":
-        if current_fund.is_deleted or current_fund.is_archived:
-            from fastapi.responses import RedirectResponse
-            return RedirectResponse(url="/funds", status_code=302)
+    # Check access - archived/deleted funds are hidden from non-admins and guests only see
+    # guest-visible funds. Regular users may preview funds they haven't joined (see below).
+    access = check_fund_access(db, current_user, current_fund, snapshot.member_ids)
+    if not access.allowed and (current_user.role == "guest" or is_fund_hidden(current_user, current_fund)):
+        return RedirectResponse(url="/funds", status_code=302)
     
-    # Check access - guest users can only access guest-visible funds
-    if current_user.role == "guest":
-        if not current_fund.guest_visible:
-            from fastapi.responses import RedirectResponse
-            return RedirectResponse(url="/funds", status_code=302)
+    # Get current month in Kolkata timezone (the page highlights it, so it is part of the ETag)
+    current_datetime = get_ist_now()
+    
+    # Answer conditional requests before loading months, payments and assignments
+    validators = build_validators(
+        db, request, current_user,
+        [fund_scope(current_fund.id), USERS_SCOPE],
+        extra=[current_fund.id, current_datetime.strftime('%Y-%m')]
+    )
+    cached = not_modified(request, validators)
+    if cached:
+        cached.set_cookie(key="current_fund_id", value=str(current_fund.id), httponly=True)
+        return cached
     
     # Check access - allow non-members to view but show join option
     # Admin can always access, members can access, non-members can view but need to join
     # We'll show a join button in the template for non-members
     # Guest users cannot join funds
-    # Get all months for this fund
-    months = db.query(Month).filter(Month.fund_id == current_fund.id).order_by(Month.month_number).all()
-    
-    # Get month IDs for this fund
-    fund_month_ids = [m.id for m in months]
-    
-    # Get all assignments for months in this fund
-    assignments = db.query(UserMonthAssignment).filter(
-        UserMonthAssignment.month_id.in_(fund_month_ids)
-    ).all()
-    assignment_map = {a.month_id: a for a in assignments}
-    
-    # Get all users who are members of this fund
-    # Include all members regardless of role (but filter out admin for display purposes)
-    all_users = [u for u in current_fund.members if u.role == "user"]
-    
-    # Also check if there are users assigned to months who might not be in fund.members yet
-    # Get all unique users who have assignments in this fund
-    assigned_user_ids = set()
-    for assignment in assignments:
-        if assignment.user_id:
-            assigned_user_ids.add(assignment.user_id)
-    
-    # Get all assigned users
-    if assigned_user_ids:
-        assigned_users = db.query(User).filter(
-            User.id.in_(assigned_user_ids),
-            User.role == "user"
-        ).all()
-        # Add any assigned users who aren't already in all_users
-        existing_user_ids = {u.id for u in all_users}
-        for assigned_user in assigned_users:
-            if assigned_user.id not in existing_user_ids:
-                all_users.append(assigned_user)
-    
-    # Get user's assigned month - MUST be in the current fund
-    user_assignment = db.query(UserMonthAssignment).join(Month).filter(
-        UserMonthAssignment.user_id == current_user.id,
-        Month.fund_id == current_fund.id
-    ).first()
-    
-    assigned_month_id = user_assignment.month_id if user_assignment else None
-    
-    # Get all installment payments for this user
-    from app.models import MonthlyPaymentReceived
-    installment_payments = db.query(InstallmentPayment).filter(
-        InstallmentPayment.user_id == current_user.id
-    ).all()
-    
-    installment_payment_map = {p.month_id: p for p in installment_payments}
-    
-    # Get all monthly payments received (for months assigned to this user)
-    monthly_payments_received = db.query(MonthlyPaymentReceived).join(Month).filter(
-        Month.fund_id == current_fund.id,
-        MonthlyPaymentReceived.user_id == current_user.id
-    ).all()
-    
-    monthly_payment_map = {p.month_id: p for p in monthly_payments_received}
-    
-    # Get all verified installment payments for this fund (to count how many users paid)
-    from sqlalchemy.orm import joinedload
-    all_verified_installments = db.query(InstallmentPayment).join(Month).options(
-        joinedload(InstallmentPayment.month)
-    ).filter(
-        Month.fund_id == current_fund.id,
-        InstallmentPayment.status == "verified"
-    ).all()
-    
-    # Calculate total paid installments (sum of all verified installment amounts)
-    total_paid_installments = sum(
-        payment.month.installment_amount for payment in all_verified_installments
-    )
-    
-    # Create a map: month_id -> list of all payments (count all payments, not unique users)
-    verified_installments_map = {}
-    for payment in all_verified_installments:
-        if payment.month_id not in verified_installments_map:
-            verified_installments_map[payment.month_id] = []
-        verified_installments_map[payment.month_id].append(payment.user_id)
+    # Load months, assignments, members and this user's payments - all scoped to this fund
+    data = load_user_dashboard(db, snapshot, current_user)
+    months = data.months
+    all_users = data.all_users
+    total_paid_installments = data.total_paid_installments
     
     # Get total number of months in the fund (for display: X/10 means X payments out of 10 total months)
     # This represents the total number of installments that should be paid (one per month)
     total_users = len(months)
     
     # Build month data with status
+    display = get_display_resolver(request, current_user).prime(data.assigned_user_map.values())
     months_data = []
     for month in months:
-        is_taken = month.id == assigned_month_id
-        installment_payment = installment_payment_map.get(month.id)
-        monthly_payment = monthly_payment_map.get(month.id)
-        assignment = assignment_map.get(month.id)
-        assigned_user = assignment.user if assignment else None
+        is_taken = month.id == data.assigned_month_id
+        installment_payment = data.installment_payment_map.get(month.id)
+        monthly_payment = data.monthly_payment_map.get(month.id)
+        assigned_user = data.assigned_user_map.get(month.id)
         
         # Count verified installment payments for this month (count all payments, not unique users)
-        verified_count = len(verified_installments_map.get(month.id, []))
+        verified_count = data.verified_count_map.get(month.id, 0)
         
         # For "Payment Received Status", we need to show how many installments have been paid
         # out of the total number of fund members (since each member should pay for each month)
@@ -176,9 +100,7 @@ async def user_dashboard(
         # Let's use total_users as it represents the number of people who should pay each month
         
         # Get display info for assigned user
-        assigned_user_display = None
-        if assigned_user:
-            assigned_user_display = get_user_display_info(assigned_user, current_user)
+        assigned_user_display = display.info(assigned_user) if assigned_user else None
         
         months_data.append({
             "id": month.id,
@@ -201,9 +123,6 @@ async def user_dashboard(
     # Calculate total installment amount for the table footer
     total_installment_amount = sum(month.installment_amount for month in months)
     
-    # Get current month in Kolkata timezone
-    kolkata_tz = pytz.timezone('Asia/Kolkata')
-    current_datetime = datetime.now(kolkata_tz)
     current_month_short = current_datetime.strftime('%b')  # Jan, Feb, etc.
     
     # Mark current month in months_data
@@ -213,9 +132,6 @@ async def user_dashboard(
         else:
             month_data["is_current_month"] = False
     
-    # Check if current user is a member of the fund
-    is_member = current_user in current_fund.members
-    
     # Set cookie for fund_id and return response
     response = templates.TemplateResponse(
         "user_dashboard.html",
@@ -227,11 +143,11 @@ async def user_dashboard(
             "all_users": all_users,
             "total_paid_installments": total_paid_installments,
             "total_installment_amount": total_installment_amount,
-            "is_member": is_member
+            "is_member": data.is_member
         }
     )
     response.set_cookie(key="current_fund_id", value=str(current_fund.id), httponly=True)
-    return response
+    return apply_validators(response, validators)
 
 @router.get("/api/user/months")
 async def get_user_months(
@@ -293,90 +209,85 @@ async def mark_payment(
     
     # Validate payment_date is provided (mandatory)
     if not payment_date_str:
-        from fastapi import HTTPException, status
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Payment date is required")
     
     # Parse payment date
     try:
-        from datetime import datetime
         payment_date = datetime.strptime(payment_date_str, "%Y-%m-%d")
     except ValueError:
-        from fastapi import HTTPException, status
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Invalid payment date format")
     
+    # A retried submission gets the original response back, with no new payment or audit entry
+    idempotency = Idempotency(
+        db, current_user.id, get_idempotency_key(request, form_data.get(IDEMPOTENCY_FIELD)), request.url.path,
+        {
+            "month_id": month_id,
+            "user_id": target_user.id,
+            "payment_date": payment_date_str,
+            "transaction_id": transaction_id,
+            "transaction_type": transaction_type
+        }
+    )
+    replayed = idempotency.replay()
+    if replayed is not None:
+        return replayed
+    
     # Get month to get installment amount
     month = db.query(Month).filter(Month.id == month_id).first()
     if not month:
-        from fastapi import HTTPException, status
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Month not found")
     
-    # Check if payment already exists
-    existing = db.query(InstallmentPayment).filter(
-        InstallmentPayment.user_id == target_user.id,
-        InstallmentPayment.month_id == month_id
-    ).first()
-    
-    if existing:
-        # If rejected, allow re-submission by changing status back to pending
-        if existing.status == "rejected":
-            existing.status = "pending"
-            existing.paid_at = datetime.utcnow()
-            existing.payment_date = payment_date
-            existing.transaction_id = transaction_id if transaction_id else None
-            existing.transaction_type = transaction_type if transaction_type else None
-            db.commit()
-            
-            # Log action
-            log_action(
-                db=db,
-                user_id=current_user.id,
-                action_type="INSTALLMENT_PAID",
-                action_description=f"Payment re-submitted for {target_user.username} - Month: {month.month_name}, Amount: ₹{month.installment_amount:,.2f}",
-                request=request,
-                fund_id=month.fund_id,
-                details={
-                    "payment_id": existing.id,
-                    "user_id": target_user.id,
-                    "username": target_user.username,
-                    "month_id": month_id,
-                    "month_name": month.month_name,
-                    "amount": float(month.installment_amount),
-                    "payment_date": payment_date_str,
-                    "transaction_id": transaction_id,
-                    "transaction_type": transaction_type,
-                    "marked_by_admin": current_user.role == "admin"
-                }
+    check_transaction_id(db, month.fund_id, transaction_id)
+    
+    fund_id = month.fund_id
+    target_user_id = target_user.id
+    marked_by = current_user.id
+    payment_values = {
+        "payment_date": payment_date,
+        "transaction_id": transaction_id if transaction_id else None,
+        "transaction_type": transaction_type if transaction_type else None
+    }
+    resubmitted = False
+    
+    def write_payment(session: Session) -> dict:
+        nonlocal resubmitted
+        # A rejected payment for this month is re-submitted (back to pending) rather than duplicated
+        payment_id = resubmit_rejected_payment(session, fund_id, target_user_id, month_id, **payment_values)
+        resubmitted = payment_id is not None
+        if not resubmitted:
+            # Pending or verified payments don't block a new entry:
+            # multiple payments can be submitted for the same user/month
+            payment = InstallmentPayment(
+                user_id=target_user_id,
+                month_id=month_id,
+                fund_id=fund_id,
+                marked_by=marked_by,
+                status="pending",
+                **payment_values
             )
-            
-            return {"message": "Payment re-submitted successfully", "payment_id": existing.id}
-        # If existing payment is pending or verified, allow creating a new payment entry
-        # This allows multiple payments to be submitted for the same user/month
-    
-    # Create new payment
-    payment = InstallmentPayment(
-        user_id=target_user.id,
-        month_id=month_id,
-        marked_by=current_user.id,
-        status="pending",
-        payment_date=payment_date,
-        transaction_id=transaction_id if transaction_id else None,
-        transaction_type=transaction_type if transaction_type else None
-    )
-    db.add(payment)
-    db.commit()
-    db.refresh(payment)
+            session.add(payment)
+            session.flush()
+            payment_id = payment.id
+        bump_fund_version(session, fund_id)
+        message = "Payment re-submitted successfully" if resubmitted else "Payment marked successfully"
+        return {"message": message, "payment_id": payment_id}
+    
+    response, replayed = await idempotency.write(write_payment)
+    if replayed:
+        return response
     
     # Log action
+    action = "re-submitted" if resubmitted else "marked"
     log_action(
         db=db,
         user_id=current_user.id,
         action_type="INSTALLMENT_PAID",
-        action_description=f"Payment marked for {target_user.username} - Month: {month.month_name}, Amount: ₹{month.installment_amount:,.2f}",
+        action_description=f"Payment {action} for {target_user.username} - Month: {month.month_name}, Amount: ₹{month.installment_amount:,.2f}",
         request=request,
-        fund_id=month.fund_id,
+        fund_id=fund_id,
         details={
-            "payment_id": payment.id,
-            "user_id": target_user.id,
+            "payment_id": response["payment_id"],
+            "user_id": target_user_id,
             "username": target_user.username,
             "month_id": month_id,
             "month_name": month.month_name,
@@ -388,7 +299,7 @@ async def mark_payment(
         }
     )
     
-    return {"message": "Payment marked successfully", "payment_id": payment.id}
+    return response
 
 @router.post("/api/user/monthly-payment/mark-received")
 async def mark_monthly_payment_received_user(
@@ -398,8 +309,6 @@ async def mark_monthly_payment_received_user(
     db: Session = Depends(get_db)
 ):
     """User can mark their monthly payment as received"""
-    from app.models import MonthlyPaymentReceived
-    
     # Get the month and verify it's assigned to this user
     month = db.query(Month).filter(Month.id == month_id).first()
     if not month:
@@ -414,32 +323,22 @@ async def mark_monthly_payment_received_user(
     if not assignment:
         raise HTTPException(status_code=403, detail="This month is not assigned to you")
     
-    # Check if already exists
-    existing = db.query(MonthlyPaymentReceived).filter(
-        MonthlyPaymentReceived.month_id == month_id
-    ).first()
-    
-    if existing:
-        # Update existing - only if status is not verified (allow re-submission if rejected)
-        if existing.status != "verified":
-            existing.status = "pending"
-            existing.received_at = datetime.utcnow()
-            existing.marked_by = current_user.id
-            db.commit()
-            return {"message": "Payment receipt marked successfully", "payment_id": existing.id}
-        return {"message": "Payment already marked as received and verified", "payment_id": existing.id}
-    
-    # Create new
-    monthly_payment = MonthlyPaymentReceived(
-        month_id=month_id,
-        user_id=current_user.id,
-        amount=month.payment_amount,
-        marked_by=current_user.id,
-        status="pending"
+    # Create the receipt or reset it to pending; a verified receipt is left alone
+    payment_id, created = upsert_monthly_payment(
+        db, month.fund_id, month_id, current_user.id, month.payment_amount, current_user.id, keep_verified=True
     )
-    db.add(monthly_payment)
+    if payment_id is None:
+        verified_id = db.query(MonthlyPaymentReceived.id).filter(
+            MonthlyPaymentReceived.month_id == month_id
+        ).scalar()
+        return {"message": "Payment already marked as received and verified", "payment_id": verified_id}
+    
+    bump_fund_version(db, month.fund_id)
     db.commit()
-    db.refresh(monthly_payment)
+    
+    if not created:
+        # Re-submitting a receipt isn't audited
+        return {"message": "Payment receipt marked successfully", "payment_id": payment_id}
     
     # Log action
     log_action(
@@ -450,7 +349,7 @@ async def mark_monthly_payment_received_user(
         request=request,
         fund_id=month.fund_id,
         details={
-            "payment_id": monthly_payment.id,
+            "payment_id": payment_id,
             "month_id": month_id,
             "month_name": month.month_name,
             "amount": float(month.payment_amount),
@@ -459,14 +358,14 @@ async def mark_monthly_payment_received_user(
         }
     )
     
-    return {"message": "Payment receipt marked successfully", "payment_id": monthly_payment.id}
+    return {"message": "Payment receipt marked successfully", "payment_id": payment_id}
 
 # New endpoints for editing
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
 class UpdateAmountRequest(BaseModel):
-    amount: float
+    amount: float = Field(**AMOUNT_CONSTRAINTS)
 
 class AssignUserRequest(BaseModel):
     username: str
@@ -485,25 +384,28 @@ async def update_installment(
     
     old_amount = month.installment_amount
     month.installment_amount = request_data.amount
+    bump_fund_metadata_version(db, month.fund_id)
     db.commit()
+    # The stored amount, rounded to paise
+    new_amount = month.installment_amount
     
     # Log action
     log_action(
         db=db,
         user_id=current_user.id,
         action_type="INSTALLMENT_AMOUNT_UPDATED",
-        action_description=f"Installment amount updated for {month.month_name} - From ₹{old_amount:,.2f} to ₹{request_data.amount:,.2f}",
+        action_description=f"Installment amount updated for {month.month_name} - From ₹{old_amount:,.2f} to ₹{new_amount:,.2f}",
         request=request,
         fund_id=month.fund_id,
         details={
             "month_id": month_id,
             "month_name": month.month_name,
             "old_amount": float(old_amount),
-            "new_amount": float(request_data.amount)
+            "new_amount": float(new_amount)
         }
     )
     
-    return {"message": "Installment amount updated", "amount": request_data.amount}
+    return {"message": "Installment amount updated", "amount": float(new_amount)}
 
 @router.put("/api/dashboard/month/{month_id}/payment")
 async def update_payment(
@@ -519,25 +421,28 @@ async def update_payment(
     
     old_amount = month.payment_amount
     month.payment_amount = request_data.amount
+    bump_fund_metadata_version(db, month.fund_id)
     db.commit()
+    # The stored amount, rounded to paise
+    new_amount = month.payment_amount
     
     # Log action
     log_action(
         db=db,
         user_id=current_user.id,
         action_type="PAYMENT_AMOUNT_UPDATED",
-        action_description=f"Payment amount updated for {month.month_name} - From ₹{old_amount:,.2f} to ₹{request_data.amount:,.2f}",
+        action_description=f"Payment amount updated for {month.month_name} - From ₹{old_amount:,.2f} to ₹{new_amount:,.2f}",
         request=request,
         fund_id=month.fund_id,
         details={
             "month_id": month_id,
             "month_name": month.month_name,
             "old_amount": float(old_amount),
-            "new_amount": float(request_data.amount)
+            "new_amount": float(new_amount)
         }
     )
     
-    return {"message": "Payment amount updated", "amount": request_data.amount}
+    return {"message": "Payment amount updated", "amount": float(new_amount)}
 
 @router.put("/api/dashboard/month/{month_id}/assign")
 async def assign_month_to_user(
@@ -556,12 +461,9 @@ async def assign_month_to_user(
     
     # If empty username, remove assignment
     if not username:
-        existing = db.query(UserMonthAssignment).filter(
-            UserMonthAssignment.month_id == month_id
-        ).first()
-        if existing:
-            old_user_id = existing.user_id
-            db.delete(existing)
+        old_user_id = delete_assignment(db, month.fund_id, month_id)
+        if old_user_id is not None:
+            bump_fund_metadata_version(db, month.fund_id)
             db.commit()
             
             # Log action
@@ -586,27 +488,11 @@ async def assign_month_to_user(
     if not user:
         raise HTTPException(status_code=404, detail=f"User '{username}' not found in system")
     
-    # Check if month is already assigned
-    existing = db.query(UserMonthAssignment).filter(
-        UserMonthAssignment.month_id == month_id
-    ).first()
-    
-    old_user_id = None
-    if existing:
-        old_user_id = existing.user_id
-        # Update existing assignment
-        existing.user_id = user.id
-        existing.assigned_by = current_user.id
-        existing.assigned_at = datetime.utcnow()
-    else:
-        # Create new assignment
-        assignment = UserMonthAssignment(
-            user_id=user.id,
-            month_id=month_id,
-            assigned_by=current_user.id
-        )
-        db.add(assignment)
+    # Previous assignee for the audit entry; the upsert itself doesn't depend on it
+    old_user_id = current_assignee(db, month_id)
+    upsert_assignment(db, month.fund_id, month_id, user.id, current_user.id)
     
+    bump_fund_metadata_version(db, month.fund_id)
     db.commit()
     
     # Log action
@@ -624,7 +510,7 @@ async def assign_month_to_user(
             "username": user.username,
             "full_name": user.full_name,
             "old_user_id": old_user_id,
-            "is_update": existing is not None
+            "is_update": old_user_id is not None
         }
     )
     
@@ -654,8 +540,6 @@ async def change_password(
     db: Session = Depends(get_db)
 ):
     """Allow users to change their own password"""
-    from fastapi.responses import RedirectResponse
-    
     # Verify current password
     if not verify_password(current_password, current_user.password_hash):
         return templates.TemplateResponse(
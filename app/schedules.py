@@ -0,0 +1,185 @@
+"""
+Month schedules: creating funds from a schedule, saved schedule templates
+and fund cloning.
+
+A schedule is a list of {"month_name", "installment_amount",
+"payment_amount"} dicts in month order, the same shape the create-fund form
+posts as months_data. Months, template months and memberships are written
+with one executemany INSERT each instead of one ORM object per row, so a
+24-month fund with 200 members is a handful of statements.
+"""
+import json
+from datetime import datetime
+from typing import Iterable, List, Optional
+from fastapi import HTTPException
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+from app.access import add_fund_members
+from app.columnar import json_value
+from app.money import check_amount
+from app.models import Fund, Month, ScheduleTemplate, ScheduleTemplateMonth, fund_members
+
+MAX_SCHEDULE_MONTHS = 120
+
+
+def parse_schedule(months_data: str) -> List[dict]:
+    """Parse and validate the JSON months_data posted by the create-fund form"""
+    try:
+        months_list = json.loads(months_data)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid months data format")
+
+    if not isinstance(months_list, list) or not months_list:
+        raise HTTPException(status_code=400, detail="At least one month is required")
+    if len(months_list) > MAX_SCHEDULE_MONTHS:
+        raise HTTPException(status_code=400, detail=f"A schedule can have at most {MAX_SCHEDULE_MONTHS} months")
+
+    schedule = []
+    for index, month_data in enumerate(months_list, start=1):
+        if not isinstance(month_data, dict):
+            raise HTTPException(status_code=400, detail="Invalid months data format")
+        try:
+            schedule.append({
+                "month_name": str(month_data.get("month_name", "")).strip(),
+                "installment_amount": float(check_amount(month_data.get("installment_amount", 0))),
+                "payment_amount": float(check_amount(month_data.get("payment_amount", 0))),
+            })
+        except (TypeError, ValueError) as e:
+            raise HTTPException(status_code=400, detail=f"Month {index}: {e}")
+    return schedule
+
+
+def _schedule_rows(rows) -> List[dict]:
+    return [
+        {
+            "month_name": row.month_name,
+            "installment_amount": json_value(row.installment_amount),
+            "payment_amount": json_value(row.payment_amount),
+        }
+        for row in rows
+    ]
+
+
+def fund_schedule(db: Session, fund_id: int) -> List[dict]:
+    """A fund's months as a schedule"""
+    rows = db.execute(
+        select(Month.month_name, Month.installment_amount, Month.payment_amount)
+        .where(Month.fund_id == fund_id)
+        .order_by(Month.month_number)
+    ).all()
+    return _schedule_rows(rows)
+
+
+def insert_months(db: Session, fund_id: int, schedule: List[dict], year: Optional[int] = None):
+    """Insert a fund's months with a single executemany"""
+    year = year or datetime.now().year
+    db.execute(
+        insert(Month),
+        [
+            {
+                "fund_id": fund_id,
+                "month_name": month["month_name"],
+                "month_number": index,
+                "installment_amount": month["installment_amount"],
+                "payment_amount": month["payment_amount"],
+                "year": year,
+            }
+            for index, month in enumerate(schedule, start=1)
+        ]
+    )
+
+
+def create_fund_with_schedule(
+    db: Session,
+    name: str,
+    description: Optional[str],
+    total_amount,
+    schedule: List[dict],
+    created_by: int,
+    member_ids: Iterable[int] = ()
+) -> Fund:
+    """Create a fund, its months and its memberships (the creator always joins). The caller commits."""
+    fund = Fund(
+        name=name,
+        description=description,
+        total_amount=total_amount,
+        number_of_months=len(schedule),
+        created_by=created_by
+    )
+    db.add(fund)
+    db.flush()  # Get the fund ID
+
+    insert_months(db, fund.id, schedule)
+    add_fund_members(db, fund.id, [created_by, *member_ids])
+    return fund
+
+
+def clone_fund(db: Session, source: Fund, name: str, created_by: int, include_members: bool = False) -> Fund:
+    """Copy a fund's schedule (and optionally its members) into a new fund. The caller commits."""
+    member_ids = []
+    if include_members:
+        member_ids = db.execute(
+            select(fund_members.c.user_id).where(fund_members.c.fund_id == source.id)
+        ).scalars().all()
+    return create_fund_with_schedule(
+        db,
+        name=name,
+        description=source.description,
+        total_amount=source.total_amount,
+        schedule=fund_schedule(db, source.id),
+        created_by=created_by,
+        member_ids=member_ids
+    )
+
+
+def save_schedule_template(
+    db: Session,
+    name: str,
+    schedule: List[dict],
+    created_by: int,
+    description: Optional[str] = None
+) -> ScheduleTemplate:
+    """Store a schedule under a unique name. The caller commits."""
+    name = name.strip()
+    if not name:
+        raise HTTPException(status_code=400, detail="Template name is required")
+    if db.query(ScheduleTemplate.id).filter(ScheduleTemplate.name == name).first():
+        raise HTTPException(status_code=400, detail=f"A schedule template named '{name}' already exists")
+
+    template = ScheduleTemplate(name=name, description=description or None, created_by=created_by)
+    db.add(template)
+    db.flush()  # Get the template ID
+    db.execute(
+        insert(ScheduleTemplateMonth),
+        [
+            {
+                "template_id": template.id,
+                "month_number": index,
+                "month_name": month["month_name"],
+                "installment_amount": month["installment_amount"],
+                "payment_amount": month["payment_amount"],
+            }
+            for index, month in enumerate(schedule, start=1)
+        ]
+    )
+    return template
+
+
+def list_schedule_templates(db: Session) -> List[dict]:
+    """All templates with their schedules, for the create-fund form"""
+    templates = db.query(ScheduleTemplate).order_by(ScheduleTemplate.name).all()
+    months = db.execute(
+        select(ScheduleTemplateMonth).order_by(ScheduleTemplateMonth.template_id, ScheduleTemplateMonth.month_number)
+    ).scalars().all()
+    by_template = {}
+    for month in months:
+        by_template.setdefault(month.template_id, []).append(month)
+    return [
+        {
+            "id": template.id,
+            "name": template.name,
+            "description": template.description,
+            "months": _schedule_rows(by_template.get(template.id, [])),
+        }
+        for template in templates
+    ]
@@ -42,3 +42,64 @@ function setLoading(element, isLoading) {
     }
 }
 
+
+// Random key identifying one submission, sent as Idempotency-Key (or the
+// idempotency_key field) so retries of it are not recorded twice
+function newIdempotencyKey() {
+    if (window.crypto && crypto.randomUUID) {
+        return crypto.randomUUID();
+    }
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2) + Math.random().toString(36).slice(2);
+}
+
+// Live fund updates (server-sent events from /api/funds/{id}/events).
+// onEvent(data) returns true when it patched the page in place; anything it
+// can't patch (new rows, changed assignments) shows a reload notice instead.
+function subscribeFundEvents(fundId, onEvent) {
+    if (!window.EventSource || !fundId) {
+        return null;
+    }
+    const source = new EventSource('/api/funds/' + fundId + '/events');
+    ['installment', 'monthly_payment', 'assignment'].forEach(type => {
+        source.addEventListener(type, function(e) {
+            let patched = false;
+            try {
+                patched = onEvent(JSON.parse(e.data));
+            } catch (err) {
+                console.error('Failed to apply live update', err);
+            }
+            if (!patched) {
+                showPageUpdateNotice();
+            }
+        });
+    });
+    window.addEventListener('pagehide', () => source.close());
+    return source;
+}
+
+// Replace an element's badge with a new label and colour
+function setStatusBadge(element, label, colorClass) {
+    if (!element) {
+        return;
+    }
+    const badge = document.createElement('span');
+    badge.className = 'badge ' + colorClass;
+    badge.textContent = label;
+    element.replaceChildren(badge);
+}
+
+function showPageUpdateNotice() {
+    if (document.getElementById('live-update-notice')) {
+        return;
+    }
+    const notice = document.createElement('div');
+    notice.id = 'live-update-notice';
+    notice.className = 'alert alert-info position-fixed bottom-0 end-0 m-3 shadow';
+    notice.style.zIndex = 1080;
+    notice.innerHTML = 'This page has new updates. <a href="#" class="alert-link">Reload</a>';
+    notice.querySelector('a').addEventListener('click', function(e) {
+        e.preventDefault();
+        location.reload();
+    });
+    document.body.appendChild(notice);
+}
@@ -0,0 +1,231 @@
+"""
+Fingerprinted, precompressed static assets.
+
+build_assets() copies every file under app/static into app/static/dist with a
+content hash in its name (css/style.css -> css/style.1a2b3c4d5e.css), writes
+.gz (and, if the optional "brotli" package is installed, .br) variants next
+to each copy and records the mapping in dist/manifest.json. Files from
+earlier builds that are no longer in the manifest are deleted. The Docker
+image and run.sh --prod build at deploy time (python -m app.static_assets),
+and the development server rebuilds at startup. Importing this module (or
+app.templating) only reads the manifest.
+
+Templates link assets with {{ static_url('css/style.css') }}. Because a
+fingerprinted URL changes whenever the file does, StaticAssets serves them
+with a one-year "immutable" Cache-Control, and picks the .br/.gz variant the
+client accepts instead of compressing on every request.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import shutil
+import stat
+import tempfile
+from typing import Dict, Optional
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.staticfiles import StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # Optional: only gzip variants are built without it
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+STATIC_DIR = os.path.join(os.path.dirname(__file__), "static")
+DIST_DIRNAME = "dist"
+DIST_DIR = os.path.join(STATIC_DIR, DIST_DIRNAME)
+MANIFEST_PATH = os.path.join(DIST_DIR, "manifest.json")
+STATIC_URL_PREFIX = "/static/"
+
+HASH_LENGTH = 10
+COMPRESSIBLE_EXTENSIONS = {".css", ".js", ".svg", ".json", ".txt", ".html", ".map"}
+MIN_COMPRESS_SIZE = 256  # Smaller files aren't worth a compressed variant
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# (Accept-Encoding token, file suffix) in order of preference
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+
+def _fingerprinted_name(relative_path: str, digest: str) -> str:
+    root, ext = os.path.splitext(relative_path)
+    return f"{root}.{digest[:HASH_LENGTH]}{ext}"
+
+
+def _write_atomic(path: str, data: bytes):
+    """Write via a temporary file so a concurrent reader never sees a partial file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            tmp.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _source_files(static_dir: str):
+    for root, dirs, files in os.walk(static_dir):
+        dirs[:] = sorted(d for d in dirs if not (root == static_dir and d == DIST_DIRNAME))
+        for name in sorted(files):
+            if name.startswith("."):
+                continue
+            path = os.path.join(root, name)
+            yield os.path.relpath(path, static_dir).replace(os.sep, "/"), path
+
+
+def build_assets(static_dir: str = STATIC_DIR, dist_dir: Optional[str] = None) -> Dict[str, str]:
+    """
+    Fingerprint and precompress every static file. Returns the manifest
+    {source path: fingerprinted path}, both relative to the static directory.
+    Unchanged files are not rewritten, so repeated builds are cheap.
+    """
+    dist_dir = dist_dir or os.path.join(static_dir, DIST_DIRNAME)
+    manifest = {}
+    for relative_path, path in _source_files(static_dir):
+        with open(path, "rb") as source:
+            data = source.read()
+        digest = hashlib.sha256(data).hexdigest()
+        built_name = _fingerprinted_name(relative_path, digest)
+        target = os.path.join(dist_dir, built_name)
+        manifest[relative_path] = f"{DIST_DIRNAME}/{built_name}"
+
+        if os.path.exists(target):
+            continue
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        _write_atomic(target, data)
+        if os.path.splitext(relative_path)[1] in COMPRESSIBLE_EXTENSIONS and len(data) >= MIN_COMPRESS_SIZE:
+            # mtime=0 keeps the gzip bytes (and so their ETag) identical across builds
+            _write_atomic(target + ".gz", gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                _write_atomic(target + ".br", brotli.compress(data, quality=11))
+
+    os.makedirs(dist_dir, exist_ok=True)
+    _write_atomic(os.path.join(dist_dir, "manifest.json"), json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"))
+    _remove_stale_files(dist_dir, manifest)
+    return manifest
+
+
+def _remove_stale_files(dist_dir: str, manifest: Dict[str, str]):
+    """Delete built files (and their .gz/.br variants) that the manifest no longer lists"""
+    keep = {"manifest.json"}
+    for built_path in manifest.values():
+        built_name = built_path[len(DIST_DIRNAME) + 1:]
+        keep.add(built_name)
+        keep.update(built_name + suffix for _, suffix in ENCODINGS)
+    for root, dirs, files in os.walk(dist_dir, topdown=False):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.startswith(".tmp-"):
+                continue  # Another build's file in progress
+            if os.path.relpath(path, dist_dir).replace(os.sep, "/") not in keep:
+                os.unlink(path)
+        if root != dist_dir and not os.listdir(root):
+            os.rmdir(root)
+
+
+def load_manifest(rebuild: bool = False) -> Dict[str, str]:
+    """
+    The asset manifest. By default the built manifest is only read (an empty
+    one if nothing has been built). With rebuild=True the assets are built
+    first, so edits show up after a restart.
+    """
+    if rebuild:
+        try:
+            return build_assets()
+        except OSError:
+            # A read-only tree still works, just without fingerprinted URLs
+            logger.exception("Building static assets failed, serving unversioned URLs")
+            return {}
+    if not os.path.exists(MANIFEST_PATH):
+        logger.info("No static asset manifest at %s, serving unversioned URLs", MANIFEST_PATH)
+        return {}
+    with open(MANIFEST_PATH) as f:
+        return json.load(f)
+
+
+_manifest: Dict[str, str] = {}
+
+
+def init_static_assets(rebuild: bool = False) -> Dict[str, str]:
+    """Load (or build, then load) the manifest used by static_url()"""
+    global _manifest
+    _manifest = load_manifest(rebuild)
+    return _manifest
+
+
+def current_manifest() -> Dict[str, str]:
+    """The manifest static_url() is currently using"""
+    return _manifest
+
+
+def static_url(path: str) -> str:
+    """URL for a static asset: the fingerprinted copy if there is one, else the file itself"""
+    path = path.lstrip("/")
+    return STATIC_URL_PREFIX + _manifest.get(path, path)
+
+
+def _accepted_encodings(scope: Scope) -> set:
+    accepted = set()
+    for part in Headers(scope=scope).get("accept-encoding", "").split(","):
+        token, _, params = part.strip().partition(";")
+        if params.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+        if token:
+            accepted.add(token.lower())
+    return accepted
+
+
+class StaticAssets(StaticFiles):
+    """
+    StaticFiles that serves precompressed variants and long-lived cache headers
+    for fingerprinted files (everything under dist/). Unversioned URLs are
+    served as before, with revalidation.
+    """
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = None
+        fingerprinted = path.replace(os.sep, "/").startswith(DIST_DIRNAME + "/")
+        if fingerprinted and scope["method"] in ("GET", "HEAD"):
+            accepted = _accepted_encodings(scope)
+            for encoding, suffix in ENCODINGS:
+                if encoding not in accepted:
+                    continue
+                full_path, stat_result = await anyio.to_thread.run_sync(self.lookup_path, path + suffix)
+                if stat_result and stat.S_ISREG(stat_result.st_mode):
+                    response = self.file_response(full_path, stat_result, scope)
+                    response.headers["content-encoding"] = encoding
+                    media_type = mimetypes.guess_type(path)[0]
+                    if media_type:
+                        response.headers["content-type"] = media_type + ("; charset=utf-8" if media_type.startswith("text/") else "")
+                    break
+        if response is None:
+            response = await super().get_response(path, scope)
+
+        if fingerprinted:
+            response.headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+            response.headers["vary"] = "Accept-Encoding"
+        else:
+            response.headers.setdefault("cache-control", REVALIDATE_CACHE_CONTROL)
+        return response
+
+
+def clean_dist(dist_dir: str = DIST_DIR):
+    """Remove all built assets (the next build starts from scratch)"""
+    shutil.rmtree(dist_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if "--clean" in sys.argv:
+        clean_dist()
+    built = build_assets()
+    print(f"Built {len(built)} static assets into {DIST_DIR}" + ("" if brotli else " (gzip only, brotli not installed)"))
@@ -0,0 +1,195 @@
+"""
+Shared Jinja2 template environment used by all routers.
+
+A single environment means every template is compiled once per worker, and
+compiled bytecode is cached on disk so restarted workers skip compilation.
+
+Environment variables:
+- FUNDMGR_ENV: "production" disables template auto-reload (no stat() per render)
+- FUNDMGR_TEMPLATE_CACHE_DIR: bytecode cache directory (default: data/.jinja_cache)
+- FUNDMGR_PRECOMPILE_TEMPLATES: "1" compiles all templates at startup
+  (default: on in production, off otherwise)
+
+Static assets are linked with static_url() (see app/static_assets.py). Import
+only reads the built manifest; building happens at deploy time or in the
+development server's startup hook.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Callable, Iterator, List, Mapping, NamedTuple, Optional
+from jinja2 import FileSystemBytecodeCache, Template
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+from app import APP_VERSION
+from app.static_assets import MANIFEST_PATH, current_manifest, init_static_assets, static_url
+from app.timezone_utils import format_datetime_ist
+
+logger = logging.getLogger(__name__)
+
+BASE_DIR = os.path.dirname(os.path.dirname(__file__))
+TEMPLATE_DIR = os.path.join(BASE_DIR, "templates")
+TEMPLATE_CACHE_DIR = os.environ.get(
+    "FUNDMGR_TEMPLATE_CACHE_DIR", os.path.join(BASE_DIR, "data", ".jinja_cache")
+)
+STREAM_CHUNK_SIZE = 16 * 1024  # Bytes of rendered HTML per streamed chunk
+IS_PRODUCTION = os.environ.get("FUNDMGR_ENV", "development") == "production"
+PRECOMPILE_TEMPLATES = os.environ.get("FUNDMGR_PRECOMPILE_TEMPLATES", "1" if IS_PRODUCTION else "0") == "1"
+
+# Callbacks invoked as hook(template_name, seconds) after each render
+_render_hooks: List[Callable[[str, float], None]] = []
+
+
+def add_render_hook(hook: Callable[[str, float], None]):
+    """Register a callback receiving (template_name, elapsed_seconds) for every render"""
+    _render_hooks.append(hook)
+
+
+def _log_render_time(name: str, elapsed: float):
+    logger.debug(f"Rendered template {name} in {elapsed * 1000:.1f} ms")
+
+
+class TimedTemplate(Template):
+    """Template that reports its render time to the registered hooks"""
+
+    def render(self, *args, **kwargs) -> str:
+        start = time.perf_counter()
+        try:
+            return super().render(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - start
+            for hook in _render_hooks:
+                hook(self.name, elapsed)
+
+    def generate(self, *args, **kwargs) -> Iterator[str]:
+        # Only time spent producing chunks counts, not time waiting on the client
+        elapsed = 0.0
+        chunks = super().generate(*args, **kwargs)
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    chunk = next(chunks)
+                except StopIteration:
+                    return
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield chunk
+        finally:
+            for hook in _render_hooks:
+                hook(self.name, elapsed)
+
+
+def _buffered(chunks: Iterator[str], size: int) -> Iterator[bytes]:
+    """Join Jinja's many small fragments into chunks of roughly 'size' bytes"""
+    buffer = []
+    buffered = 0
+    for chunk in chunks:
+        data = chunk.encode("utf-8")
+        buffer.append(data)
+        buffered += len(data)
+        if buffered >= size:
+            yield b"".join(buffer)
+            buffer = []
+            buffered = 0
+    if buffer:
+        yield b"".join(buffer)
+
+
+class AppTemplates(Jinja2Templates):
+    def StreamingTemplateResponse(
+        self,
+        name: str,
+        context: dict,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+    ) -> StreamingResponse:
+        """
+        Render a template incrementally with Template.generate().
+        The client receives the page header and first rows while the rest is
+        still being rendered, and the full page is never held in memory.
+        Note: the template is evaluated while the response is being sent, so
+        lazy-loaded attributes are read from the request's DB session then.
+        """
+        if "request" not in context:
+            raise ValueError('context must include a "request" key')
+        request = context["request"]
+        for context_processor in self.context_processors:
+            context.update(context_processor(request))
+
+        template = self.get_template(name)
+        return StreamingResponse(
+            _buffered(template.generate(context), STREAM_CHUNK_SIZE),
+            status_code=status_code,
+            headers=headers,
+            media_type="text/html; charset=utf-8",
+        )
+
+
+os.makedirs(TEMPLATE_CACHE_DIR, exist_ok=True)
+
+templates = AppTemplates(
+    directory=TEMPLATE_DIR,
+    bytecode_cache=FileSystemBytecodeCache(TEMPLATE_CACHE_DIR),
+    auto_reload=not IS_PRODUCTION,
+)
+templates.env.template_class = TimedTemplate
+
+# Add IST timezone filter to templates
+templates.env.filters['ist'] = format_datetime_ist
+
+# Fingerprinted asset URLs, e.g. {{ static_url('css/style.css') }}
+init_static_assets()
+templates.env.globals['static_url'] = static_url
+
+add_render_hook(_log_render_time)
+
+
+def precompile_templates() -> int:
+    """Compile every template up front (fills the in-memory and bytecode caches)"""
+    names = templates.env.list_templates(extensions=["html"])
+    for name in names:
+        templates.env.get_template(name)
+    logger.info(f"Precompiled {len(names)} templates")
+    return len(names)
+
+
+class BuildIdentity(NamedTuple):
+    build_id: str
+    built_at: Optional[datetime]  # Naive UTC, like the stored timestamps
+
+
+_build_identity: Optional[tuple] = None  # (manifest it was computed for, BuildIdentity)
+
+
+def build_identity() -> BuildIdentity:
+    """
+    Identify the deployed build: the app version, the static asset manifest and
+    the template sources. Conditional GET folds this into every ETag (and never
+    reports a Last-Modified older than built_at), so pages cached before a
+    deploy are re-rendered instead of linking to asset files that no longer exist.
+    Recomputed whenever the asset manifest is reloaded.
+    """
+    global _build_identity
+    manifest = current_manifest()
+    if _build_identity is not None and _build_identity[0] is manifest:
+        return _build_identity[1]
+
+    digest = hashlib.sha1(APP_VERSION.encode("utf-8"))
+    digest.update(json.dumps(manifest, sort_keys=True).encode("utf-8"))
+    mtimes = [os.path.getmtime(MANIFEST_PATH)] if manifest and os.path.exists(MANIFEST_PATH) else []
+    for name in sorted(templates.env.list_templates()):
+        path = os.path.join(TEMPLATE_DIR, name)
+        with open(path, "rb") as f:
+            digest.update(name.encode("utf-8") + b"\0" + f.read())
+        mtimes.append(os.path.getmtime(path))
+
+    identity = BuildIdentity(
+        build_id=digest.hexdigest()[:16],
+        built_at=datetime.utcfromtimestamp(max(mtimes)) if mtimes else None,
+    )
+    _build_identity = (manifest, identity)
+    return identity
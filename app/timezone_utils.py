@@ -1,14 +1,28 @@
 """
 Timezone utility functions for converting UTC to IST (GMT+5:30)
+
+Built on the standard library zoneinfo. Asia/Kolkata has had a fixed +05:30
+offset with no DST since 1945, so datetimes after that are converted with a
+plain timedelta addition instead of a tz database lookup. Older datetimes
+fall back to the zoneinfo rules.
 """
-import pytz
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from typing import Iterable, List, Optional
+from zoneinfo import ZoneInfo
+
+IST = ZoneInfo('Asia/Kolkata')
+IST_OFFSET = timedelta(hours=5, minutes=30)
+IST_FIXED = timezone(IST_OFFSET, 'IST')
+# Since this instant (UTC) Asia/Kolkata has always been UTC+05:30
+FIXED_OFFSET_SINCE = datetime(1945, 10, 15)
+FIXED_OFFSET_SINCE_AWARE = FIXED_OFFSET_SINCE.replace(tzinfo=timezone.utc)
 
-IST = pytz.timezone('Asia/Kolkata')
+DEFAULT_FORMAT = '%Y-%m-%d %H:%M:%S'
 
 def get_ist_now():
     """Get current datetime in IST timezone"""
-    return datetime.now(IST)
+    return datetime.now(IST_FIXED)
 
 def utc_to_ist(utc_dt):
     """
@@ -17,23 +31,45 @@ def utc_to_ist(utc_dt):
     """
     if utc_dt is None:
         return None
-    
+
     # If datetime is naive, assume it's UTC
     if utc_dt.tzinfo is None:
-        utc_dt = pytz.utc.localize(utc_dt)
-    
+        if utc_dt >= FIXED_OFFSET_SINCE:
+            return (utc_dt + IST_OFFSET).replace(tzinfo=IST_FIXED)
+        return utc_dt.replace(tzinfo=timezone.utc).astimezone(IST)
+
     # Convert to IST
-    ist_dt = utc_dt.astimezone(IST)
-    return ist_dt
+    if utc_dt >= FIXED_OFFSET_SINCE_AWARE:
+        return utc_dt.astimezone(IST_FIXED)
+    return utc_dt.astimezone(IST)
 
-def format_datetime_ist(dt, format_str='%Y-%m-%d %H:%M:%S'):
+@lru_cache(maxsize=4096)
+def _format_ist(dt, format_str):
+    return utc_to_ist(dt).strftime(format_str)
+
+def format_datetime_ist(dt, format_str=DEFAULT_FORMAT):
     """
     Format datetime in IST timezone.
     If datetime is naive or UTC, converts to IST first.
+    Memoized: the same timestamp rendered on many rows (or requests) is formatted once.
     """
     if dt is None:
         return None
-    
-    ist_dt = utc_to_ist(dt)
-    return ist_dt.strftime(format_str)
 
+    return _format_ist(dt, format_str)
+
+def format_datetimes_ist(values: Iterable[Optional[datetime]], format_str=DEFAULT_FORMAT) -> List[Optional[str]]:
+    """
+    Format a whole column of datetimes in IST at once (None stays None).
+    Naive UTC values, the common case for database columns, are shifted by the
+    fixed offset inline without a per-value function call or tz conversion.
+    """
+    offset = IST_OFFSET
+    # Shifted naive values have no tzinfo, so %z/%Z need the full conversion
+    since = FIXED_OFFSET_SINCE if '%z' not in format_str and '%Z' not in format_str else datetime.max
+    return [
+        None if dt is None
+        else (dt + offset).strftime(format_str) if dt.tzinfo is None and dt >= since
+        else utc_to_ist(dt).strftime(format_str)
+        for dt in values
+    ]
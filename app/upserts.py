@@ -0,0 +1,186 @@
+"""
+Single-statement write paths for per-month rows.
+
+Month assignments and monthly payment receipts are unique per month, so they
+are written with INSERT ... ON CONFLICT (month_id) DO UPDATE ... RETURNING
+instead of SELECT-then-INSERT/UPDATE. That is one round trip, and two
+concurrent requests can no longer both take the INSERT branch and fail on the
+unique constraint. The second one updates the row the first one created.
+Removing an assignment is a DELETE ... RETURNING, and re-submitting a
+rejected installment payment a single UPDATE ... RETURNING.
+
+Receipts are audited differently when they are first marked, so they are
+written with INSERT ... ON CONFLICT DO NOTHING RETURNING, followed by an
+UPDATE ... RETURNING only when the row already existed. Whether the INSERT
+returned a row tells the caller which one happened.
+
+The INSERT construct comes from the session's dialect. SQLite (3.35+) and
+PostgreSQL both support ON CONFLICT and RETURNING.
+
+These are Core statements, so they don't pass through the ORM flush that
+collects live fund events. Each helper queues its own event (app/events.py).
+"""
+from datetime import datetime
+from typing import Optional, Tuple
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from app.events import queue_fund_event
+from app.models import InstallmentPayment, MonthlyPaymentReceived, UserMonthAssignment
+
+_DIALECT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def dialect_insert(db: Session, entity):
+    """INSERT construct with on_conflict_do_update() for the session's database"""
+    dialect = db.get_bind().dialect.name
+    try:
+        return _DIALECT_INSERTS[dialect](entity)
+    except KeyError:
+        raise NotImplementedError(f"Upserts are not supported on {dialect}")
+
+
+def current_assignee(db: Session, month_id: int) -> Optional[int]:
+    """The month's assignee, for audit entries (the writes below don't depend on it)"""
+    return db.execute(
+        select(UserMonthAssignment.user_id).where(UserMonthAssignment.month_id == month_id)
+    ).scalar_one_or_none()
+
+
+def upsert_assignment(db: Session, fund_id: int, month_id: int, user_id: int, assigned_by: int) -> int:
+    """Assign a month to a user, replacing any current assignee. Returns the assignment id."""
+    statement = dialect_insert(db, UserMonthAssignment).values(
+        month_id=month_id,
+        user_id=user_id,
+        assigned_by=assigned_by,
+        assigned_at=datetime.utcnow()
+    )
+    assignment_id = db.execute(
+        statement.on_conflict_do_update(
+            index_elements=[UserMonthAssignment.month_id],
+            set_={
+                "user_id": statement.excluded.user_id,
+                "assigned_by": statement.excluded.assigned_by,
+                "assigned_at": statement.excluded.assigned_at,
+            }
+        ).returning(UserMonthAssignment.id)
+    ).scalar_one()
+
+    queue_fund_event(db, fund_id, ("assignment", month_id), {
+        "type": "assignment",
+        "action": "updated",
+        "month_id": month_id,
+        "user_id": user_id,
+    })
+    return assignment_id
+
+
+def delete_assignment(db: Session, fund_id: int, month_id: int) -> Optional[int]:
+    """Remove a month's assignment. Returns the previous assignee's user id, or None if there was none."""
+    old_user_id = db.execute(
+        delete(UserMonthAssignment)
+        .where(UserMonthAssignment.month_id == month_id)
+        .returning(UserMonthAssignment.user_id)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+
+    if old_user_id is not None:
+        queue_fund_event(db, fund_id, ("assignment", month_id), {
+            "type": "assignment",
+            "action": "deleted",
+            "month_id": month_id,
+            "user_id": None,
+        })
+    return old_user_id
+
+
+def upsert_monthly_payment(
+    db: Session,
+    fund_id: int,
+    month_id: int,
+    user_id: int,
+    amount,
+    marked_by: int,
+    keep_verified: bool = False
+) -> Tuple[Optional[int], bool]:
+    """
+    Mark a month's payout as received (status pending), creating the row or
+    resetting an existing one. With keep_verified=True a verified row is left
+    alone and the payment id is None. Returns (payment id, created).
+    """
+    received_at = datetime.utcnow()
+    payment_id = db.execute(
+        dialect_insert(db, MonthlyPaymentReceived).values(
+            month_id=month_id,
+            user_id=user_id,
+            amount=amount,
+            marked_by=marked_by,
+            status="pending",
+            received_at=received_at
+        ).on_conflict_do_nothing(
+            index_elements=[MonthlyPaymentReceived.month_id]
+        ).returning(MonthlyPaymentReceived.id)
+    ).scalar_one_or_none()
+    created = payment_id is not None
+
+    if not created:
+        statement = update(MonthlyPaymentReceived).where(MonthlyPaymentReceived.month_id == month_id)
+        if keep_verified:
+            statement = statement.where(MonthlyPaymentReceived.status != "verified")
+        payment_id = db.execute(
+            statement
+            .values(status="pending", received_at=received_at, marked_by=marked_by)
+            .returning(MonthlyPaymentReceived.id)
+            .execution_options(synchronize_session=False)
+        ).scalar_one_or_none()
+
+    if payment_id is not None:
+        queue_fund_event(db, fund_id, ("monthly_payment", payment_id), {
+            "type": "monthly_payment",
+            "action": "marked" if created else "updated",
+            "month_id": month_id,
+            "payment_id": payment_id,
+            "status": "pending",
+        })
+    return payment_id, created
+
+
+def resubmit_rejected_payment(db: Session, fund_id: int, user_id: int, month_id: int, **values) -> Optional[int]:
+    """
+    Put a user's rejected installment payment for the month back to pending
+    (with the given column values) in one UPDATE. Returns its id, or None if
+    there is no rejected payment to re-submit.
+    """
+    rejected = select(InstallmentPayment.id).where(
+        InstallmentPayment.user_id == user_id,
+        InstallmentPayment.month_id == month_id,
+        InstallmentPayment.status == "rejected"
+    ).order_by(InstallmentPayment.id).limit(1).scalar_subquery()
+    payment_id = db.execute(
+        update(InstallmentPayment)
+        .where(InstallmentPayment.id == rejected)
+        .values(status="pending", paid_at=datetime.utcnow(), **values)
+        .returning(InstallmentPayment.id)
+        .execution_options(synchronize_session=False)
+    ).scalar_one_or_none()
+
+    if payment_id is not None:
+        verified_count = db.execute(
+            select(func.count(InstallmentPayment.id)).where(
+                InstallmentPayment.month_id == month_id,
+                InstallmentPayment.status == "verified"
+            )
+        ).scalar()
+        queue_fund_event(db, fund_id, ("installment", payment_id), {
+            "type": "installment",
+            "action": "updated",
+            "month_id": month_id,
+            "user_id": user_id,
+            "payment_id": payment_id,
+            "status": "pending",
+            "verified_count": verified_count,
+        })
+    return payment_id
@@ -0,0 +1,174 @@
+"""
+Change-version counters for HTTP validators.
+
+Every mutating endpoint bumps the scopes it touches in the same transaction
+as its write. Read views combine the versions they depend on into an ETag
+(see app/conditional.py), so an idle refresh costs one primary-key lookup
+instead of a full render.
+
+Scopes:
+- ("fund", fund_id): anything shown on that fund's pages (months, payments,
+  assignments, members, fund fields)
+- ("fund_meta", fund_id): the rarely changing subset cached in FundSnapshot
+  (fund fields, months, members, assignments) - not bumped by payments
+- ("funds", 0): the fund list and per-fund statistics on /funds
+- ("users", 0): user rows rendered anywhere (names, aliases, customer IDs)
+
+When a shared cache is configured (FUNDMGR_CACHE_URL, see app/cache.py),
+versions are read through it. Every commit that bumps a scope writes the new
+versions into the cache and publishes the scopes on the invalidation channel,
+so other workers can drop their in-process copies (e.g. FundSnapshots).
+A reader that missed the cache only adds the version it loaded if the key is
+still empty. If a bump has written a newer version in the meantime, that
+version stays. The only remaining stale case is two bumps of the same scope,
+committed by different processes within moments of each other, whose cache
+writes land out of order. That lasts at most FUNDMGR_CACHE_TTL.
+"""
+import json
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+from sqlalchemy import event, tuple_
+from sqlalchemy.orm import Session
+from app.cache import INVALIDATION_CHANNEL, get_cache
+from app.models import ChangeVersion
+from app.upserts import dialect_insert
+
+logger = logging.getLogger(__name__)
+
+Scope = Tuple[str, int]
+
+FUNDS_SCOPE: Scope = ("funds", 0)
+USERS_SCOPE: Scope = ("users", 0)
+
+
+def fund_scope(fund_id: int) -> Scope:
+    return ("fund", fund_id)
+
+
+def fund_meta_scope(fund_id: int) -> Scope:
+    return ("fund_meta", fund_id)
+
+
+def bump_versions(db: Session, *scopes: Scope):
+    """
+    Increment the version of each scope. Runs inside the caller's transaction,
+    so the bump becomes visible together with the write it describes.
+    """
+    now = datetime.utcnow()
+    # Written to the shared cache once the transaction commits (see _publish_bumped_versions)
+    bumped = db.info.setdefault("bumped_versions", {})
+    for scope, scope_id in set(scopes):
+        # One statement, so two first-time bumps can't both take an INSERT branch
+        statement = dialect_insert(db, ChangeVersion).values(
+            scope=scope, scope_id=scope_id, version=1, updated_at=now
+        )
+        version = db.execute(
+            statement.on_conflict_do_update(
+                index_elements=[ChangeVersion.scope, ChangeVersion.scope_id],
+                set_={
+                    "version": ChangeVersion.version + 1,
+                    "updated_at": statement.excluded.updated_at,
+                }
+            ).returning(ChangeVersion.version)
+        ).scalar_one()
+        bumped[(scope, scope_id)] = (version, now)
+
+
+def bump_fund_version(db: Session, fund_id: Optional[int]):
+    """Mark a fund as changed. The fund list is bumped too since it shows per-fund stats."""
+    if fund_id is None:
+        return
+    bump_versions(db, fund_scope(fund_id), FUNDS_SCOPE)
+
+
+def bump_fund_metadata_version(db: Session, fund_id: Optional[int]):
+    """
+    Mark a fund's metadata (fund fields, months, members, assignments) as changed.
+    This also invalidates cached FundSnapshots, so use it instead of bump_fund_version()
+    for anything other than payment status changes.
+    """
+    if fund_id is None:
+        return
+    bump_versions(db, fund_scope(fund_id), fund_meta_scope(fund_id), FUNDS_SCOPE)
+
+
+def bump_users_version(db: Session):
+    """Mark user display data (names, aliases, customer IDs, roles) as changed."""
+    bump_versions(db, USERS_SCOPE)
+
+
+def _cache_key(scope: Scope) -> str:
+    return f"version:{scope[0]}:{scope[1]}"
+
+
+def _cache_value(version: Optional[Tuple[int, datetime]]) -> bytes:
+    # Scopes that were never bumped are cached as null
+    return json.dumps([version[0], version[1].isoformat()] if version is not None else None).encode()
+
+
+def _query_versions(db: Session, scopes: List[Scope]) -> Dict[Scope, Tuple[int, datetime]]:
+    rows = db.query(
+        ChangeVersion.scope, ChangeVersion.scope_id, ChangeVersion.version, ChangeVersion.updated_at
+    ).filter(
+        tuple_(ChangeVersion.scope, ChangeVersion.scope_id).in_(scopes)
+    ).all()
+    return {(scope, scope_id): (version, updated_at) for scope, scope_id, version, updated_at in rows}
+
+
+def get_versions(db: Session, scopes: Iterable[Scope]) -> Dict[Scope, Tuple[int, datetime]]:
+    """Return {scope: (version, updated_at)} for the given scopes in a single query."""
+    scopes = list(scopes)
+    if not scopes:
+        return {}
+    cache = get_cache()
+    if cache is None:
+        return _query_versions(db, scopes)
+
+    versions = {}
+    try:
+        cached = cache.get_many([_cache_key(scope) for scope in scopes])
+    except Exception:
+        logger.exception("Reading versions from the shared cache failed")
+        return _query_versions(db, scopes)
+    missing = []
+    for scope in scopes:
+        value = cached.get(_cache_key(scope))
+        if value is None:
+            missing.append(scope)
+            continue
+        entry = json.loads(value)
+        # Scopes that were never bumped are cached as null
+        if entry is not None:
+            versions[scope] = (entry[0], datetime.fromisoformat(entry[1]))
+
+    if missing:
+        loaded = _query_versions(db, missing)
+        versions.update(loaded)
+        try:
+            # A bump that committed after our query has already written a newer
+            # version; add_many() leaves that in place instead of overwriting it
+            cache.add_many({_cache_key(scope): _cache_value(loaded.get(scope)) for scope in missing})
+        except Exception:
+            logger.exception("Writing versions to the shared cache failed")
+    return versions
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_bumped_versions(session: Session):
+    bumped = session.info.pop("bumped_versions", None)
+    if not bumped:
+        return
+    cache = get_cache()
+    if cache is None:
+        return
+    try:
+        cache.set_many({_cache_key(scope): _cache_value(version) for scope, version in bumped.items()})
+        cache.publish(INVALIDATION_CHANNEL, {"scopes": sorted(bumped)})
+    except Exception:
+        logger.exception("Publishing version bumps to the shared cache failed")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_bumped_versions(session: Session):
+    session.info.pop("bumped_versions", None)
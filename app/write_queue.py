@@ -0,0 +1,211 @@
+"""
+Optional single-writer queue for database writes.
+
+SQLite has one write lock per database. When many requests write at once,
+each one opens its own transaction and waits on busy_timeout for the lock.
+Each one also pays for its own fsync at commit. With FUNDMGR_WRITE_QUEUE=1,
+the hot write paths (payment submission and verification) hand their writes
+to one writer thread per worker process:
+
+- the writer owns a connection and takes jobs from a queue
+- jobs that queued up while the previous batch was committing run together
+  in one BEGIN IMMEDIATE transaction (group commit: one lock acquisition and
+  one fsync per batch)
+- each job runs in its own SAVEPOINT, so a failing job is rolled back and
+  its error goes to its request without affecting the rest of the batch
+- the request awaits its job's result, which is delivered once the batch
+  has committed
+
+A job is a function that takes a Session and returns a result. It runs on
+the writer thread, so it must only use that session and must not commit.
+Pass ids and plain values into it, not objects loaded by the request's
+session.
+
+With the queue off, run_write() runs the job on the request's session and
+commits, as before. The queue only orders writers within one worker process.
+Writes from other workers still wait on busy_timeout, and so do audit log
+entries, which srs_audit writes through its own sessions.
+
+Environment variables:
+- FUNDMGR_WRITE_QUEUE: route run_write() jobs through the writer thread (default: 0, SQLite only)
+- FUNDMGR_WRITE_BATCH: most jobs committed in one transaction (default: 64)
+"""
+import asyncio
+import logging
+import os
+import queue
+import threading
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, TypeVar
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from app.database import DATABASE_URL, set_sqlite_pragmas
+
+logger = logging.getLogger(__name__)
+
+# The writer's transaction handling is SQLite-specific (see _create_writer_engine)
+WRITE_QUEUE_ENABLED = os.environ.get("FUNDMGR_WRITE_QUEUE", "0") == "1" and DATABASE_URL.startswith("sqlite")
+MAX_BATCH = max(1, int(os.environ.get("FUNDMGR_WRITE_BATCH", "64")))
+
+# Pending side effects that a rolled-back job must not leave behind
+# (see app/events.py and app/versioning.py)
+_SESSION_INFO_KEYS = ("fund_events", "bumped_versions")
+
+T = TypeVar("T")
+
+
+def _create_writer_engine():
+    writer_engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    event.listen(writer_engine, "connect", set_sqlite_pragmas)
+
+    # pysqlite starts transactions implicitly, which breaks SAVEPOINT. Turn that
+    # off and begin them here, taking the write lock up front for the whole batch.
+    @event.listens_for(writer_engine, "connect")
+    def _disable_implicit_begin(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(writer_engine, "begin")
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return writer_engine
+
+
+@dataclass
+class _Job:
+    fn: Callable[[Session], Any]
+    loop: asyncio.AbstractEventLoop
+    future: asyncio.Future
+
+
+def _resolve(future: asyncio.Future, result, error: Optional[BaseException]):
+    if future.cancelled():
+        # The request went away; its write is committed regardless
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class WriteQueue:
+    """A writer thread that runs queued jobs on its own session and commits them in batches"""
+
+    def __init__(self, session_factory: Callable[[], Session], max_batch: int = MAX_BATCH):
+        self._session_factory = session_factory
+        self._max_batch = max_batch
+        self._jobs: "queue.SimpleQueue[Optional[_Job]]" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    async def submit(self, fn: Callable[[Session], T]) -> T:
+        """Queue a job and wait until the batch it ran in has committed"""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="fundmgr-writer", daemon=True)
+                self._thread.start()
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._jobs.put(_Job(fn, loop, future))
+        return await future
+
+    def stop(self, timeout: float = 10.0):
+        """Finish the queued jobs and stop the writer thread"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._jobs.put(None)
+            thread.join(timeout)
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            # Everything that queued up meanwhile joins the batch, without waiting for more
+            batch = [job]
+            stopping = False
+            while len(batch) < self._max_batch:
+                try:
+                    job = self._jobs.get_nowait()
+                except queue.Empty:
+                    break
+                if job is None:
+                    stopping = True
+                    break
+                batch.append(job)
+            self._run_batch(batch)
+            if stopping:
+                return
+
+    def _run_batch(self, batch: List[_Job]):
+        outcomes = []
+        session = self._session_factory()
+        try:
+            for job in batch:
+                saved = {key: _copy(session.info.get(key)) for key in _SESSION_INFO_KEYS}
+                try:
+                    with session.begin_nested():
+                        result = job.fn(session)
+                except Exception as e:
+                    for key, value in saved.items():
+                        if value is None:
+                            session.info.pop(key, None)
+                        else:
+                            session.info[key] = value
+                    outcomes.append((job, None, e))
+                else:
+                    outcomes.append((job, result, None))
+            session.commit()
+        except Exception as e:
+            logger.exception("Committing a batch of %d queued writes failed", len(batch))
+            session.rollback()
+            outcomes = [(job, None, e) for job in batch]
+        finally:
+            session.close()
+
+        for job, result, error in outcomes:
+            try:
+                job.loop.call_soon_threadsafe(_resolve, job.future, result, error)
+            except RuntimeError:
+                # The request's event loop has shut down
+                pass
+
+
+def _copy(value):
+    return value.copy() if value is not None else None
+
+
+_write_queue: Optional[WriteQueue] = None
+_write_queue_lock = threading.Lock()
+
+
+def get_write_queue() -> WriteQueue:
+    """This process's write queue, created on first use (after any fork)"""
+    global _write_queue
+    with _write_queue_lock:
+        if _write_queue is None:
+            _write_queue = WriteQueue(sessionmaker(autoflush=False, bind=_create_writer_engine()))
+        return _write_queue
+
+
+def stop_write_queue():
+    with _write_queue_lock:
+        write_queue = _write_queue
+    if write_queue is not None:
+        write_queue.stop()
+
+
+async def run_write(db: Session, fn: Callable[[Session], T]) -> T:
+    """
+    Run a write job and commit it. db is the request's session. With the
+    queue off the job runs on it. With the queue on, db's transaction is
+    ended first (discarding anything pending on it), so reads after the job
+    see its changes.
+    """
+    if not WRITE_QUEUE_ENABLED:
+        result = fn(db)
+        db.commit()
+        return result
+    db.rollback()
+    return await get_write_queue().submit(fn)
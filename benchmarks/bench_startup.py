@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Startup benchmark: import-time profile of the application.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters and
+reports the median total import time, the slowest modules by cumulative
+time and the self time of the app's own modules. Every worker process pays
+this cost when it boots (or the gunicorn master once, with preload_app).
+
+Usage: python benchmarks/bench_startup.py [--module app.main] [--repeat 5] [--top 15]
+"""
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$")
+
+
+def profile_import(module):
+    """Import module in a fresh interpreter. Returns (wall seconds, [(name, self_us, cumulative_us, depth)])"""
+    start = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        capture_output=True,
+        text=True,
+    )
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        error = [line for line in result.stderr.splitlines() if not line.startswith("import time:")]
+        raise SystemExit(f"import {module} failed:\n" + "\n".join(error[-5:]))
+
+    entries = []
+    for line in result.stderr.splitlines():
+        match = LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            entries.append((name, int(self_us), int(cumulative_us), (len(indent) - 1) // 2))
+    return elapsed, entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--module", default="app.main")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    walls = []
+    totals = []
+    runs = []
+    for _ in range(args.repeat):
+        wall, entries = profile_import(args.module)
+        walls.append(wall)
+        # Top-level imports (depth 0) add up to the whole import
+        totals.append(sum(cumulative for _, _, cumulative, depth in entries if depth == 0))
+        runs.append(entries)
+
+    print(f"import {args.module}: median {statistics.median(totals) / 1000:.1f} ms imports, "
+          f"{statistics.median(walls) * 1000:.1f} ms interpreter wall time ({args.repeat} runs)")
+
+    # Median per module across runs
+    cumulative = {}
+    self_time = {}
+    for entries in runs:
+        for name, self_us, cumulative_us, _ in entries:
+            cumulative.setdefault(name, []).append(cumulative_us)
+            self_time.setdefault(name, []).append(self_us)
+
+    print(f"\nSlowest {args.top} modules by cumulative time:")
+    slowest = sorted(cumulative, key=lambda name: statistics.median(cumulative[name]), reverse=True)
+    for name in slowest[:args.top]:
+        print(f"  {statistics.median(cumulative[name]) / 1000:>8.1f} ms  {name}")
+
+    print("\nApplication modules (self time):")
+    own = sorted(
+        (name for name in self_time if name == "app" or name.startswith("app.")),
+        key=lambda name: statistics.median(self_time[name]),
+        reverse=True,
+    )
+    for name in own:
+        print(f"  {statistics.median(self_time[name]) / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Regression benchmark for the fund-scoped user dashboard loader.
+
+Builds a throwaway SQLite database where one user has a growing payment
+history in other funds, and times load_user_dashboard() for a single fund.
+Latency should stay flat as the user's history grows, since the loader only
+reads rows belonging to the requested fund.
+
+Usage: python benchmarks/bench_user_dashboard.py [--repeat 50]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import sessionmaker
+from app.database import Base
+from app.models import Fund, User, Month, UserMonthAssignment, InstallmentPayment, fund_members
+from app.dashboard_data import load_user_dashboard
+from app.fund_cache import get_fund_snapshot, invalidate_fund_snapshot
+
+MONTHS_PER_FUND = 12
+MEMBERS_PER_FUND = 20
+HISTORY_SIZES = [0, 10, 100, 500]  # Number of other funds the user has joined
+
+
+def add_fund(db, name, member_ids, admin_id):
+    """Create a fund with a full schedule, assignments and verified installments for every member"""
+    fund_id = db.execute(insert(Fund).values(
+        name=name, total_amount=150000, number_of_months=MONTHS_PER_FUND, created_by=admin_id
+    )).inserted_primary_key[0]
+    db.execute(insert(fund_members), [{"fund_id": fund_id, "user_id": uid} for uid in member_ids])
+    month_ids = []
+    for number in range(1, MONTHS_PER_FUND + 1):
+        month_ids.append(db.execute(insert(Month).values(
+            fund_id=fund_id, month_name=f"M{number}", month_number=number,
+            installment_amount=12500, payment_amount=150000, year=2026
+        )).inserted_primary_key[0])
+    db.execute(insert(UserMonthAssignment), [
+        {"user_id": uid, "month_id": mid, "assigned_by": admin_id}
+        for uid, mid in zip(member_ids, month_ids)
+    ])
+    db.execute(insert(InstallmentPayment), [
+        {"user_id": uid, "month_id": mid, "fund_id": fund_id, "marked_by": uid, "status": "verified"}
+        for mid in month_ids for uid in member_ids
+    ])
+    return fund_id
+
+
+def build_database(path, history_size):
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(bind=engine)
+    db = sessionmaker(bind=engine)()
+
+    admin_id = db.execute(insert(User).values(
+        username="admin", password_hash="x", full_name="Administrator", role="admin"
+    )).inserted_primary_key[0]
+    user_ids = [
+        db.execute(insert(User).values(
+            username=f"user{i}", password_hash="x", full_name=f"User {i}", role="user"
+        )).inserted_primary_key[0]
+        for i in range(MEMBERS_PER_FUND)
+    ]
+    target_fund_id = add_fund(db, "Target", user_ids, admin_id)
+    # The benchmarked user (user_ids[0]) also belongs to every history fund
+    for i in range(history_size):
+        add_fund(db, f"History {i}", user_ids, admin_id)
+    db.commit()
+    db.close()
+    return engine, target_fund_id, user_ids[0]
+
+
+def time_loader(engine, fund_id, user_id, repeat):
+    Session = sessionmaker(bind=engine)
+    # Each database reuses the same fund ids, so drop snapshots cached from the previous one
+    invalidate_fund_snapshot(fund_id)
+    timings = []
+    for _ in range(repeat):
+        db = Session()
+        user = db.get(User, user_id)
+        start = time.perf_counter()
+        load_user_dashboard(db, get_fund_snapshot(db, fund_id), user)
+        timings.append(time.perf_counter() - start)
+        db.close()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    print(f"{'other funds':>12} {'user payments':>14} {'median ms':>10} {'p95 ms':>8}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for history_size in HISTORY_SIZES:
+            path = os.path.join(tmp, f"bench_{history_size}.db")
+            engine, fund_id, user_id = build_database(path, history_size)
+            timings = sorted(time_loader(engine, fund_id, user_id, args.repeat))
+            median = statistics.median(timings) * 1000
+            p95 = timings[int(len(timings) * 0.95) - 1] * 1000
+            user_payments = (history_size + 1) * MONTHS_PER_FUND
+            print(f"{history_size:>12} {user_payments:>14} {median:>10.2f} {p95:>8.2f}")
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
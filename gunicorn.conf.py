@@ -0,0 +1,39 @@
+"""
+Gunicorn configuration for production.
+
+Usage: gunicorn -c gunicorn.conf.py app.main:app
+
+Environment variables:
+- FUNDMGR_WORKERS: number of worker processes (default: one per CPU core)
+- FUNDMGR_BIND: listen address (default: 0.0.0.0:3434)
+- FUNDMGR_MAX_REQUESTS: recycle a worker after this many requests (default: 2000, 0 disables)
+- FUNDMGR_TIMEOUT: seconds before an unresponsive worker is killed (default: 60)
+"""
+import multiprocessing
+import os
+
+bind = os.environ.get("FUNDMGR_BIND", "0.0.0.0:3434")
+worker_class = "uvicorn.workers.UvicornWorker"
+workers = int(os.environ.get("FUNDMGR_WORKERS", multiprocessing.cpu_count()))
+
+# Import the app once in the master so workers fork with templates and modules loaded
+preload_app = True
+
+# Recycle workers periodically; jitter keeps them from restarting all at once
+max_requests = int(os.environ.get("FUNDMGR_MAX_REQUESTS", "2000"))
+max_requests_jitter = max_requests // 10
+
+# Graceful restarts (SIGHUP) and shutdowns let in-flight requests finish
+timeout = int(os.environ.get("FUNDMGR_TIMEOUT", "60"))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # SQLite connections opened in the master must not be shared with forked workers
+    from app.database import engine, read_engine
+    engine.dispose(close=False)
+    read_engine.dispose(close=False)
@@ -0,0 +1,643 @@
+#!/usr/bin/env python3
+"""
+Versioned migration runner - the only place that changes the database schema.
+
+Each step in MIGRATIONS runs once per database and is recorded in the
+schema_version table, so a fully migrated database is detected with a single
+SELECT MAX(version) and no PRAGMA inspection. A fresh database gets the
+current schema from the models and is stamped with the latest version.
+
+Steps 1-7 replace the old migrate_*.py scripts. They keep those scripts'
+guards, because databases migrated before this runner existed have some of
+them applied already without a schema_version row.
+
+To change the schema, append a new step with the next version number. Steps
+create their own tables with explicit DDL rather than from the models, so the
+history stays accurate when the models change later. Each step runs on the
+runner's cursor in one transaction with its schema_version row. A step that raises
+MigrationError is rolled back and not recorded, so it runs again next time.
+
+Usage: python migrate.py [db_path ...]  (default: data/ and, if present, data-prod/)
+"""
+
+import os
+import re
+import sqlite3
+import sys
+from datetime import datetime
+
+from sqlalchemy import create_engine
+
+# Get the database path
+db_path = os.path.join(os.path.dirname(__file__), "data", "fundmgr.db")
+db_path_prod = os.path.join(os.path.dirname(__file__), "data-prod", "fundmgr.db")
+
+
+def table_exists(cursor, table):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,))
+    return cursor.fetchone() is not None
+
+
+def column_names(cursor, table):
+    cursor.execute(f"PRAGMA table_info({table})")
+    return [row[1] for row in cursor.fetchall()]
+
+
+def add_fund_id_to_months(cursor):
+    """Add fund_id to months and move existing months into a default fund"""
+    if not table_exists(cursor, "months") or "fund_id" in column_names(cursor, "months"):
+        return
+    cursor.execute("ALTER TABLE months ADD COLUMN fund_id INTEGER")
+
+    if table_exists(cursor, "funds"):
+        return
+    cursor.execute("""
+        CREATE TABLE funds (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name VARCHAR NOT NULL,
+            description VARCHAR,
+            total_amount FLOAT NOT NULL,
+            number_of_months INTEGER DEFAULT 10,
+            created_by INTEGER NOT NULL,
+            created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(created_by) REFERENCES users(id)
+        )
+    """)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS fund_members (
+            fund_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (fund_id, user_id),
+            FOREIGN KEY(fund_id) REFERENCES funds(id),
+            FOREIGN KEY(user_id) REFERENCES users(id)
+        )
+    """)
+
+    # Create a default fund owned by the first admin and assign all existing months to it
+    cursor.execute("SELECT id FROM users WHERE role = 'admin' LIMIT 1")
+    admin_result = cursor.fetchone()
+    if not admin_result:
+        print("Warning: No admin user found. Please create a fund manually.")
+        return
+    admin_id = admin_result[0]
+    cursor.execute("""
+        INSERT INTO funds (name, description, total_amount, number_of_months, created_by)
+        VALUES ('NewYear2026 Scheme', 'Default chit fund scheme', 150000.0, 10, ?)
+    """, (admin_id,))
+    fund_id = cursor.lastrowid
+    cursor.execute("INSERT INTO fund_members (fund_id, user_id) VALUES (?, ?)", (fund_id, admin_id))
+    cursor.execute("UPDATE months SET fund_id = ?", (fund_id,))
+    print(f"Assigned {cursor.rowcount} months to default fund")
+
+
+def add_customer_fields(cursor):
+    """Add customer_id (backfilled as C001, C002, ...) and alias to users"""
+    if not table_exists(cursor, "users"):
+        return
+    columns = column_names(cursor, "users")
+    if "customer_id" not in columns:
+        cursor.execute("ALTER TABLE users ADD COLUMN customer_id VARCHAR")
+        cursor.execute("SELECT id FROM users ORDER BY id")
+        user_ids = cursor.fetchall()
+        cursor.executemany(
+            "UPDATE users SET customer_id = ? WHERE id = ?",
+            [(f"C{idx:03d}", user_id) for idx, (user_id,) in enumerate(user_ids, start=1)]
+        )
+        cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_users_customer_id ON users(customer_id)")
+        print(f"Generated customer IDs for {len(user_ids)} users")
+    if "alias" not in columns:
+        cursor.execute("ALTER TABLE users ADD COLUMN alias VARCHAR")
+
+
+def add_payment_fields(cursor):
+    """Add payment_date, transaction_id and transaction_type to installment_payments"""
+    if not table_exists(cursor, "installment_payments"):
+        return
+    if "payment_date" not in column_names(cursor, "installment_payments"):
+        cursor.execute("ALTER TABLE installment_payments ADD COLUMN payment_date DATETIME")
+        cursor.execute("ALTER TABLE installment_payments ADD COLUMN transaction_id VARCHAR")
+        cursor.execute("ALTER TABLE installment_payments ADD COLUMN transaction_type VARCHAR")
+
+
+def add_fund_status(cursor):
+    """Add is_archived and is_deleted to funds"""
+    if not table_exists(cursor, "funds"):
+        return
+    columns = column_names(cursor, "funds")
+    if "is_archived" not in columns:
+        cursor.execute("ALTER TABLE funds ADD COLUMN is_archived INTEGER DEFAULT 0 NOT NULL")
+    if "is_deleted" not in columns:
+        cursor.execute("ALTER TABLE funds ADD COLUMN is_deleted INTEGER DEFAULT 0 NOT NULL")
+
+
+def add_guest_visible(cursor):
+    """Add guest_visible to funds"""
+    if table_exists(cursor, "funds") and "guest_visible" not in column_names(cursor, "funds"):
+        cursor.execute("ALTER TABLE funds ADD COLUMN guest_visible INTEGER NOT NULL DEFAULT 0")
+
+
+# table -> money columns
+MONEY_COLUMNS = {
+    "funds": ["total_amount"],
+    "months": ["installment_amount", "payment_amount"],
+    "monthly_payments_received": ["amount"],
+}
+
+
+def rebuild_money_table(cursor, table, money_columns):
+    """Rebuild one table with INTEGER paise money columns (SQLite can't change a column's type in place)"""
+    cursor.execute(f"PRAGMA table_info({table})")
+    table_info = cursor.fetchall()
+    if not table_info:
+        return
+
+    column_types = {row[1]: (row[2] or "").upper() for row in table_info}
+    to_convert = [c for c in money_columns if c in column_types and column_types[c] != "INTEGER"]
+    if not to_convert:
+        return
+
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,))
+    create_sql = cursor.fetchone()[0]
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type='index' AND tbl_name=? AND sql IS NOT NULL", (table,))
+    index_sqls = [row[0] for row in cursor.fetchall()]
+
+    new_table = f"{table}__paise"
+    new_sql = re.sub(
+        rf'^CREATE TABLE\s+("?){table}\1',
+        f'CREATE TABLE "{new_table}"',
+        create_sql,
+        count=1,
+        flags=re.IGNORECASE
+    )
+    for column in to_convert:
+        new_sql = re.sub(
+            rf'(\b"?{column}"?\s+)(FLOAT|REAL|NUMERIC|DOUBLE)\b',
+            r"\1INTEGER",
+            new_sql,
+            count=1,
+            flags=re.IGNORECASE
+        )
+
+    columns = [row[1] for row in table_info]
+    select_list = ", ".join(
+        f"CAST(ROUND({c} * 100) AS INTEGER)" if c in to_convert else c
+        for c in columns
+    )
+
+    print(f"Converting {table}.{', '.join(to_convert)} to integer paise")
+    cursor.execute(new_sql)
+    cursor.execute(f"INSERT INTO {new_table} ({', '.join(columns)}) SELECT {select_list} FROM {table}")
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {new_table} RENAME TO {table}")
+    for index_sql in index_sqls:
+        cursor.execute(index_sql)
+
+
+def money_to_paise(cursor):
+    """Store money columns as integer paise instead of FLOAT rupees"""
+    for table, money_columns in MONEY_COLUMNS.items():
+        rebuild_money_table(cursor, table, money_columns)
+
+
+def add_dashboard_indexes(cursor):
+    """Indexes used by fund-scoped dashboard queries"""
+    if table_exists(cursor, "months"):
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_months_fund_id ON months (fund_id)")
+    if table_exists(cursor, "installment_payments"):
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_installment_payments_month_user ON installment_payments (month_id, user_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS ix_installment_payments_user_month ON installment_payments (user_id, month_id)")
+
+
+# The schema as of version 8 (money already in paise), for tables a database
+# from before this runner may lack. A table's indexes are only created with it.
+SCHEMA_V8 = {
+    "users": ["""
+        CREATE TABLE users (
+            id INTEGER NOT NULL,
+            username VARCHAR NOT NULL,
+            password_hash VARCHAR NOT NULL,
+            full_name VARCHAR NOT NULL,
+            customer_id VARCHAR,
+            alias VARCHAR,
+            role VARCHAR,
+            created_at DATETIME,
+            PRIMARY KEY (id)
+        )
+    """,
+        "CREATE UNIQUE INDEX ix_users_customer_id ON users (customer_id)",
+        "CREATE INDEX ix_users_id ON users (id)",
+        "CREATE UNIQUE INDEX ix_users_username ON users (username)",
+    ],
+    "funds": ["""
+        CREATE TABLE funds (
+            id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            description VARCHAR,
+            total_amount INTEGER NOT NULL,
+            number_of_months INTEGER,
+            created_by INTEGER NOT NULL,
+            created_at DATETIME,
+            is_archived BOOLEAN NOT NULL,
+            is_deleted BOOLEAN NOT NULL,
+            guest_visible BOOLEAN NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(created_by) REFERENCES users (id)
+        )
+    """,
+        "CREATE INDEX ix_funds_id ON funds (id)",
+    ],
+    "fund_members": ["""
+        CREATE TABLE fund_members (
+            fund_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            PRIMARY KEY (fund_id, user_id),
+            FOREIGN KEY(fund_id) REFERENCES funds (id),
+            FOREIGN KEY(user_id) REFERENCES users (id)
+        )
+    """],
+    "months": ["""
+        CREATE TABLE months (
+            id INTEGER NOT NULL,
+            fund_id INTEGER NOT NULL,
+            month_name VARCHAR NOT NULL,
+            month_number INTEGER NOT NULL,
+            installment_amount INTEGER NOT NULL,
+            payment_amount INTEGER NOT NULL,
+            year INTEGER,
+            PRIMARY KEY (id),
+            FOREIGN KEY(fund_id) REFERENCES funds (id)
+        )
+    """,
+        "CREATE INDEX ix_months_fund_id ON months (fund_id)",
+        "CREATE INDEX ix_months_id ON months (id)",
+    ],
+    "user_month_assignments": ["""
+        CREATE TABLE user_month_assignments (
+            id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            month_id INTEGER NOT NULL,
+            assigned_at DATETIME,
+            assigned_by INTEGER NOT NULL,
+            PRIMARY KEY (id),
+            FOREIGN KEY(user_id) REFERENCES users (id),
+            UNIQUE (month_id),
+            FOREIGN KEY(month_id) REFERENCES months (id),
+            FOREIGN KEY(assigned_by) REFERENCES users (id)
+        )
+    """,
+        "CREATE INDEX ix_user_month_assignments_id ON user_month_assignments (id)",
+    ],
+    "installment_payments": ["""
+        CREATE TABLE installment_payments (
+            id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            month_id INTEGER NOT NULL,
+            paid_at DATETIME,
+            payment_date DATETIME,
+            transaction_id VARCHAR,
+            transaction_type VARCHAR,
+            marked_by INTEGER NOT NULL,
+            verified_by INTEGER,
+            status VARCHAR,
+            PRIMARY KEY (id),
+            FOREIGN KEY(user_id) REFERENCES users (id),
+            FOREIGN KEY(month_id) REFERENCES months (id),
+            FOREIGN KEY(marked_by) REFERENCES users (id),
+            FOREIGN KEY(verified_by) REFERENCES users (id)
+        )
+    """,
+        "CREATE INDEX ix_installment_payments_id ON installment_payments (id)",
+        "CREATE INDEX ix_installment_payments_month_user ON installment_payments (month_id, user_id)",
+        "CREATE INDEX ix_installment_payments_user_month ON installment_payments (user_id, month_id)",
+    ],
+    "monthly_payments_received": ["""
+        CREATE TABLE monthly_payments_received (
+            id INTEGER NOT NULL,
+            month_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            received_at DATETIME,
+            marked_by INTEGER NOT NULL,
+            verified_by INTEGER,
+            status VARCHAR,
+            amount INTEGER NOT NULL,
+            PRIMARY KEY (id),
+            UNIQUE (month_id),
+            FOREIGN KEY(month_id) REFERENCES months (id),
+            FOREIGN KEY(user_id) REFERENCES users (id),
+            FOREIGN KEY(marked_by) REFERENCES users (id),
+            FOREIGN KEY(verified_by) REFERENCES users (id)
+        )
+    """,
+        "CREATE INDEX ix_monthly_payments_received_id ON monthly_payments_received (id)",
+    ],
+    "audit_logs": ["""
+        CREATE TABLE audit_logs (
+            id INTEGER NOT NULL,
+            user_id INTEGER,
+            action_type VARCHAR NOT NULL,
+            action_description VARCHAR NOT NULL,
+            ip_address VARCHAR,
+            user_agent VARCHAR,
+            details VARCHAR,
+            fund_id INTEGER,
+            created_at DATETIME,
+            PRIMARY KEY (id),
+            FOREIGN KEY(user_id) REFERENCES users (id),
+            FOREIGN KEY(fund_id) REFERENCES funds (id)
+        )
+    """,
+        "CREATE INDEX ix_audit_logs_action_type ON audit_logs (action_type)",
+        "CREATE INDEX ix_audit_logs_created_at ON audit_logs (created_at)",
+        "CREATE INDEX ix_audit_logs_fund_id ON audit_logs (fund_id)",
+        "CREATE INDEX ix_audit_logs_id ON audit_logs (id)",
+        "CREATE INDEX ix_audit_logs_user_id ON audit_logs (user_id)",
+    ],
+    "change_versions": ["""
+        CREATE TABLE change_versions (
+            scope VARCHAR NOT NULL,
+            scope_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,
+            updated_at DATETIME NOT NULL,
+            PRIMARY KEY (scope, scope_id)
+        )
+    """],
+}
+
+
+def create_missing_tables(cursor):
+    """Create the tables of the version 8 schema that a database from before this runner lacks"""
+    for table, statements in SCHEMA_V8.items():
+        if table_exists(cursor, table):
+            continue
+        print(f"  Creating table {table}")
+        for statement in statements:
+            cursor.execute(statement)
+
+
+CUSTOMER_ID_PATTERN = re.compile(r"^C(\d+)$")
+
+
+def add_counters(cursor):
+    """Create the counters table, seed the customer ID counter and give users without one a customer ID"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS counters (
+            name VARCHAR NOT NULL,
+            value INTEGER NOT NULL,
+            PRIMARY KEY (name)
+        )
+    """)
+
+    cursor.execute("SELECT customer_id FROM users WHERE customer_id LIKE 'C%'")
+    numbers = [int(match.group(1)) for (customer_id,) in cursor.fetchall() if (match := CUSTOMER_ID_PATTERN.match(customer_id))]
+    cursor.execute("SELECT value FROM counters WHERE name = 'customer_id'")
+    row = cursor.fetchone()
+    last = max(numbers + [row[0] if row else 0])
+
+    cursor.execute("SELECT id FROM users WHERE customer_id IS NULL ORDER BY id")
+    user_ids = [user_id for (user_id,) in cursor.fetchall()]
+    cursor.executemany(
+        "UPDATE users SET customer_id = ? WHERE id = ?",
+        [(f"C{number:03d}", user_id) for number, user_id in enumerate(user_ids, start=last + 1)]
+    )
+    last += len(user_ids)
+    cursor.execute(
+        "INSERT INTO counters (name, value) VALUES ('customer_id', ?) "
+        "ON CONFLICT (name) DO UPDATE SET value = MAX(value, excluded.value)",
+        (last,)
+    )
+    if user_ids:
+        print(f"Assigned customer IDs to {len(user_ids)} users")
+
+
+def add_schedule_templates(cursor):
+    """Create the schedule_templates and schedule_template_months tables"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schedule_templates (
+            id INTEGER NOT NULL,
+            name VARCHAR NOT NULL,
+            description VARCHAR,
+            created_by INTEGER NOT NULL,
+            created_at DATETIME,
+            PRIMARY KEY (id),
+            UNIQUE (name),
+            FOREIGN KEY(created_by) REFERENCES users (id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_schedule_templates_id ON schedule_templates (id)")
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schedule_template_months (
+            template_id INTEGER NOT NULL,
+            month_number INTEGER NOT NULL,
+            month_name VARCHAR NOT NULL,
+            installment_amount INTEGER NOT NULL,
+            payment_amount INTEGER NOT NULL,
+            PRIMARY KEY (template_id, month_number),
+            FOREIGN KEY(template_id) REFERENCES schedule_templates (id) ON DELETE CASCADE
+        )
+    """)
+
+
+def add_idempotency_keys(cursor):
+    """Create the idempotency_keys table"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS idempotency_keys (
+            user_id INTEGER NOT NULL,
+            "key" VARCHAR NOT NULL,
+            endpoint VARCHAR NOT NULL,
+            request_hash VARCHAR NOT NULL,
+            response_body VARCHAR NOT NULL,
+            created_at DATETIME NOT NULL,
+            expires_at DATETIME NOT NULL,
+            PRIMARY KEY (user_id, "key"),
+            FOREIGN KEY(user_id) REFERENCES users (id)
+        )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_idempotency_keys_expires_at ON idempotency_keys (expires_at)")
+
+
+class MigrationError(Exception):
+    """A step can't be applied until the data is fixed by hand. The step is retried on the next run."""
+
+
+def backfill_installment_fund_id(cursor):
+    cursor.execute("""
+        UPDATE installment_payments
+        SET fund_id = (SELECT months.fund_id FROM months WHERE months.id = installment_payments.month_id)
+        WHERE fund_id IS NULL
+    """)
+
+
+def add_installment_fund_id(cursor):
+    """Copy months.fund_id onto installment_payments"""
+    if not table_exists(cursor, "installment_payments"):
+        return
+    if "fund_id" not in column_names(cursor, "installment_payments"):
+        cursor.execute("ALTER TABLE installment_payments ADD COLUMN fund_id INTEGER REFERENCES funds(id)")
+    backfill_installment_fund_id(cursor)
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_installment_payments_fund_id ON installment_payments (fund_id)")
+
+
+def add_installment_transaction_index(cursor):
+    """
+    Allow each transaction ID only once per fund among non-rejected payments
+    (payment submission relies on this index to detect duplicates).
+    Fails, and so runs again next time, while any payment has no fund or a
+    transaction ID is used twice; the problem rows are listed.
+    """
+    if not table_exists(cursor, "installment_payments"):
+        return
+    backfill_installment_fund_id(cursor)
+
+    cursor.execute("SELECT id, month_id FROM installment_payments WHERE fund_id IS NULL ORDER BY id")
+    orphans = cursor.fetchall()
+    if orphans:
+        for payment_id, month_id in orphans:
+            print(f"    payment {payment_id}: month {month_id} has no fund")
+        raise MigrationError(
+            f"{len(orphans)} installment payments have no fund_id; assign their months to a fund "
+            "(or delete the payments) and run migrate.py again"
+        )
+
+    cursor.execute("""
+        SELECT fund_id, transaction_id, GROUP_CONCAT(id)
+        FROM installment_payments
+        WHERE transaction_id IS NOT NULL AND status != 'rejected'
+        GROUP BY fund_id, transaction_id
+        HAVING COUNT(*) > 1
+    """)
+    duplicates = cursor.fetchall()
+    if duplicates:
+        for fund_id, transaction_id, payment_ids in duplicates:
+            print(f"    fund {fund_id}, transaction {transaction_id!r}: payments {payment_ids}")
+        raise MigrationError(
+            f"{len(duplicates)} transaction IDs are used by more than one payment; "
+            "reject the extra payments and run migrate.py again"
+        )
+
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_installment_payments_fund_transaction "
+        "ON installment_payments (fund_id, transaction_id) "
+        "WHERE transaction_id IS NOT NULL AND status != 'rejected'"
+    )
+
+
+# (version, name, step) - steps receive a cursor inside the step's transaction
+MIGRATIONS = [
+    (1, "add_fund_id_to_months", add_fund_id_to_months),
+    (2, "add_customer_fields", add_customer_fields),
+    (3, "add_payment_fields", add_payment_fields),
+    (4, "add_fund_status", add_fund_status),
+    (5, "add_guest_visible", add_guest_visible),
+    (6, "money_to_paise", money_to_paise),
+    (7, "add_dashboard_indexes", add_dashboard_indexes),
+    (8, "create_missing_tables", create_missing_tables),
+    (9, "add_counters", add_counters),
+    (10, "add_schedule_templates", add_schedule_templates),
+    (11, "add_idempotency_keys", add_idempotency_keys),
+    (12, "add_installment_fund_id", add_installment_fund_id),
+    (13, "add_installment_transaction_index", add_installment_transaction_index),
+]
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def create_model_tables(path):
+    from app.database import Base
+    import app.models  # noqa: F401 - registers the models on Base.metadata
+
+    engine = create_engine(f"sqlite:///{path}")
+    try:
+        Base.metadata.create_all(bind=engine)
+    finally:
+        engine.dispose()
+
+
+def current_version(cursor):
+    if not table_exists(cursor, "schema_version"):
+        return None
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    return cursor.fetchone()[0] or 0
+
+
+def record_version(cursor, version, name):
+    cursor.execute(
+        "INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)",
+        (version, name, datetime.utcnow().isoformat())
+    )
+
+
+def migrate_database(db_path, create=False):
+    """Apply all pending migrations. With create=True a missing database is created."""
+    if not os.path.exists(db_path) and not create:
+        print(f"Database not found at {db_path}, skipping migration")
+        return
+    if create:
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+
+    conn = sqlite3.connect(db_path, isolation_level=None)
+    cursor = conn.cursor()
+
+    try:
+        version = current_version(cursor)
+        if version == LATEST_VERSION:
+            print(f"Schema is up to date (version {version}) for {db_path}")
+            return
+
+        if version is None:
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS schema_version ("
+                "version INTEGER PRIMARY KEY, name VARCHAR NOT NULL, applied_at VARCHAR NOT NULL)"
+            )
+            version = 0
+
+            # A fresh database gets the current schema directly
+            if not table_exists(cursor, "users"):
+                print(f"Creating schema version {LATEST_VERSION} in {db_path}")
+                create_model_tables(db_path)
+                cursor.execute("BEGIN")
+                for step_version, name, _ in MIGRATIONS:
+                    record_version(cursor, step_version, name)
+                cursor.execute("COMMIT")
+                return
+
+        # Table rebuilds must not trigger foreign key actions
+        cursor.execute("PRAGMA foreign_keys=OFF")
+        for step_version, name, step in MIGRATIONS:
+            if step_version <= version:
+                continue
+            print(f"Applying migration {step_version}: {name}")
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                step(cursor)
+                record_version(cursor, step_version, name)
+                cursor.execute("COMMIT")
+            except Exception:
+                cursor.execute("ROLLBACK")
+                raise
+        print(f"Migration completed successfully for {db_path}")
+
+    except Exception as e:
+        print(f"Error migrating {db_path}: {e}")
+        raise
+    finally:
+        conn.close()
+
+
+def main():
+    if len(sys.argv) > 1:
+        for path in sys.argv[1:]:
+            migrate_database(path, create=True)
+    else:
+        # Migrate (or create) dev database
+        migrate_database(db_path, create=True)
+
+        # Migrate prod database if it exists
+        if os.path.exists(db_path_prod):
+            migrate_database(db_path_prod)
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except MigrationError:
+        # Already reported by migrate_database; a non-zero exit stops the server from starting
+        sys.exit(1)
@@ -32,7 +32,7 @@ run_migration_in_container() {
     if [ -n "$CONTAINER_ID" ]; then
         CONTAINER_NAME=$(docker ps --format '{{.Names}}' --filter id=$CONTAINER_ID | head -1)
         echo "  Running migration in container: $CONTAINER_NAME"
-        docker exec "$CONTAINER_NAME" python migrate_add_fund_status.py
+        docker exec "$CONTAINER_NAME" python migrate.py
         if [ $? -eq 0 ]; then
             echo "  ✓ $instance_name migration completed successfully"
         else
@@ -69,10 +69,10 @@ echo "3. Migrating local databases (if they exist)..."
 if [ -f "data/fundmgr.db" ] || [ -f "data-prod/fundmgr.db" ]; then
     if command -v python3 &> /dev/null; then
         echo "  Running local migration with python3..."
-        python3 migrate_add_fund_status.py
+        python3 migrate.py
     elif command -v python &> /dev/null; then
         echo "  Running local migration with python..."
-        python migrate_add_fund_status.py
+        python migrate.py
     else
         echo "  Python not found, skipping local migration"
     fi
@@ -21,11 +21,22 @@ fi
 
 # Check if database is seeded
 if [ ! -f "data/fundmgr.db" ]; then
+    python migrate.py || exit 1
     echo "Seeding initial data..."
     python seed_data.py
+else
+    python migrate.py || exit 1
 fi
 
 # Run the application
+# --prod: multi-worker gunicorn server (see gunicorn.conf.py), otherwise a single reloading dev server
+if [ "$1" = "--prod" ]; then
+    echo "Building static assets..."
+    python -m app.static_assets || exit 1
+    echo "Starting production server on http://localhost:3434"
+    FUNDMGR_ENV=production exec gunicorn -c gunicorn.conf.py app.main:app
+fi
+
 echo "Starting server on http://localhost:3434"
 uvicorn app.main:app --reload --host 0.0.0.0 --port 3434
 
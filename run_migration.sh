@@ -4,7 +4,7 @@
 # Usage: ./run_migration.sh
 
 echo "=========================================="
-echo "Running Fund Status Migration"
+echo "Running Database Migrations"
 echo "=========================================="
 echo ""
 
@@ -12,7 +12,7 @@ echo ""
 if [ -f "/app/data/fundmgr.db" ]; then
     # Running inside Docker container
     echo "Running inside Docker container..."
-    python migrate_add_fund_status.py
+    python migrate.py
 else
     # Running locally - need to check for Python
     if command -v python3 &> /dev/null; then
@@ -25,7 +25,7 @@ else
     fi
     
     echo "Running locally with $PYTHON_CMD..."
-    $PYTHON_CMD migrate_add_fund_status.py
+    $PYTHON_CMD migrate.py
 fi
 
 echo ""
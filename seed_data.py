@@ -1,13 +1,12 @@
 """
 Script to seed initial data for the chit fund management system.
-Run this once to populate the database with fund, month data and create admin user.
+Run this once (after migrate.py) to populate the database with fund, month data and create admin user.
 """
-from app.database import SessionLocal, engine, Base
+from app.database import SessionLocal
 from app.models import User, Month, Fund
 from app.auth import get_password_hash
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# The schema is created by migrate.py, which must run first
 
 db = SessionLocal()
 
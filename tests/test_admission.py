@@ -0,0 +1,45 @@
+import asyncio
+from dataclasses import replace
+import httpx
+from starlette.applications import Starlette
+from starlette.responses import StreamingResponse
+from starlette.routing import Route
+from app.admission import AdmissionControlMiddleware, load_route_classes
+
+
+def test_streamed_report_holds_its_slot_until_the_body_is_sent():
+    async def scenario():
+        streaming = asyncio.Event()
+        finish = asyncio.Event()
+
+        async def months(request):
+            async def body():
+                yield b"<table>"
+                streaming.set()
+                await finish.wait()  # Rows still being rendered after the response started
+                yield b"</table>"
+            return StreamingResponse(body(), media_type="text/html")
+
+        route_classes = load_route_classes()
+        route_classes["report"] = replace(route_classes["report"], limit=1, timeout=0.2)
+        app = AdmissionControlMiddleware(Starlette(routes=[Route("/admin/months", months)]), route_classes=route_classes)
+
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            first = asyncio.create_task(client.get("/admin/months"))
+            await asyncio.wait_for(streaming.wait(), 5)
+
+            shed = await asyncio.wait_for(client.get("/admin/months"), 5)
+            assert shed.status_code == 503
+            assert "retry-after" in shed.headers
+
+            finish.set()
+            assert (await first).text == "<table></table>"
+
+            finish.clear()
+            streaming.clear()
+            second = asyncio.create_task(client.get("/admin/months"))
+            await asyncio.wait_for(streaming.wait(), 5)
+            finish.set()
+            assert (await second).status_code == 200
+
+    asyncio.run(scenario())